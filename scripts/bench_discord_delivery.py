@@ -0,0 +1,191 @@
+"""Benchmark Discord delivery against a local stub webhook server.
+
+The stub enforces a per-webhook rate limit. Over the limit it answers 429
+with `retry_after`; under it, it sends Discord's X-RateLimit headers. A
+configurable share of requests fail with 502, and payloads over Discord's
+embed limits are rejected with 400. The same reports, some of them oversized,
+are sent twice:
+- the old way: one bare `requests.post` per report, no session, no retry;
+- through DiscordDelivery.
+
+The table compares reports delivered, HTTP requests, TCP connections opened
+and 429/5xx/400 responses.
+
+Usage:
+    python bench_discord_delivery.py                           # 60 reports over 3 webhooks
+    python bench_discord_delivery.py --reports 200 --limit 5 --window 2 --error-rate 0.05
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from discord_delivery import (DiscordDelivery, DeliveryError, embed_size, MAX_EMBEDS, MAX_EMBED_CHARS,
+                              MAX_FIELDS, MAX_FIELD_VALUE)
+
+
+class StubWebhooks(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, limit: int, window: float, error_rate: float, seed: int):
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+        self.limit = limit
+        self.window = window
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, List[float]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.buckets = {}
+            self.counts = {'requests': 0, 'connections': 0, '204': 0, '429': 0, '5xx': 0, '400': 0}
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.counts[key] += 1
+
+    def url(self, webhook: int) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api/webhooks/{webhook}/token"
+
+
+def _valid(payload: Dict[str, Any]) -> bool:
+    embeds = payload.get('embeds', [])
+    return (len(embeds) <= MAX_EMBEDS and sum(embed_size(e) for e in embeds) <= MAX_EMBED_CHARS
+            and all(len(e.get('fields', [])) <= MAX_FIELDS for e in embeds)
+            and all(len(f['value']) <= MAX_FIELD_VALUE for e in embeds for f in e.get('fields', [])))
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: bytes = b'', headers: Dict[str, str] = None) -> None:
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server: StubWebhooks = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        server.count('requests')
+        now = time.monotonic()
+        with server.lock:
+            window = [t for t in server.buckets.get(self.path, []) if now - t < server.window]
+            throttled = len(window) >= server.limit
+            if not throttled:
+                window.append(now)
+            server.buckets[self.path] = window
+            failed = not throttled and server.random.random() < server.error_rate
+        reset_after = max(server.window - (now - window[0]), 0.0) if window else 0.0
+        if throttled:
+            server.count('429')
+            body = json.dumps({'message': 'You are being rate limited.', 'retry_after': round(reset_after, 3),
+                               'global': False}).encode()
+            return self._reply(429, body, {'Retry-After': f"{reset_after:.3f}"})
+        if failed:
+            server.count('5xx')
+            return self._reply(502, b'{"message": "Bad Gateway"}')
+        if not _valid(payload):
+            server.count('400')
+            return self._reply(400, b'{"message": "Invalid Form Body"}')
+        server.count('204')
+        self._reply(204, headers={
+            'X-RateLimit-Limit': str(server.limit),
+            'X-RateLimit-Remaining': str(server.limit - len(window)),
+            'X-RateLimit-Reset-After': f"{reset_after:.3f}",
+        })
+
+
+def make_report(rng: random.Random, index: int, oversized: bool) -> Dict[str, Any]:
+    """A summary-shaped payload; oversized ones have more and longer fields than one embed allows"""
+    lines = 60 if oversized else 4
+    fields = [{
+        'name': f"Section {n}",
+        'value': '\n'.join(f"• Item {i}: **Rs. {rng.uniform(10, 99999):,.2f}**" for i in range(rng.randint(2, lines))),
+        'inline': False,
+    } for n in range(30 if oversized else 8)]
+    return {'username': 'Fynix', 'embeds': [{
+        'title': f"📊 Daily Financial Summary - report {index}", 'description': f"**👤 User {index}**",
+        'color': 0x00ff00, 'fields': fields, 'footer': {'text': 'Generated at 09:00 AM PKT'},
+    }]}
+
+
+def run_naive(server: StubWebhooks, reports, workers: int) -> Dict[str, Any]:
+    import requests
+
+    def post(job):
+        webhook, payload = job
+        return requests.post(server.url(webhook), json=payload).status_code == 204
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return {'delivered': sum(pool.map(post, reports))}
+
+
+def run_pooled(server: StubWebhooks, reports, workers: int) -> Dict[str, Any]:
+    delivery = DiscordDelivery(workers=workers, backoff=0.05, max_backoff=1.0)
+    futures = [delivery.submit(server.url(webhook), payload) for webhook, payload in reports]
+    delivered = 0
+    for future in futures:
+        try:
+            future.result()
+            delivered += 1
+        except DeliveryError:
+            pass
+    delivery.close()
+    return {'delivered': delivered, 'messages': delivery.stats['messages']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reports", type=int, default=60)
+    parser.add_argument("--webhooks", type=int, default=3)
+    parser.add_argument("--oversized", type=float, default=0.2, help="share of reports too big for one message")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=5, help="requests per webhook per window before 429s")
+    parser.add_argument("--window", type=float, default=1.0, help="rate limit window in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of requests answered with 502")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    reports = [(i % args.webhooks, make_report(rng, i, rng.random() < args.oversized)) for i in range(args.reports)]
+    server = StubWebhooks(args.limit, args.window, args.error_rate, args.seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"{'mode':<8}{'delivered':>11}{'seconds':>9}{'requests':>10}{'conns':>7}{'429':>6}{'5xx':>6}{'400':>6}")
+    results = {}
+    for mode, run in (('naive', run_naive), ('pooled', run_pooled)):
+        server.reset()
+        time.sleep(args.window)
+        started = time.perf_counter()
+        results[mode] = run(server, reports, args.workers)
+        elapsed = time.perf_counter() - started
+        c = server.counts
+        print(f"{mode:<8}{results[mode]['delivered']:>6}/{len(reports):<4}{elapsed:>9.2f}{c['requests']:>10}"
+              f"{c['connections']:>7}{c['429']:>6}{c['5xx']:>6}{c['400']:>6}")
+    server.shutdown()
+    print(f"\npooled delivery posted {results['pooled']['messages']} messages for {len(reports)} reports")
+    return 0 if results['pooled']['delivered'] == len(reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
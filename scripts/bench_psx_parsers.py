@@ -0,0 +1,87 @@
+"""Benchmark the fast quote extractor against the BeautifulSoup parser.
+
+Runs both paths over every saved company page in the corpus, reports per-page
+latency and peak memory, and exits non-zero if they disagree on any price.
+
+Usage:
+    python bench_psx_parsers.py                      # bench fixtures/psx_pages
+    python bench_psx_parsers.py --save LUCK OGDC     # add live pages to the corpus first
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from psx_quotes import QUOTE_CLOSE_MARKER, extractPriceFast, extractPriceSoup
+
+CORPUS_DIR=os.path.join(os.path.dirname(os.path.abspath(__file__)),"fixtures","psx_pages")
+
+def savePages(symbols,corpusDir):
+    import requests
+    from update_tables import PSX_BASE_URL, HEADERS
+    os.makedirs(corpusDir,exist_ok=True)
+    for symbol in symbols:
+        res=requests.get(f"{PSX_BASE_URL}/company/{symbol}",headers=HEADERS,timeout=30)
+        res.raise_for_status()
+        with open(os.path.join(corpusDir,f"{symbol.upper()}.html"),"wb") as f:
+            f.write(res.content)
+        print(f"saved {symbol.upper()} ({len(res.content):,} bytes)")
+
+def fastPath(body):
+    price=extractPriceFast(body)
+    if price is None and QUOTE_CLOSE_MARKER in body:
+        return extractPriceSoup(body.decode("utf-8","replace")),True
+    return price,False
+
+def soupPath(body):
+    return extractPriceSoup(body.decode("utf-8","replace"))
+
+def measure(fn,body,repeat):
+    started=time.perf_counter()
+    for _ in range(repeat):
+        result=fn(body)
+    latency=(time.perf_counter()-started)/repeat
+    tracemalloc.start()
+    fn(body)
+    _,peak=tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result,latency,peak
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus",default=CORPUS_DIR)
+    parser.add_argument("--repeat",type=int,default=20,help="timed iterations per page and path")
+    parser.add_argument("--save",nargs="+",metavar="SYMBOL",help="download these company pages into the corpus first")
+    args=parser.parse_args()
+
+    if args.save:
+        savePages(args.save,args.corpus)
+
+    pages=sorted(name for name in os.listdir(args.corpus) if name.endswith(".html"))
+    if not pages:
+        print(f"No pages in {args.corpus}")
+        return 1
+
+    print(f"{'page':<16}{'bytes':>10}{'fast ms':>10}{'fast KiB':>10}{'soup ms':>10}{'soup KiB':>10}{'speedup':>9}  price")
+    mismatches=0
+    totals=[0.0,0.0]
+    for name in pages:
+        with open(os.path.join(args.corpus,name),"rb") as f:
+            body=f.read()
+        (fastPrice,fellBack),fastLatency,fastPeak=measure(fastPath,body,args.repeat)
+        soupPrice,soupLatency,soupPeak=measure(soupPath,body,args.repeat)
+        totals[0]+=fastLatency
+        totals[1]+=soupLatency
+        note=" (fallback)" if fellBack else ""
+        if fastPrice!=soupPrice:
+            mismatches+=1
+            note+=f"  MISMATCH soup={soupPrice}"
+        print(f"{name[:-5]:<16}{len(body):>10,}{fastLatency*1000:>10.3f}{fastPeak/1024:>10.1f}"
+              f"{soupLatency*1000:>10.3f}{soupPeak/1024:>10.1f}{soupLatency/max(fastLatency,1e-9):>8.1f}x  {fastPrice}{note}")
+
+    print(f"\n{len(pages)} pages: fast {totals[0]*1000:.2f} ms, soup {totals[1]*1000:.2f} ms, {mismatches} mismatches")
+    return 1 if mismatches else 0
+
+if __name__=="__main__":
+    sys.exit(main())
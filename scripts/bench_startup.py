@@ -0,0 +1,101 @@
+"""Benchmark cold-start import cost of the cron entry points.
+
+Imports each script in a fresh interpreter under `-X importtime`, with the
+Supabase credentials removed from the environment, and reports the median
+wall time, the module's cumulative import time and the heaviest top-level
+imports. Exits non-zero if an import fails without credentials or pulls in a
+module that should only load on demand (supabase, requests, bs4, dotenv,
+pytz, numpy).
+
+Usage:
+    python bench_startup.py                               # both entry points, 5 runs each
+    python bench_startup.py update_tables --repeat 10 --top 15
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+SCRIPTS_DIR=os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS=["daily_financial_summary","update_tables"]
+# Imported only once a query, scrape, fallback parse, delivery, time zone
+# conversion or report aggregation actually needs them
+DEFERRED=["supabase","requests","bs4","dotenv","pytz","numpy"]
+CREDENTIALS=["NEXT_PUBLIC_SUPABASE_URL","SUPABASE_SERVICE_ROLE_KEY","DISCORD_WEBHOOK_URL"]
+
+def parseImportTime(stderr):
+    """[(depth, package, self us, cumulative us)] from `-X importtime` output."""
+    entries=[]
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        selfUs,cumulativeUs,name=line[len("import time:"):].split("|")
+        depth=(len(name)-len(name.lstrip())-1)//2
+        entries.append((depth,name.strip(),int(selfUs),int(cumulativeUs)))
+    return entries
+
+def importOnce(module,env):
+    """(wall seconds, importtime entries, loaded module names) for one cold import of `module`."""
+    code=f"import sys,json,{module}; print(json.dumps(sorted(sys.modules)))"
+    started=time.perf_counter()
+    proc=subprocess.run([sys.executable,"-X","importtime","-c",code],cwd=SCRIPTS_DIR,env=env,
+                        capture_output=True,text=True)
+    wall=time.perf_counter()-started
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+    return wall,parseImportTime(proc.stderr),json.loads(proc.stdout.strip().splitlines()[-1])
+
+def bench(module,repeat,top,env):
+    walls=[]
+    totals=[]
+    heaviest={}
+    loaded=set()
+    for _ in range(repeat):
+        wall,entries,modules=importOnce(module,env)
+        walls.append(wall)
+        totals.append(next((cumulative for depth,name,_,cumulative in entries if depth==0 and name==module),0))
+        # Children are printed before their parent: the depth 1 entries since the previous
+        # top-level line are what the module itself imported
+        children=[]
+        for depth,name,_,cumulative in entries:
+            if depth==1:
+                children.append((name,cumulative))
+            elif depth==0:
+                if name==module:
+                    for child,childCumulative in children:
+                        heaviest.setdefault(child,[]).append(childCumulative)
+                children=[]
+        loaded.update(modules)
+    leaked=[name for name in DEFERRED if name in loaded]
+    print(f"{module}: wall {statistics.median(walls)*1000:.1f} ms, import {statistics.median(totals)/1000:.1f} ms "
+          f"(median of {repeat})")
+    ranked=sorted(((statistics.median(times),name) for name,times in heaviest.items()),reverse=True)[:top]
+    for cumulative,name in ranked:
+        print(f"  {name:<36}{cumulative/1000:>10.1f} ms")
+    if leaked:
+        print(f"  loaded at import: {', '.join(leaked)}")
+    return not leaked
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules",nargs="*",default=ENTRY_POINTS)
+    parser.add_argument("--repeat",type=int,default=5,help="cold imports per module")
+    parser.add_argument("--top",type=int,default=10,help="heaviest direct imports to list")
+    args=parser.parse_args()
+
+    env={key:value for key,value in os.environ.items() if key not in CREDENTIALS}
+    failures=0
+    for module in args.modules:
+        try:
+            failures+=not bench(module,args.repeat,args.top,env)
+        except RuntimeError as e:
+            print(f"{module}: import failed without credentials: {e}")
+            failures+=1
+    return 1 if failures else 0
+
+if __name__=="__main__":
+    sys.exit(main())
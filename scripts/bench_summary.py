@@ -0,0 +1,229 @@
+"""Benchmark the daily summary and the price refresher offline, at growing data sizes.
+
+For each scale, a seeded synthetic dataset is loaded into a MemorySupabase and
+the summary is run stage by stage:
+- user: the user lookup in the constructor;
+- load:<part>: each snapshot query, run sequentially so queries are
+  attributed to the right stage;
+- aggregate, render:text, render:discord and deliver:file.
+
+The first repetition starts with empty lot, series and price caches (cold);
+later ones reuse them (warm). For every stage the table shows cold and warm
+latency, queries, rows returned and tracemalloc peak memory (measured in a
+separate warm pass, since tracing slows things down). The refresher is
+benchmarked as one stage, pricing every listed symbol from a synthetic
+market-watch page. Latency includes the stand-in's own filtering and sorting,
+so compare runs with each other, not with production timings.
+
+`--save` writes the results as JSON. `--baseline` compares against a saved
+file and exits non-zero on a regression:
+- more queries than before;
+- warm latency or peak memory more than --tolerance above the baseline.
+Stages that take under --min-ms are too noisy to gate on latency.
+
+Usage:
+    python bench_summary.py                                  # 1k, 10k and 100k transactions
+    python bench_summary.py --scales 1000000 --repeat 2      # one user with 1M transactions
+    python bench_summary.py --save bench.json
+    python bench_summary.py --baseline bench.json --tolerance 0.3
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, List, Tuple
+
+# Lot books, value series, price history and the summary cache go to a scratch
+# directory, never the real caches; set before the modules read them at import
+SCRATCH = tempfile.mkdtemp(prefix="fynix-bench-")
+os.environ["LOT_STATE_DIR"] = os.path.join(SCRATCH, "lots")
+os.environ["PORTFOLIO_SERIES_DIR"] = os.path.join(SCRATCH, "series")
+os.environ["PSX_PRICE_HISTORY_DIR"] = os.path.join(SCRATCH, "prices")
+os.environ["SUMMARY_CACHE_PATH"] = os.path.join(SCRATCH, "summary_cache.sqlite")
+
+import daily_financial_summary as summary_module
+import update_tables
+from memory_supabase import MemorySupabase
+from summary_cache import SummaryCache
+from synthetic_data import generate, market_watch_html
+
+Stage = Tuple[str, Callable[[], Any]]
+
+
+def reset_scratch() -> None:
+    for name in ("lots", "series", "prices", "summary_cache.sqlite"):
+        path = os.path.join(SCRATCH, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def summary_stages(email: str, use_rollups: bool, use_cache: bool) -> List[Stage]:
+    """The summary's stages in run order; each closure reads what the previous ones produced"""
+    state: Dict[str, Any] = {}
+
+    def user():
+        cache = SummaryCache() if use_cache else None
+        state['summary'] = summary_module.DailyFinancialSummary(email, use_rollups=use_rollups, cache=cache)
+        state['results'] = {}
+
+    def loader(part: str) -> Callable[[], Any]:
+        def load():
+            state['results'][part] = state['summary']._snapshot_loaders()[part]()
+        return load
+
+    def aggregate():
+        state['summary'].use_snapshot(state['results'], {})
+
+    def render_text():
+        state['message'] = state['summary'].generate_summary_message()
+
+    def deliver():
+        state['summary'].save_to_file(state['message'], os.path.join(SCRATCH, "summary.txt"))
+
+    parts = list(summary_module.EMPTY_SNAPSHOT_PARTS)
+    stages: List[Stage] = []
+    if use_rollups:
+        stages.append(('rollups:refresh', summary_module.refresh_rollups))
+    return stages + [('user', user)] + [(f"load:{part}", loader(part)) for part in parts] + [
+        ('aggregate', aggregate),
+        ('render:text', render_text),
+        ('render:discord', lambda: state['summary'].discord_payload()),
+        ('deliver:file', deliver),
+    ]
+
+
+def refresher_stages(page_path: str) -> List[Stage]:
+    def refresh():
+        argv = sys.argv
+        sys.argv = ["update_tables.py", "--market-watch-file", page_path, "--ignore-market-hours", "--no-checkpoint"]
+        try:
+            update_tables.run(update_tables.parseArgs())
+        finally:
+            sys.argv = argv
+    return [('refresh', refresh)]
+
+
+def run_stages(client: MemorySupabase, stages: List[Stage], trace: bool) -> Dict[str, Dict[str, float]]:
+    measured = {}
+    for name, stage in stages:
+        client.reset_stats()
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        # Stages print progress lines; keep the table readable
+        with redirect_stdout(io.StringIO()):
+            stage()
+        elapsed = time.perf_counter() - started
+        peak = 0
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        measured[name] = {'ms': elapsed * 1000, 'queries': client.queries(),
+                          'rows': sum(client.rows_returned.values()), 'peak_kib': peak / 1024}
+    return measured
+
+
+def bench_scale(transactions: int, args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    client = MemorySupabase()
+    dataset = generate(client, users=1, transactions=transactions, seed=args.seed, holdings=args.holdings,
+                       symbols=args.symbols)
+    summary_module.supabase = client
+    update_tables.supabase = client
+    page_path = os.path.join(SCRATCH, "market_watch.html")
+    with open(page_path, "w", encoding="utf-8") as f:
+        f.write(market_watch_html(client.rows('psx_stocks'), args.seed))
+    email = dataset['users'][0]['email']
+    print(f"\n{transactions:,} transactions: dataset built in {dataset['seconds']:.2f}s")
+
+    def stages() -> List[Stage]:
+        return summary_stages(email, args.use_rollups, args.cache) + refresher_stages(page_path)
+
+    reset_scratch()
+    cold = run_stages(client, stages(), trace=False)
+    warm_runs = [run_stages(client, stages(), trace=False) for _ in range(max(args.repeat - 1, 1))]
+    traced = run_stages(client, stages(), trace=True)
+
+    results = {}
+    for name in cold:
+        results[name] = {
+            'cold_ms': round(cold[name]['ms'], 3),
+            'warm_ms': round(statistics.median(run[name]['ms'] for run in warm_runs), 3),
+            'queries': warm_runs[-1][name]['queries'],
+            'rows': warm_runs[-1][name]['rows'],
+            'peak_kib': round(traced[name]['peak_kib'], 1),
+        }
+    print(f"{'stage':<28}{'cold ms':>10}{'warm ms':>10}{'queries':>9}{'rows':>10}{'peak KiB':>11}")
+    for name, r in results.items():
+        print(f"{name:<28}{r['cold_ms']:>10,.1f}{r['warm_ms']:>10,.1f}{r['queries']:>9,}{r['rows']:>10,}{r['peak_kib']:>11,.1f}")
+    summary_names = [name for name in results if name != 'refresh']
+    print(f"{'summary total':<28}{sum(results[n]['cold_ms'] for n in summary_names):>10,.1f}"
+          f"{sum(results[n]['warm_ms'] for n in summary_names):>10,.1f}"
+          f"{sum(results[n]['queries'] for n in summary_names):>9,}{sum(results[n]['rows'] for n in summary_names):>10,}"
+          f"{max(results[n]['peak_kib'] for n in summary_names):>11,.1f}")
+    return results
+
+
+def regressions(results: Dict[str, Dict[str, Dict[str, float]]], baseline: Dict[str, Any],
+                tolerance: float, min_ms: float) -> List[str]:
+    found = []
+    for scale, stages in results.items():
+        for name, current in stages.items():
+            before = baseline.get(scale, {}).get(name)
+            if before is None:
+                continue
+            if current['queries'] > before['queries']:
+                found.append(f"{scale} {name}: {before['queries']} -> {current['queries']} queries")
+            if max(current['warm_ms'], before['warm_ms']) >= min_ms and current['warm_ms'] > before['warm_ms'] * (1 + tolerance):
+                found.append(f"{scale} {name}: warm {before['warm_ms']:.1f} -> {current['warm_ms']:.1f} ms")
+            if current['peak_kib'] > before['peak_kib'] * (1 + tolerance) + 64:
+                found.append(f"{scale} {name}: peak {before['peak_kib']:.0f} -> {current['peak_kib']:.0f} KiB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="transactions per user for each run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scale; the first is cold")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--holdings", type=int, default=30)
+    parser.add_argument("--symbols", type=int, default=500, help="rows in psx_stocks")
+    parser.add_argument("--use-rollups", action="store_true", help="benchmark the rollup-backed month figures")
+    parser.add_argument("--cache", action="store_true", help="benchmark with the local SQLite summary cache")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="fail if results regress against this saved JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown / memory growth")
+    parser.add_argument("--min-ms", type=float, default=5.0, help="ignore latency changes on stages faster than this")
+    args = parser.parse_args()
+
+    try:
+        results = {str(scale): bench_scale(scale, args) for scale in args.scales}
+    finally:
+        shutil.rmtree(SCRATCH, ignore_errors=True)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.save}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(results, json.load(f), args.tolerance, args.min_ms)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            return 1
+        print("\nno regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,584 @@
+"""
+Month-end accounting statements for every user, built incrementally.
+
+Rows from `transactions`, `invoices`, `stock_transactions`, `dividends` and
+`trading_fees` are posted to double-entry accounts, following the app's
+/api/books/journal route. Each calendar month then gets:
+- journal: one line per posting;
+- ledger: each account's opening balance, debits, credits and closing balance;
+- trial balance: each account's net balance at month end (cumulative, before
+  closing entries);
+- income statement: the month's revenue and expense accounts, and net income;
+- balance sheet: asset and liability balances at month end, with retained
+  earnings (net income to date) as the only equity;
+- cash flow: the Cash account's movements in the month, split into operating
+  and investing activities (stock buys and sells) as /api/books/cash_flow
+  does. Financing is always zero, since no source records it.
+
+One difference from the app: a sell is posted at its FIFO cost basis (matched
+by the lot engine), and the difference goes to "Revenue - Realized Gains". That
+way "Investments - Stocks" carries cost, not a running total of proceeds.
+
+Each user's sources are read in one streaming pass, merged in date order,
+starting after the last closed month. Every closed month's account activity,
+the running balances and the open FIFO lots are checkpointed to a JSON file,
+so the next month-end run reads only the new month's rows. A month is closed
+once it is over in Asia/Karachi. The current month can be computed, but it is
+never checkpointed.
+
+Before a checkpoint is reused, one query per source looks for rows dated in a
+closed month but created since the checkpoint was written (for invoices,
+updated since, as they get marked paid). If any turn up, that user's books
+are rebuilt from scratch. Deleted rows can't be found that way; `--rebuild`
+forces a rebuild.
+
+Re-exporting a month that is already closed takes its balances from the
+checkpoint. The checkpoint keeps only account totals, so the journal comes
+from re-reading that month's rows (and every stock trade up to its end, to
+rebuild the FIFO lots). If those postings don't add up to the checkpoint's
+totals, something changed that the late-row check can't see, such as a
+delete, and the user's books are rebuilt.
+
+Amounts are kept in integer paisa, so every period balances exactly. Each
+statement is written as one file per period, covering all users: CSV, or
+Parquet when pyarrow is installed.
+
+Usage:
+    python books.py                                # close last month for every user and export it
+    python books.py --period 2026-09 --emails me@example.com
+    python books.py --format parquet --output-dir exports
+    python books.py --rebuild                      # ignore checkpoints and replay every user's history
+"""
+
+import os
+import sys
+import csv
+import json
+import heapq
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from psx_calendar import nowPk
+from lot_engine import LotBook
+from supabase_stream import stream_rows
+from sync_state import write_json
+
+STATE_DIR = os.getenv("BOOKS_STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".books"))
+
+# source table: (date column, columns read)
+SOURCES = {
+    'transactions': ('date', 'id,type,amount,category,description,date,created_at'),
+    'invoices': ('invoice_date', 'id,invoice_number,client_name,status,type,total_amount,invoice_date,created_at,updated_at'),
+    'stock_transactions': ('transaction_date', 'id,symbol,transaction_type,shares,price_per_share,total_amount,transaction_date,created_at'),
+    'dividends': ('dividend_date', 'id,symbol,amount,description,dividend_date,created_at'),
+    'trading_fees': ('fee_date', 'id,fee_type,amount,description,fee_date,created_at'),
+}
+SOURCE_ORDER = {source: rank for rank, source in enumerate(SOURCES)}
+# Invoices move between accounts when their status changes, so edits count as well as inserts
+CHANGE_COLUMNS = {'invoices': 'updated_at'}
+# Rows committed shortly before a checkpoint's scan began may not have been in it
+LATE_MARGIN = timedelta(minutes=5)
+
+CASH = 'Cash'
+RECEIVABLE = 'Accounts Receivable'
+PAYABLE = 'Accounts Payable'
+STOCKS = 'Investments - Stocks'
+DIVIDENDS = 'Revenue - Dividends'
+GAINS = 'Revenue - Realized Gains'
+INVOICED_REVENUE = 'Revenue - Invoiced'
+INVOICED_EXPENSE = 'Expense - Invoiced'
+
+# (date, entry id, description, debit account, credit account, paisa)
+Posting = Tuple[str, str, str, str, str, int]
+
+COLUMNS = {
+    'journal': ('period', 'user_id', 'date', 'entry_id', 'description', 'debit_account', 'credit_account', 'amount'),
+    'ledger': ('period', 'user_id', 'account', 'type', 'opening', 'debits', 'credits', 'closing'),
+    'trial_balance': ('period', 'user_id', 'account', 'type', 'debit', 'credit'),
+    'income_statement': ('period', 'user_id', 'section', 'account', 'amount'),
+    'balance_sheet': ('period', 'user_id', 'section', 'account', 'amount'),
+    'cash_flow': ('period', 'user_id', 'section', 'account', 'amount'),
+}
+AMOUNT_COLUMNS = {'amount', 'opening', 'debits', 'credits', 'closing', 'debit', 'credit'}
+
+
+def paisa(value: Any) -> int:
+    return int(round(float(value) * 100))
+
+
+def money(value: int) -> Decimal:
+    return Decimal(value).scaleb(-2)
+
+
+def account_type(account: str) -> str:
+    if account.startswith('Revenue - '):
+        return 'revenue'
+    if account.startswith('Expense - '):
+        return 'expense'
+    return 'liability' if account == PAYABLE else 'asset'
+
+
+def next_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12}-{number % 12 + 1:02d}"
+
+
+def month_end(month: str) -> str:
+    return (date.fromisoformat(f"{next_month(month)}-01") - timedelta(days=1)).isoformat()
+
+
+def post(source: str, row: Dict[str, Any], lots: LotBook) -> List[Posting]:
+    """Double-entry postings for one source row, as /api/books/journal posts them"""
+    if source == 'transactions':
+        amount = paisa(row['amount'])
+        if row['type'] == 'income':
+            return [(row['date'], f"txn-{row['id']}", row.get('description') or f"{row['category']} income",
+                     CASH, f"Revenue - {row['category']}", amount)]
+        return [(row['date'], f"txn-{row['id']}", row.get('description') or f"{row['category']} expense",
+                 f"Expense - {row['category']}", CASH, amount)]
+
+    if source == 'invoices':
+        amount = paisa(row['total_amount'])
+        paid = row['status'] == 'paid'
+        label = f"Invoice #{row['invoice_number']} - {row['client_name']}"
+        if row['type'] == 'income':
+            return [(row['invoice_date'], f"inv-{row['id']}", label + (' (Paid)' if paid else ''),
+                     CASH if paid else RECEIVABLE, INVOICED_REVENUE, amount)]
+        return [(row['invoice_date'], f"inv-{row['id']}", 'Expense ' + label + (' (Paid)' if paid else ''),
+                 INVOICED_EXPENSE, CASH if paid else PAYABLE, amount)]
+
+    if source == 'stock_transactions':
+        day, entry = row['transaction_date'], f"stock-{row['id']}"
+        proceeds = paisa(row['total_amount'])
+        shares = f"{float(row['shares']):g} shares of {row['symbol'].upper()}"
+        realized = lots.lifetime['realized']
+        lots.apply_trade(row)
+        if row['transaction_type'] == 'buy':
+            return [(day, entry, f"Buy {shares}", STOCKS, CASH, proceeds)]
+        gain = paisa(lots.lifetime['realized'] - realized)
+        if gain >= 0:
+            postings = [(day, entry, f"Sell {shares}", CASH, STOCKS, proceeds - gain),
+                        (day, entry, f"Sell {shares}: realized gain", CASH, GAINS, gain)]
+        else:
+            postings = [(day, entry, f"Sell {shares}", CASH, STOCKS, proceeds),
+                        (day, entry, f"Sell {shares}: realized loss", GAINS, STOCKS, -gain)]
+        return [p for p in postings if p[5]]
+
+    if source == 'dividends':
+        return [(row['dividend_date'], f"div-{row['id']}", row.get('description') or f"Dividend - {row['symbol'].upper()}",
+                 CASH, DIVIDENDS, paisa(row['amount']))]
+
+    return [(row['fee_date'], f"fee-{row['id']}", row.get('description') or f"Trading fee - {row['fee_type']}",
+             f"Expense - {row['fee_type']}", CASH, paisa(row['amount']))]
+
+
+def _entry_order(rows: Iterator[Dict[str, Any]], date_column: str) -> Iterator[Dict[str, Any]]:
+    """Re-sort each day's trades by when they were entered; FIFO matching depends on it"""
+    day: List[Dict[str, Any]] = []
+    for row in rows:
+        if day and row[date_column] != day[0][date_column]:
+            yield from sorted(day, key=lambda r: (r['created_at'], str(r['id'])))
+            day = []
+        day.append(row)
+    yield from sorted(day, key=lambda r: (r['created_at'], str(r['id'])))
+
+
+class Books:
+    """One user's checkpoint: each closed month's activity, balances at the last close and the open lots then"""
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.closed_through: Optional[str] = state.get('closed_through')
+        # When the scan behind the checkpoint started; later rows dated before closed_through are late
+        self.scanned_at: Optional[str] = state.get('scanned_at')
+        # {account: net debit paisa} through closed_through
+        self.balances: Dict[str, int] = state.get('balances', {})
+        # {month: {account: [debit paisa, credit paisa]}}
+        self.periods: Dict[str, Dict[str, List[int]]] = state.get('periods', {})
+        self.lots: Dict[str, Any] = state.get('lots', {})
+
+    def to_state(self) -> Dict[str, Any]:
+        return {'closed_through': self.closed_through, 'scanned_at': self.scanned_at, 'balances': self.balances,
+                'periods': self.periods, 'lots': self.lots}
+
+    def opening(self, month: str) -> Dict[str, int]:
+        """Net balances at the start of a closed month, from the checkpointed activity before it"""
+        balances: Dict[str, int] = {}
+        for period, activity in self.periods.items():
+            if period < month:
+                for account, (debit, credit) in activity.items():
+                    balances[account] = balances.get(account, 0) + debit - credit
+        return balances
+
+
+class StatementEngine:
+    def __init__(self, client: Any, state_dir: str = STATE_DIR, today: Optional[date] = None):
+        self.client = client
+        self.state_dir = state_dir
+        today = today or nowPk().date()
+        # Months before this one are over and can be closed
+        self.open_month = today.strftime('%Y-%m')
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _path(self, user_id: str) -> str:
+        return os.path.join(self.state_dir, f"{user_id}.json")
+
+    def load(self, user_id: str) -> Optional[Books]:
+        try:
+            with open(self._path(user_id), encoding='utf-8') as f:
+                return Books(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, user_id: str, books: Books) -> None:
+        path = self._path(user_id)
+        write_json(path, books.to_state())
+
+    def _has_late_rows(self, user_id: str, books: Books) -> bool:
+        """Whether rows dated in a closed month were added (or invoices edited) after the checkpoint's scan"""
+        since = (datetime.fromisoformat(books.scanned_at) - LATE_MARGIN).isoformat()
+        through = month_end(books.closed_through)
+        for source, (date_column, _) in SOURCES.items():
+            response = self.client.table(source).select('id').eq('user_id', user_id).lte(date_column, through).gte(
+                CHANGE_COLUMNS.get(source, 'created_at'), since
+            ).limit(1).execute()
+            if response.data:
+                return True
+        return False
+
+    def _entries(self, user_id: str, since: Dict[str, Optional[str]], through: str) -> Iterator[Tuple[Tuple, str, Dict[str, Any]]]:
+        """Every source's rows dated from `since[source]` (None: the start) to `through`, merged in date order"""
+        return heapq.merge(*(self._source_rows(source, user_id, since[source], through) for source in SOURCES),
+                           key=lambda entry: entry[0])
+
+    def _source_rows(self, source: str, user_id: str, since: Optional[str], through: str) -> Iterator[Tuple[Tuple, str, Dict[str, Any]]]:
+        """(merge key, source, row) in date order; same-day trades in the order they were entered, as FIFO needs"""
+        date_column, columns = SOURCES[source]
+        rank = SOURCE_ORDER[source]
+
+        def query():
+            select = self.client.table(source).select(columns).eq('user_id', user_id).lte(date_column, through)
+            return select.gte(date_column, since) if since else select
+
+        rows = stream_rows(query, keys=(date_column, 'id'))
+        if source == 'stock_transactions':
+            rows = _entry_order(rows, date_column)
+        for sequence, row in enumerate(rows):
+            yield (row[date_column], rank, sequence), source, row
+
+    def _closed_journal(self, user_id: str, period: str) -> Tuple[List[Posting], Dict[str, List[int]], int]:
+        """A closed month's journal and activity, re-read from its rows; stock trades are replayed from the start for FIFO"""
+        start = f"{period}-01"
+        since = {source: None if source == 'stock_transactions' else start for source in SOURCES}
+        lots = LotBook()
+        journal: List[Posting] = []
+        activity: Dict[str, List[int]] = {}
+        rows = 0
+        for _, source, row in self._entries(user_id, since, month_end(period)):
+            rows += 1
+            for posting in post(source, row, lots):
+                if posting[0] >= start:
+                    journal.append(posting)
+                    activity.setdefault(posting[3], [0, 0])[0] += posting[5]
+                    activity.setdefault(posting[4], [0, 0])[1] += posting[5]
+        return journal, activity, rows
+
+    def build(self, user_id: str, period: str, rebuild: bool = False) -> Dict[str, Any]:
+        """Statements' inputs for `period`: opening balances, the month's activity and its journal.
+
+        Months between the checkpoint and `period` are read in the same pass and
+        closed as it moves past them.
+        """
+        books = None if rebuild else self.load(user_id)
+        if books is not None and books.closed_through and self._has_late_rows(user_id, books):
+            books = None
+        books = books or Books()
+        if books.closed_through and period <= books.closed_through:
+            journal, activity, rows = self._closed_journal(user_id, period)
+            if activity != books.periods.get(period, {}):
+                return self.build(user_id, period, rebuild=True)
+            return {'period': period, 'opening': books.opening(period), 'activity': activity,
+                    'journal': journal, 'rows': rows, 'reused': True}
+
+        scanned_at = datetime.now(timezone.utc).isoformat()
+        start = f"{next_month(books.closed_through)}-01" if books.closed_through else None
+        entries = self._entries(user_id, {source: start for source in SOURCES}, month_end(period))
+        lots = LotBook(json.loads(json.dumps(books.lots)) if books.lots else None)
+        balances = dict(books.balances)
+        pending = next(entries, None)
+        month = books.closed_through and next_month(books.closed_through)
+        if month is None:
+            month = min(pending[0][0][:7], period) if pending else period
+
+        rows = 0
+        result: Dict[str, Any] = {}
+        closed = False
+        while month <= period:
+            opening = dict(balances)
+            activity: Dict[str, List[int]] = {}
+            journal: List[Posting] = []
+            while pending is not None and pending[0][0][:7] == month:
+                _, source, row = pending
+                rows += 1
+                for posting in post(source, row, lots):
+                    _, _, _, debit, credit, amount = posting
+                    activity.setdefault(debit, [0, 0])[0] += amount
+                    activity.setdefault(credit, [0, 0])[1] += amount
+                    balances[debit] = balances.get(debit, 0) + amount
+                    balances[credit] = balances.get(credit, 0) - amount
+                    if month == period:
+                        journal.append(posting)
+                pending = next(entries, None)
+            if month < self.open_month:
+                books.periods[month] = activity
+                books.balances = dict(balances)
+                books.lots = json.loads(json.dumps(lots.to_state()))
+                books.closed_through = month
+                closed = True
+            if month == period:
+                result = {'period': period, 'opening': opening, 'activity': activity, 'journal': journal,
+                          'rows': rows, 'reused': False}
+            month = next_month(month)
+        if closed:
+            books.scanned_at = scanned_at
+            self.save(user_id, books)
+        return result
+
+
+def journal_rows(user_id: str, built: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'period': built['period'], 'user_id': user_id, 'date': day, 'entry_id': entry, 'description': description,
+             'debit_account': debit, 'credit_account': credit, 'amount': money(amount)}
+            for day, entry, description, debit, credit, amount in built['journal']]
+
+
+def ledger_rows(user_id: str, built: Dict[str, Any]) -> List[Dict[str, Any]]:
+    opening, activity = built['opening'], built['activity']
+    rows = []
+    for account in sorted(set(opening) | set(activity)):
+        debit, credit = activity.get(account, (0, 0))
+        start = opening.get(account, 0)
+        if not (start or debit or credit):
+            continue
+        rows.append({'period': built['period'], 'user_id': user_id, 'account': account, 'type': account_type(account),
+                     'opening': money(start), 'debits': money(debit), 'credits': money(credit),
+                     'closing': money(start + debit - credit)})
+    return rows
+
+
+def trial_balance_rows(user_id: str, built: Dict[str, Any]) -> List[Dict[str, Any]]:
+    closing = dict(built['opening'])
+    for account, (debit, credit) in built['activity'].items():
+        closing[account] = closing.get(account, 0) + debit - credit
+    return [{'period': built['period'], 'user_id': user_id, 'account': account, 'type': account_type(account),
+             'debit': money(max(balance, 0)), 'credit': money(max(-balance, 0))}
+            for account, balance in sorted(closing.items()) if balance]
+
+
+def income_statement_rows(user_id: str, built: Dict[str, Any]) -> List[Dict[str, Any]]:
+    revenue = {account: credit - debit for account, (debit, credit) in built['activity'].items()
+               if account_type(account) == 'revenue'}
+    expenses = {account: debit - credit for account, (debit, credit) in built['activity'].items()
+                if account_type(account) == 'expense'}
+
+    def line(section: str, account: str, amount: int) -> Dict[str, Any]:
+        return {'period': built['period'], 'user_id': user_id, 'section': section, 'account': account, 'amount': money(amount)}
+
+    return ([line('revenue', account, amount) for account, amount in sorted(revenue.items())]
+            + [line('total', 'Total Revenue', sum(revenue.values()))]
+            + [line('expenses', account, amount) for account, amount in sorted(expenses.items())]
+            + [line('total', 'Total Expenses', sum(expenses.values())),
+               line('total', 'Net Income', sum(revenue.values()) - sum(expenses.values()))])
+
+
+def balance_sheet_rows(user_id: str, built: Dict[str, Any]) -> List[Dict[str, Any]]:
+    closing = dict(built['opening'])
+    for account, (debit, credit) in built['activity'].items():
+        closing[account] = closing.get(account, 0) + debit - credit
+    assets = {account: balance for account, balance in closing.items() if account_type(account) == 'asset' and balance}
+    liabilities = {account: -balance for account, balance in closing.items() if account_type(account) == 'liability' and balance}
+    # Revenue and expense balances are still open before closing entries; together they are the retained earnings
+    retained = -sum(balance for account, balance in closing.items() if account_type(account) in ('revenue', 'expense'))
+
+    def line(section: str, account: str, amount: int) -> Dict[str, Any]:
+        return {'period': built['period'], 'user_id': user_id, 'section': section, 'account': account, 'amount': money(amount)}
+
+    return ([line('assets', account, amount) for account, amount in sorted(assets.items())]
+            + [line('total', 'Total Assets', sum(assets.values()))]
+            + [line('liabilities', account, amount) for account, amount in sorted(liabilities.items())]
+            + [line('total', 'Total Liabilities', sum(liabilities.values())),
+               line('equity', 'Retained Earnings', retained),
+               line('total', 'Total Equity', retained),
+               line('total', 'Total Liabilities and Equity', sum(liabilities.values()) + retained)])
+
+
+def cash_flow_rows(user_id: str, built: Dict[str, Any]) -> List[Dict[str, Any]]:
+    flows = {'Cash received': 0, 'Cash paid': 0, 'Investments purchased': 0, 'Investments sold': 0}
+    for _, _, _, debit, credit, amount in built['journal']:
+        if debit == CASH:
+            flows['Investments sold' if credit in (STOCKS, GAINS) else 'Cash received'] += amount
+        elif credit == CASH:
+            flows['Investments purchased' if debit == STOCKS else 'Cash paid'] -= amount
+    operating = flows['Cash received'] + flows['Cash paid']
+    investing = flows['Investments purchased'] + flows['Investments sold']
+    beginning = built['opening'].get(CASH, 0)
+
+    def line(section: str, account: str, amount: int) -> Dict[str, Any]:
+        return {'period': built['period'], 'user_id': user_id, 'section': section, 'account': account, 'amount': money(amount)}
+
+    return [line('operating', 'Cash received', flows['Cash received']),
+            line('operating', 'Cash paid', flows['Cash paid']),
+            line('total', 'Net Cash from Operating Activities', operating),
+            line('investing', 'Investments purchased', flows['Investments purchased']),
+            line('investing', 'Investments sold', flows['Investments sold']),
+            line('total', 'Net Cash from Investing Activities', investing),
+            line('total', 'Net Cash from Financing Activities', 0),
+            line('total', 'Net Cash Flow', operating + investing),
+            line('total', 'Beginning Cash', beginning),
+            line('total', 'Ending Cash', beginning + operating + investing)]
+
+
+STATEMENTS = {
+    'journal': journal_rows,
+    'ledger': ledger_rows,
+    'trial_balance': trial_balance_rows,
+    'income_statement': income_statement_rows,
+    'balance_sheet': balance_sheet_rows,
+    'cash_flow': cash_flow_rows,
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class StatementWriter:
+    """Appends each statement's rows to one file per statement: CSV, or Parquet (needs pyarrow)"""
+
+    def __init__(self, directory: str, fmt: str = 'csv'):
+        self.directory = directory
+        self.fmt = fmt
+        self.paths: Dict[str, str] = {}
+        self._files: Dict[str, Any] = {}
+        self._writers: Dict[str, Any] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _schema(self, statement: str) -> Any:
+        import pyarrow as pa
+        return pa.schema([(column, pa.decimal128(15, 2) if column in AMOUNT_COLUMNS else pa.string())
+                          for column in COLUMNS[statement]])
+
+    def write(self, statement: str, rows: List[Dict[str, Any]]) -> None:
+        if statement not in self._writers:
+            path = self.paths[statement] = os.path.join(self.directory, f"{statement}.{self.fmt}")
+            if self.fmt == 'parquet':
+                import pyarrow.parquet as pq
+                self._writers[statement] = pq.ParquetWriter(path, self._schema(statement), compression='zstd')
+            else:
+                handle = self._files[statement] = open(path, 'w', encoding='utf-8', newline='')
+                self._writers[statement] = csv.DictWriter(handle, fieldnames=COLUMNS[statement])
+                self._writers[statement].writeheader()
+        if not rows:
+            return
+        if self.fmt == 'parquet':
+            import pyarrow as pa
+            self._writers[statement].write_table(pa.Table.from_pylist(rows, schema=self._schema(statement)))
+        else:
+            self._writers[statement].writerows(rows)
+
+    def close(self) -> Dict[str, str]:
+        for writer in self._writers.values():
+            if self.fmt == 'parquet':
+                writer.close()
+        for handle in self._files.values():
+            handle.close()
+        return self.paths
+
+
+def previous_month(today: Optional[date] = None) -> str:
+    today = today or nowPk().date()
+    return (today.replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+
+
+def run_statements(engine: StatementEngine, users: List[Dict[str, Any]], period: str, output_dir: str,
+                   fmt: str = 'csv', workers: int = 4, rebuild: bool = False) -> Dict[str, Any]:
+    """Build and export `period` for every user; returns the manifest, also written next to the files"""
+    started = time.perf_counter()
+    directory = os.path.join(output_dir, period)
+    writer = StatementWriter(directory, fmt)
+    entries: Dict[str, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='books') as pool:
+        futures = {pool.submit(engine.build, user['id'], period, rebuild): user for user in users}
+        for future in as_completed(futures):
+            user = futures[future]
+            entry: Dict[str, Any] = {'email': user['email'], 'user_id': user['id']}
+            try:
+                built = future.result()
+            except Exception as e:
+                entries[user['email']] = dict(entry, status='failed', error=str(e) or type(e).__name__)
+                continue
+            # Writes stay on this thread, so files are appended one user at a time
+            for statement, rows_for in STATEMENTS.items():
+                writer.write(statement, rows_for(user['id'], built))
+            totals = [0, 0]
+            for debit, credit in built['activity'].values():
+                totals[0] += debit
+                totals[1] += credit
+            entries[user['email']] = dict(entry, status='ok', rows_read=built['rows'], from_checkpoint=built['reused'],
+                                          balanced=totals[0] == totals[1])
+    paths = writer.close()
+    manifest = {
+        'period': period,
+        'format': fmt,
+        'duration_seconds': round(time.perf_counter() - started, 3),
+        'succeeded': sum(1 for e in entries.values() if e['status'] == 'ok'),
+        'failed': sum(1 for e in entries.values() if e['status'] != 'ok'),
+        'files': {statement: os.path.basename(path) for statement, path in paths.items()},
+        'users': sorted(entries.values(), key=lambda e: e['email']),
+    }
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and export month-end accounting statements")
+    parser.add_argument("--period", default=None, help="month to build, YYYY-MM (default: last month)")
+    parser.add_argument("--emails", nargs="*", help="only these users (default: every user)")
+    parser.add_argument("--output-dir", default="statements", help="files go to <output-dir>/<period>/")
+    parser.add_argument("--format", choices=("auto", "csv", "parquet"), default="auto",
+                        help="auto writes Parquet when pyarrow is installed, CSV otherwise")
+    parser.add_argument("--workers", type=int, default=4, help="users built at once")
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="ignore checkpoints and replay every user's history")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt == 'auto':
+        fmt = 'parquet' if parquet_available() else 'csv'
+    elif fmt == 'parquet' and not parquet_available():
+        print("❌ Parquet output needs pyarrow (pip install pyarrow)")
+        return 1
+    period = args.period or previous_month()
+
+    from daily_financial_summary import supabase, BatchSummaryLoader
+    users, missing = BatchSummaryLoader().load_users(args.emails or None)
+    for email in missing:
+        print(f"⚠️  No user with email {email}")
+    print(f"🔄 Building {period} statements for {len(users)} users")
+    manifest = run_statements(StatementEngine(supabase, args.state_dir), users, period, args.output_dir, fmt,
+                              args.workers, args.rebuild)
+    print(f"📋 {manifest['succeeded']} succeeded, {manifest['failed']} failed in {manifest['duration_seconds']}s")
+    print(f"📋 Files written to: {os.path.join(args.output_dir, period)}")
+    return 0 if manifest['failed'] == 0 and not missing else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
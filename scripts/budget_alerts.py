@@ -0,0 +1,428 @@
+"""
+Incremental budget and recurring-payment alerts.
+
+The daily summary rebuilds budget status and the "due within 2 days" list
+from scratch once a day. `AlertEvaluator.check()` instead follows three change
+feeds past created_at/updated_at watermarks:
+- new `transactions` add to running month-to-date spend counters per
+  (user, category);
+- new or edited monthly `budgets` change the limits the counters are held to;
+- new or edited `recurring_payments` update the index of active payments.
+
+A budget alert fires when a category's spend goes over 80% of its budget and
+again when it goes over 100% (the summary's `warning` and `over_budget`).
+Dropping back under a threshold re-arms it. A payment alert fires once per due
+date, when the date comes within DUE_WINDOW_DAYS. A check costs one delta
+query per feed, plus one month-to-date read per user the counters haven't
+seen this month. That keeps it cheap enough to run every few minutes.
+
+The counters only see inserts. Edited and deleted transactions are caught
+when a user's counters are re-read from the month's rows, which happens at the
+start of each month and once they are older than RESEED_HOURS. Thresholds
+found already crossed at that point are recorded without alerting; the daily
+summary still reports them. The payment index is reloaded on the same
+schedule, which drops deleted payments.
+
+Usage:
+    python budget_alerts.py                # one check; alerts go to ALERTS_WEBHOOK_URL or DISCORD_WEBHOOK_URL
+    python budget_alerts.py --dry-run      # print alerts without sending them or saving state
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from psx_calendar import nowPk
+from supabase_stream import stream_rows
+from sync_state import WATERMARK_OVERLAP, write_json
+
+STATE_DIR = os.getenv("BUDGET_ALERT_STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".budget_alerts"))
+RESEED_HOURS = float(os.getenv("BUDGET_ALERT_RESEED_HOURS", "24"))
+
+# Percent of the budget; the summary's `warning` and `over_budget`
+THRESHOLDS = (80, 100)
+# Matches the summary's "Upcoming Payments (Next 2 Days)"
+DUE_WINDOW_DAYS = 2
+
+FEEDS = {
+    'transactions': ('created_at', 'id,user_id,type,amount,category,date,created_at'),
+    'budgets': ('updated_at', 'id,user_id,category,budget_amount,period,updated_at'),
+    'recurring_payments': ('updated_at', 'id,user_id,name,category,amount,next_payment_date,status,updated_at'),
+}
+
+
+def _key(row: Dict[str, Any], stamp: str) -> str:
+    # Budgets and payments come round again when edited; each version is applied once
+    return f"{row['id']}@{row[stamp]}"
+
+
+class FeedState:
+    """Watermarks for each feed, plus the active recurring payments and users with future-dated spend"""
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.watermarks: Dict[str, Optional[str]] = state.get('watermarks', {feed: None for feed in FEEDS})
+        # {feed: {key: stamp}} for rows inside the overlap window behind each watermark
+        self.recent: Dict[str, Dict[str, str]] = state.get('recent', {feed: {} for feed in FEEDS})
+        # {payment_id: {user_id, name, amount, next_payment_date, alerted_for}}
+        self.payments: Dict[str, Dict[str, Any]] = state.get('payments', {})
+        self.payments_loaded_at: Optional[str] = state.get('payments_loaded_at')
+        # {user_id: earliest future-dated expense still waiting to count}
+        self.pending_users: Dict[str, str] = state.get('pending_users', {})
+
+    def to_state(self) -> Dict[str, Any]:
+        return {'watermarks': self.watermarks, 'recent': self.recent, 'payments': self.payments,
+                'payments_loaded_at': self.payments_loaded_at, 'pending_users': self.pending_users}
+
+    def since(self, feed: str) -> Optional[str]:
+        watermark = self.watermarks.get(feed)
+        return (datetime.fromisoformat(watermark) - WATERMARK_OVERLAP).isoformat() if watermark else None
+
+    def fresh(self, feed: str, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        stamp = FEEDS[feed][0]
+        seen = self.recent.get(feed, {})
+        return [row for row in rows if _key(row, stamp) not in seen]
+
+    def advance(self, feed: str, rows: List[Dict[str, Any]]) -> None:
+        """Move a feed's watermark past `rows`, remembering keys inside the overlap window"""
+        stamp = FEEDS[feed][0]
+        stamps = [row[stamp] for row in rows]
+        if self.watermarks.get(feed):
+            stamps.append(self.watermarks[feed])
+        if not stamps:
+            return
+        newest = max(stamps, key=datetime.fromisoformat)
+        cutoff = datetime.fromisoformat(newest) - WATERMARK_OVERLAP
+        recent = dict(self.recent.get(feed, {}))
+        recent.update((_key(row, stamp), row[stamp]) for row in rows)
+        self.watermarks[feed] = newest
+        self.recent[feed] = {key: value for key, value in recent.items() if datetime.fromisoformat(value) >= cutoff}
+
+
+class UserCounters:
+    """One user's month-to-date expense per category, monthly budgets and the thresholds already alerted"""
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.month: Optional[str] = state.get('month')
+        self.seeded_at: Optional[str] = state.get('seeded_at')
+        self.spent: Dict[str, float] = state.get('spent', {})
+        self.budgets: Dict[str, float] = state.get('budgets', {})
+        self.fired: Dict[str, List[int]] = state.get('fired', {})
+        # [[date, category, amount], ...] expenses dated later this month; they count once the date arrives
+        self.pending: List[List[Any]] = state.get('pending', [])
+
+    def to_state(self) -> Dict[str, Any]:
+        return {'month': self.month, 'seeded_at': self.seeded_at, 'spent': self.spent, 'budgets': self.budgets,
+                'fired': self.fired, 'pending': self.pending}
+
+    def add_expense(self, row: Dict[str, Any], today: date) -> Optional[str]:
+        """Count an expense dated this month; returns its category, or None if it doesn't count (yet)"""
+        if row['type'] != 'expense' or row['date'][:7] != self.month:
+            return None
+        if row['date'] > today.isoformat():
+            self.pending.append([row['date'], row['category'], float(row['amount'])])
+            return None
+        self.spent[row['category']] = self.spent.get(row['category'], 0.0) + float(row['amount'])
+        return row['category']
+
+    def release_pending(self, today: date) -> Set[str]:
+        """Count pending expenses whose date has arrived; returns the categories they touched"""
+        due = [entry for entry in self.pending if entry[0] <= today.isoformat()]
+        self.pending = [entry for entry in self.pending if entry[0] > today.isoformat()]
+        for _, category, amount in due:
+            self.spent[category] = self.spent.get(category, 0.0) + amount
+        return {category for _, category, _ in due}
+
+    def evaluate(self, categories: Iterable[str], user_id: str, silent: bool = False) -> List[Dict[str, Any]]:
+        """Alerts for thresholds newly crossed in `categories`; thresholds no longer crossed are re-armed"""
+        alerts = []
+        for category in sorted(categories):
+            budget = self.budgets.get(category)
+            if budget is None:
+                continue
+            spent = self.spent.get(category, 0.0)
+            fired = set(self.fired.get(category, []))
+            crossed = {level for level in THRESHOLDS if spent > budget * level / 100}
+            new = crossed - fired
+            self.fired[category] = sorted(crossed)
+            if new and not silent:
+                # A jump straight past 100% is one alert, not two
+                alerts.append({
+                    'kind': 'budget', 'user_id': user_id, 'category': category, 'level': max(new),
+                    'spent': round(spent, 2), 'budget': budget,
+                    'percentage': round(spent / budget * 100, 1) if budget > 0 else None,
+                })
+        return alerts
+
+
+class AlertEvaluator:
+    def __init__(self, client: Any, state_dir: str = STATE_DIR, reseed_hours: float = RESEED_HOURS):
+        self.client = client
+        self.state_dir = state_dir
+        self.reseed_after = timedelta(hours=reseed_hours)
+        # Kept between checks when the evaluator lives in the scheduler; reread from disk otherwise
+        self.feed: Optional[FeedState] = None
+        self.users: Dict[str, UserCounters] = {}
+        # Set by a check that found no saved state and only started following the feeds
+        self.primed = False
+        os.makedirs(os.path.join(state_dir, 'users'), exist_ok=True)
+
+    def _feed_path(self) -> str:
+        return os.path.join(self.state_dir, 'feed.json')
+
+    def _user_path(self, user_id: str) -> str:
+        return os.path.join(self.state_dir, 'users', f"{user_id}.json")
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _latest(self, feed: str) -> Optional[str]:
+        stamp = FEEDS[feed][0]
+        response = self.client.table(feed).select(stamp).order(stamp, desc=True).limit(1).execute()
+        return response.data[0][stamp] if response.data else None
+
+    def _rows(self, feed: str, since: str) -> List[Dict[str, Any]]:
+        stamp, columns = FEEDS[feed]
+        return list(stream_rows(lambda: self.client.table(feed).select(columns).gte(stamp, since), keys=(stamp, 'id')))
+
+    def _apply_payments(self, feed: FeedState, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            if row.get('status', 'active') != 'active':
+                feed.payments.pop(str(row['id']), None)
+                continue
+            entry = feed.payments.setdefault(str(row['id']), {})
+            entry.update(user_id=row['user_id'], name=row['name'], category=row['category'],
+                         amount=float(row['amount']), next_payment_date=row['next_payment_date'])
+
+    def _load_payments(self, feed: FeedState) -> None:
+        """Rebuild the payment index from every active payment, keeping which due dates were alerted"""
+        previous = feed.payments
+        feed.payments = {}
+        self._apply_payments(feed, list(stream_rows(lambda: self.client.table('recurring_payments').select(
+            FEEDS['recurring_payments'][1]
+        ).eq('status', 'active'))))
+        for payment_id, payment in feed.payments.items():
+            if 'alerted_for' in previous.get(payment_id, {}):
+                payment['alerted_for'] = previous[payment_id]['alerted_for']
+        feed.payments_loaded_at = datetime.now(timezone.utc).isoformat()
+
+    def _stale(self, stamp: Optional[str]) -> bool:
+        return not stamp or datetime.now(timezone.utc) - datetime.fromisoformat(stamp) > self.reseed_after
+
+    def _payment_alerts(self, feed: FeedState, today: date, silent: bool = False) -> List[Dict[str, Any]]:
+        """Payments whose due date has come within the window since they were last alerted"""
+        alerts = []
+        horizon = (today + timedelta(days=DUE_WINDOW_DAYS)).isoformat()
+        for payment_id, payment in feed.payments.items():
+            due = payment['next_payment_date']
+            if payment.get('alerted_for') == due or not today.isoformat() <= due <= horizon:
+                continue
+            payment['alerted_for'] = due
+            if not silent:
+                alerts.append({
+                    'kind': 'payment', 'user_id': payment['user_id'], 'payment_id': payment_id,
+                    'name': payment['name'], 'category': payment['category'], 'amount': payment['amount'],
+                    'next_payment_date': due, 'days': (date.fromisoformat(due) - today).days,
+                })
+        return sorted(alerts, key=lambda alert: (alert['next_payment_date'], alert['name']))
+
+    def prime(self, today: date) -> FeedState:
+        """Start following the feeds from now; what is already over budget or due is not alerted"""
+        feed = FeedState()
+        for name in FEEDS:
+            feed.watermarks[name] = self._latest(name)
+            if feed.watermarks[name]:
+                # Rows inside the overlap behind the mark come back on the next check; they aren't new
+                feed.advance(name, self._rows(name, feed.since(name)))
+        self._load_payments(feed)
+        self._payment_alerts(feed, today, silent=True)
+        return feed
+
+    def _seed(self, user_id: str, today: date, feed: FeedState, exclude: Set[str],
+              previous: Optional[UserCounters]) -> UserCounters:
+        """Read a user's month-to-date expenses and budgets, leaving out this check's fresh rows"""
+        month = today.strftime('%Y-%m')
+        counters = UserCounters({'month': month, 'seeded_at': datetime.now(timezone.utc).isoformat()})
+        if previous is not None and previous.month == month:
+            counters.fired = previous.fired
+        rows = [row for row in stream_rows(lambda: self.client.table('transactions').select(FEEDS['transactions'][1]).eq(
+            'user_id', user_id
+        ).eq('type', 'expense').gte('date', f"{month}-01"), keys=('date', 'id')) if str(row['id']) not in exclude]
+        for row in rows:
+            counters.add_expense(row, today)
+        # Rows seeded here may still turn up in the feed's overlap window; don't count them twice
+        cutoff = feed.since('transactions')
+        if cutoff:
+            recent = feed.recent.setdefault('transactions', {})
+            recent.update((_key(row, 'created_at'), row['created_at']) for row in rows
+                          if datetime.fromisoformat(row['created_at']) >= datetime.fromisoformat(cutoff))
+        for budget in stream_rows(lambda: self.client.table('budgets').select(FEEDS['budgets'][1]).eq(
+            'user_id', user_id
+        ).eq('period', 'monthly')):
+            if str(budget['id']) not in exclude:
+                counters.budgets[budget['category']] = float(budget['budget_amount'])
+        counters.evaluate(set(counters.budgets), user_id, silent=True)
+        return counters
+
+    def _counters(self, user_id: str, today: date, feed: FeedState, exclude: Set[str]) -> UserCounters:
+        counters = self.users.get(user_id)
+        if counters is None:
+            state = self._read(self._user_path(user_id))
+            counters = UserCounters(state) if state else None
+        if counters is None or counters.month != today.strftime('%Y-%m') or self._stale(counters.seeded_at):
+            counters = self._seed(user_id, today, feed, exclude, counters)
+        self.users[user_id] = counters
+        return counters
+
+    def check(self, today: Optional[date] = None, save: bool = True) -> List[Dict[str, Any]]:
+        """Apply every row past the watermarks and return the alerts they trigger"""
+        today = today or nowPk().date()
+        feed = self.feed
+        if feed is None:
+            state = self._read(self._feed_path())
+            feed = FeedState(state) if state else None
+        if feed is None:
+            feed = self.prime(today)
+            self.primed = True
+            if save:
+                write_json(self._feed_path(), feed.to_state())
+            self.feed = feed
+            return []
+
+        fresh = {name: feed.fresh(name, self._rows(name, feed.since(name) or '1970-01-01T00:00:00+00:00'))
+                 for name in FEEDS}
+        by_user: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for name in ('transactions', 'budgets'):
+            for row in fresh[name]:
+                by_user.setdefault(row['user_id'], {'transactions': [], 'budgets': []})[name].append(row)
+        for user_id, pending_from in feed.pending_users.items():
+            if pending_from <= today.isoformat():
+                by_user.setdefault(user_id, {'transactions': [], 'budgets': []})
+
+        alerts: List[Dict[str, Any]] = []
+        touched = []
+        for user_id, rows in by_user.items():
+            exclude = {str(row['id']) for row in rows['transactions'] + rows['budgets']}
+            counters = self._counters(user_id, today, feed, exclude)
+            categories = counters.release_pending(today)
+            for budget in rows['budgets']:
+                if budget['period'] == 'monthly':
+                    counters.budgets[budget['category']] = float(budget['budget_amount'])
+                    categories.add(budget['category'])
+            for row in rows['transactions']:
+                category = counters.add_expense(row, today)
+                if category:
+                    categories.add(category)
+            alerts += counters.evaluate(categories, user_id)
+            if counters.pending:
+                feed.pending_users[user_id] = min(entry[0] for entry in counters.pending)
+            else:
+                feed.pending_users.pop(user_id, None)
+            touched.append(user_id)
+
+        # Deleted payments never show up in the feed; a periodic reload drops them
+        if self._stale(feed.payments_loaded_at):
+            self._load_payments(feed)
+        self._apply_payments(feed, fresh['recurring_payments'])
+        alerts += self._payment_alerts(feed, today)
+        for name, rows in fresh.items():
+            feed.advance(name, rows)
+        self.feed = feed
+        if save:
+            for user_id in touched:
+                write_json(self._user_path(user_id), self.users[user_id].to_state())
+            write_json(self._feed_path(), feed.to_state())
+        return alerts
+
+
+def format_alert(alert: Dict[str, Any]) -> str:
+    if alert['kind'] == 'payment':
+        when = {0: "⚠️ **DUE TODAY**", 1: "⏰ **Due Tomorrow**"}.get(alert['days'], f"📅 Due in {alert['days']} days")
+        return f"{when}: {alert['name']} - Rs. {alert['amount']:,.2f}"
+    icon, label = ("🚨", "over budget") if alert['level'] >= 100 else ("⚠️", f"past {alert['level']}% of budget")
+    percent = f" ({alert['percentage']:.0f}%)" if alert['percentage'] is not None else ""
+    return f"{icon} {alert['category']} {label}: Rs. {alert['spent']:,.2f} / Rs. {alert['budget']:,.2f}{percent}"
+
+
+def alert_payloads(alerts: List[Dict[str, Any]], users: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One webhook payload per user, budget alerts first"""
+    by_user: Dict[str, List[Dict[str, Any]]] = {}
+    for alert in alerts:
+        by_user.setdefault(alert['user_id'], []).append(alert)
+    payloads = []
+    for user_id, user_alerts in by_user.items():
+        user = users.get(user_id, {})
+        budget_lines = [format_alert(a) for a in user_alerts if a['kind'] == 'budget']
+        payment_lines = [format_alert(a) for a in user_alerts if a['kind'] == 'payment']
+        fields = []
+        if budget_lines:
+            fields.append({"name": "🎯 Budget Alerts", "value": "\n".join(budget_lines), "inline": False})
+        if payment_lines:
+            fields.append({"name": "🔔 Upcoming Payments", "value": "\n".join(payment_lines), "inline": False})
+        over = any(a['kind'] == 'budget' and a['level'] >= 100 for a in user_alerts)
+        payloads.append({"username": "Fynix", "embeds": [{
+            "title": "🔔 Financial Alerts",
+            "description": f"**👤 {user.get('name') or 'User'}**\n📧 {user.get('email', user_id)}",
+            "color": 0xff0000 if over else 0xffa500,
+            "fields": fields,
+            "timestamp": nowPk().isoformat(),
+        }]})
+    return payloads
+
+
+def deliver_alerts(client: Any, alerts: List[Dict[str, Any]], webhook_url: Optional[str], delivery: Any = None) -> int:
+    """Print the alerts and post one message per user; returns the number of users notified"""
+    if not alerts:
+        return 0
+    user_ids = sorted({alert['user_id'] for alert in alerts})
+    users = {row['id']: row for row in stream_rows(
+        lambda: client.table('users').select('id,email,name').in_('id', user_ids))}
+    for alert in alerts:
+        print(f"{users.get(alert['user_id'], {}).get('email', alert['user_id'])}: {format_alert(alert)}")
+    if not webhook_url:
+        return 0
+    if delivery is None:
+        from discord_delivery import DiscordDelivery
+        delivery = DiscordDelivery()
+    sent = 0
+    for payload in alert_payloads(alerts, users):
+        try:
+            delivery.send(webhook_url, payload)
+            sent += 1
+        except Exception as e:
+            print(f"❌ Could not send alerts: {str(e)}")
+    return sent
+
+
+def alerts_webhook_url() -> Optional[str]:
+    return os.getenv("ALERTS_WEBHOOK_URL") or os.getenv("DISCORD_WEBHOOK_URL")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check new transactions, budgets and recurring payments for alerts")
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="print alerts without sending them or saving state")
+    args = parser.parse_args()
+
+    from daily_financial_summary import supabase
+    evaluator = AlertEvaluator(supabase, args.state_dir)
+    alerts = evaluator.check(save=not args.dry_run)
+    if evaluator.primed:
+        print("✅ Started following transactions, budgets and recurring payments; alerts begin with the next check")
+        return 0
+    sent = deliver_alerts(supabase, alerts, None if args.dry_run else alerts_webhook_url())
+    print(f"{'🔔' if alerts else '✅'} {len(alerts)} alerts, {sent} messages sent")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,35 +9,108 @@ Generates a comprehensive daily financial report including:
 - Complete financial analytics
 """
 
+from __future__ import annotations
+
 import os
-import requests
+import re
+import copy
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-from supabase import create_client, Client
-from dotenv import load_dotenv
-import pytz
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Callable, Iterable, Tuple
+from psx_calendar import pkTz, nowPk
+from supabase_client import LazyClient, load_env
+from supabase_stream import stream_rows
+from profiling import PROFILER, add_profile_arguments, start_from_args, finish_from_args
+
+# The report's subsystems (numpy via the transaction frame and valuation, the lot
+# engine, series, rollups, cache and webhook delivery) are imported where they're
+# used, so `--help`, a failed user lookup or a rollup-less run don't pay for them
+if TYPE_CHECKING:
+    from discord_delivery import DiscordDelivery
+    from summary_cache import SummaryCache
+    from transaction_frame import TransactionFrame
+
+# Seconds to wait for each query when the snapshot is loaded in parallel (SUMMARY_QUERY_TIMEOUT)
+QUERY_TIMEOUT = 20.0
+
+# Built on first query, so importing this module needs neither credentials nor the supabase package;
+# .env is loaded by main() or, failing that, when the client is first built. Each HTTP request is cut
+# off after the query timeout, so a loader abandoned by _load_parallel doesn't outlive it by much
+supabase = LazyClient(timeout=QUERY_TIMEOUT)
+
+# Shared webhook sender: one keep-alive session and one rate-limit bucket per webhook
+_delivery: Optional[DiscordDelivery] = None
+
 
-# Load environment variables
-load_dotenv()
+def shared_delivery() -> DiscordDelivery:
+    """The process-wide sender, created on first send"""
+    global _delivery
+    if _delivery is None:
+        from discord_delivery import DiscordDelivery
+        _delivery = DiscordDelivery()
+    return _delivery
 
-# Initialize Supabase client
-SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+# Only the columns the report reads; `select('*')` drags whole rows over the wire
+TRANSACTION_COLUMNS = 'id,type,amount,category,description,date'
+BUDGET_COLUMNS = 'id,category,budget_amount'
+RECURRING_COLUMNS = 'id,name,category,amount,frequency,next_payment_date'
+STOCK_COLUMNS = 'id,symbol,company_name,total_shares,avg_buy_price,total_invested'
+MUTUAL_FUND_COLUMNS = 'id,fund_name,total_invested,current_value'
+INVOICE_COLUMNS = 'id,status,type,total_amount'
+
+# What a snapshot part falls back to when its query fails, so the report still renders;
+# read through empty_part(), which builds the frame and trading report on demand
+EMPTY_SNAPSHOT_PARTS: Dict[str, Any] = {
+    'month_transactions': None,
+    'budgets': [],
+    'recurring': [],
+    'stocks': [],
+    'mutual_funds': [],
+    'cash_balance': 0.0,
+    'trading': None,
+    'value_history': {},
+    'invoices': {
+        'total_invoices': 0, 'pending_income': 0.0, 'overdue_income': 0.0,
+        'pending_expenses': 0.0, 'overdue_count': 0
+    },
+}
+
+
+def empty_part(part: str) -> Any:
+    """A fresh copy of `part`'s fallback value"""
+    if part == 'month_transactions':
+        from transaction_frame import TransactionFrame
+        return TransactionFrame.from_rows([])
+    if part == 'trading':
+        from lot_engine import EMPTY_REPORT
+        return copy.deepcopy(EMPTY_REPORT)
+    return copy.deepcopy(EMPTY_SNAPSHOT_PARTS[part])
 
 
 class DailyFinancialSummary:
-    def __init__(self, user_email: str):
+    def __init__(self, user_email: str, user_data: Optional[Dict] = None, use_rollups: bool = False,
+                 cache: Optional[SummaryCache] = None):
         self.user_email = user_email
-        self.user_data = self._get_user_data()
+        self.use_rollups = use_rollups
+        self.cache = cache
+        # Batch runs pass the user row they already bulk-loaded
+        self.user_data = user_data or self._get_user_data()
         self.user_id = self.user_data['id']
         self.user_name = self.user_data.get('name', 'User')
         # Use Pakistani timezone
-        self.pk_tz = pytz.timezone('Asia/Karachi')
+        self.pk_tz = pkTz()
         self.now_pk = datetime.now(self.pk_tz)
         self.today = self.now_pk.date()
         self.two_days_later = self.today + timedelta(days=2)
+        # Per-run dataset shared by every renderer (text, file, Discord)
+        self._snapshot: Optional[Dict[str, Any]] = None
         
     def _get_user_data(self) -> Dict:
         """Fetch user data by email"""
@@ -46,78 +119,83 @@ class DailyFinancialSummary:
             raise ValueError(f"User with email {self.user_email} not found")
         return response.data[0]
     
+    def _fetch_month_transactions(self) -> TransactionFrame:
+        """Month-to-date transactions; today's activity, month totals and budget spend all derive from these"""
+        from transaction_frame import TransactionFrame
+        first_day = self.today.replace(day=1)
+        if self.use_rollups:
+            from transaction_rollups import ROLLUP_TABLE, ROLLUP_FRAME_COLUMNS
+            # One row per day and category; today's individual rows aren't kept
+            return TransactionFrame.from_rows(stream_rows(lambda: supabase.table(ROLLUP_TABLE).select(ROLLUP_FRAME_COLUMNS).eq(
+                'user_id', self.user_id
+            ).gte('date', first_day.isoformat()).lte('date', self.today.isoformat()), keys=('date', 'id')))
+        if self.cache is not None:
+            # Cached per month; only rows created since the last run come over the wire
+            rows = self.cache.sync('transactions', self.user_id, first_day.strftime('%Y-%m'), lambda columns, **kwargs: supabase.table(
+                'transactions'
+            ).select(columns, **kwargs).eq('user_id', self.user_id).gte('date', first_day.isoformat()).lte(
+                'date', self.today.isoformat()
+            ), TRANSACTION_COLUMNS + ',created_at', 'created_at')
+            return TransactionFrame.from_rows(sorted(rows, key=lambda r: (r['date'], str(r['id']))), keep_day=self.today)
+        rows = stream_rows(lambda: supabase.table('transactions').select(TRANSACTION_COLUMNS).eq(
+            'user_id', self.user_id
+        ).gte('date', first_day.isoformat()).lte('date', self.today.isoformat()), keys=('date', 'id'))
+        return TransactionFrame.from_rows(rows, keep_day=self.today)
+    
+    def _fetch_budgets(self) -> List[Dict[str, Any]]:
+        return list(stream_rows(lambda: supabase.table('budgets').select(BUDGET_COLUMNS).eq(
+            'user_id', self.user_id
+        ).eq('period', 'monthly')))
+    
     def get_today_transactions(self) -> Dict[str, Any]:
         """Get today's income and expenses"""
-        response = supabase.table('transactions').select('*').eq(
-            'user_id', self.user_id
-        ).eq('date', self.today.isoformat()).execute()
-        
-        transactions = response.data
-        income = sum(t['amount'] for t in transactions if t['type'] == 'income')
-        expenses = sum(t['amount'] for t in transactions if t['type'] == 'expense')
-        
-        # Group by category
-        expense_by_category = {}
-        income_by_category = {}
-        
-        for t in transactions:
-            if t['type'] == 'expense':
-                expense_by_category[t['category']] = expense_by_category.get(t['category'], 0) + float(t['amount'])
-            else:
-                income_by_category[t['category']] = income_by_category.get(t['category'], 0) + float(t['amount'])
+        return self._summarize_today(self._fetch_month_transactions())
+    
+    def _summarize_today(self, frame: TransactionFrame) -> Dict[str, Any]:
+        from transaction_frame import INCOME, EXPENSE
+        income, expenses, count = frame.totals(on=self.today)
         
         return {
-            'total_income': float(income),
-            'total_expenses': float(expenses),
-            'net': float(income - expenses),
-            'transactions': transactions,
-            'expense_by_category': expense_by_category,
-            'income_by_category': income_by_category,
-            'count': len(transactions)
+            'total_income': income,
+            'total_expenses': expenses,
+            'net': income - expenses,
+            'transactions': frame.kept_rows,
+            'expense_by_category': frame.by_category(EXPENSE, on=self.today),
+            'income_by_category': frame.by_category(INCOME, on=self.today),
+            'count': count
         }
     
     def get_month_summary(self) -> Dict[str, Any]:
         """Get current month's summary"""
-        first_day = self.today.replace(day=1)
-        
-        response = supabase.table('transactions').select('*').eq(
-            'user_id', self.user_id
-        ).gte('date', first_day.isoformat()).lte('date', self.today.isoformat()).execute()
-        
-        transactions = response.data
-        income = sum(t['amount'] for t in transactions if t['type'] == 'income')
-        expenses = sum(t['amount'] for t in transactions if t['type'] == 'expense')
+        return self._summarize_month(self._fetch_month_transactions())
+    
+    def _summarize_month(self, frame: TransactionFrame) -> Dict[str, Any]:
+        income, expenses, count = frame.totals()
         
         return {
-            'total_income': float(income),
-            'total_expenses': float(expenses),
-            'net': float(income - expenses),
-            'transaction_count': len(transactions)
+            'total_income': income,
+            'total_expenses': expenses,
+            'net': income - expenses,
+            'transaction_count': count
         }
     
     def get_budget_status(self) -> List[Dict[str, Any]]:
         """Get budget status with alerts for over-budget categories"""
-        # Get monthly budgets
-        response = supabase.table('budgets').select('*').eq(
-            'user_id', self.user_id
-        ).eq('period', 'monthly').execute()
-        
-        budgets = response.data
-        first_day = self.today.replace(day=1)
+        budgets = self._fetch_budgets()
+        if not budgets:
+            return []
+        return self._summarize_budgets(budgets, self._fetch_month_transactions())
+    
+    def _summarize_budgets(self, budgets: List[Dict[str, Any]], frame: TransactionFrame) -> List[Dict[str, Any]]:
+        """Spent, remaining, percentage and status for every budget from the month's expenses"""
+        from transaction_frame import EXPENSE
+        spent_by_category = frame.by_category(EXPENSE)
         
         budget_status = []
         for budget in budgets:
             category = budget['category']
             budget_amount = float(budget['budget_amount'])
-            
-            # Get spending for this category this month
-            trans_response = supabase.table('transactions').select('amount').eq(
-                'user_id', self.user_id
-            ).eq('type', 'expense').eq('category', category).gte(
-                'date', first_day.isoformat()
-            ).lte('date', self.today.isoformat()).execute()
-            
-            spent = sum(float(t['amount']) for t in trans_response.data)
+            spent = spent_by_category.get(category, 0.0)
             remaining = budget_amount - spent
             percentage = (spent / budget_amount * 100) if budget_amount > 0 else 0
             
@@ -135,41 +213,45 @@ class DailyFinancialSummary:
     
     def get_upcoming_recurring_payments(self) -> List[Dict[str, Any]]:
         """Get recurring payments due within 2 days"""
-        response = supabase.table('recurring_payments').select('*').eq(
+        return list(stream_rows(lambda: supabase.table('recurring_payments').select(RECURRING_COLUMNS).eq(
             'user_id', self.user_id
         ).eq('status', 'active').lte(
             'next_payment_date', self.two_days_later.isoformat()
         ).gte(
             'next_payment_date', self.today.isoformat()
-        ).order('next_payment_date').execute()
-        
-        return response.data
+        ), keys=('next_payment_date', 'id')))
+    
+    def _fetch_stocks(self) -> List[Dict[str, Any]]:
+        """Holdings with their psx_stocks price and sector, priced in one bulk lookup"""
+        from portfolio_valuation import attach_prices, fetch_prices
+        stocks = list(stream_rows(lambda: supabase.table('stocks').select(STOCK_COLUMNS).eq('user_id', self.user_id)))
+        return attach_prices(stocks, fetch_prices(supabase, (s['symbol'] for s in stocks)))
+    
+    def _fetch_mutual_funds(self) -> List[Dict[str, Any]]:
+        return list(stream_rows(lambda: supabase.table('mutual_funds').select(MUTUAL_FUND_COLUMNS).eq('user_id', self.user_id)))
+    
+    def _fetch_cash_balance(self) -> float:
+        cash_response = supabase.table('cash_account').select('balance').eq('user_id', self.user_id).execute()
+        return float(cash_response.data[0]['balance']) if cash_response.data else 0
     
     def get_portfolio_summary(self) -> Dict[str, Any]:
         """Get stocks and mutual funds portfolio summary"""
-        # Get stocks
-        stocks_response = supabase.table('stocks').select('*').eq('user_id', self.user_id).execute()
-        stocks = stocks_response.data
-        
-        total_stock_invested = sum(float(s['total_invested']) for s in stocks)
-        
-        # Get mutual funds
-        mf_response = supabase.table('mutual_funds').select('*').eq('user_id', self.user_id).execute()
-        mutual_funds = mf_response.data
+        return self._build_portfolio(self._fetch_stocks(), self._fetch_mutual_funds(), self._fetch_cash_balance())
+    
+    def _build_portfolio(self, stocks: List[Dict[str, Any]], mutual_funds: List[Dict[str, Any]], cash_balance: float) -> Dict[str, Any]:
+        from portfolio_valuation import Valuation
+        valuation = Valuation(stocks)
+        stock_totals = valuation.totals()
         
         total_mf_invested = sum(float(mf['total_invested']) for mf in mutual_funds)
         total_mf_value = sum(float(mf['current_value']) for mf in mutual_funds)
         total_mf_profit = total_mf_value - total_mf_invested
         
-        # Get cash account
-        cash_response = supabase.table('cash_account').select('balance').eq('user_id', self.user_id).execute()
-        cash_balance = float(cash_response.data[0]['balance']) if cash_response.data else 0
-        
         return {
             'stocks': {
-                'count': len(stocks),
-                'total_invested': total_stock_invested,
-                'holdings': stocks
+                **stock_totals,
+                'by_sector': valuation.by_sector(),
+                'holdings': valuation.holdings()
             },
             'mutual_funds': {
                 'count': len(mutual_funds),
@@ -179,39 +261,147 @@ class DailyFinancialSummary:
                 'holdings': mutual_funds
             },
             'cash_balance': cash_balance,
-            'total_portfolio_value': total_stock_invested + total_mf_value + cash_balance
+            'total_portfolio_value': stock_totals['market_value'] + total_mf_value + cash_balance
         }
     
+    def _fetch_trading(self) -> Dict[str, Any]:
+        """Realized gains, dividends and fees from the user's FIFO lot checkpoint, updated with new rows"""
+        from lot_engine import LotEngine
+        return LotEngine(supabase).update(self.user_id).report(self.today.strftime('%Y-%m'))
+    
+    def _fetch_value_history(self) -> Dict[str, Dict[str, float]]:
+        """Daily portfolio value for every finished day, extended from the local series cache"""
+        from portfolio_series import PortfolioSeries
+        return PortfolioSeries(supabase).extend(self.user_id, self.today)['days']
+    
     def get_invoice_summary(self) -> Dict[str, Any]:
         """Get invoice summary"""
-        response = supabase.table('invoices').select('*').eq('user_id', self.user_id).execute()
-        invoices = response.data
-        
-        pending_income = sum(float(i['total_amount']) for i in invoices if i['status'] in ['sent'] and i['type'] == 'income')
-        overdue_income = sum(float(i['total_amount']) for i in invoices if i['status'] == 'overdue' and i['type'] == 'income')
-        pending_expenses = sum(float(i['total_amount']) for i in invoices if i['status'] in ['sent'] and i['type'] == 'expense')
-        
+        return self._fetch_invoice_summary()
+    
+    def _fetch_invoice_summary(self) -> Dict[str, Any]:
+        """Invoice totals aggregated straight off the row stream"""
+        totals = empty_part('invoices')
+        if self.cache is not None:
+            # Invoices carry updated_at, so status changes show up in the delta
+            invoices: Iterable[Dict[str, Any]] = self.cache.sync('invoices', self.user_id, 'all', lambda columns, **kwargs: supabase.table(
+                'invoices'
+            ).select(columns, **kwargs).eq('user_id', self.user_id), INVOICE_COLUMNS + ',updated_at', 'updated_at')
+        else:
+            invoices = stream_rows(lambda: supabase.table('invoices').select(INVOICE_COLUMNS).eq('user_id', self.user_id))
+        for invoice in invoices:
+            self._add_invoice(totals, invoice)
+        return totals
+    
+    @staticmethod
+    def _add_invoice(totals: Dict[str, Any], invoice: Dict[str, Any]) -> None:
+        amount = float(invoice['total_amount'])
+        totals['total_invoices'] += 1
+        if invoice['status'] == 'sent' and invoice['type'] == 'income':
+            totals['pending_income'] += amount
+        elif invoice['status'] == 'sent' and invoice['type'] == 'expense':
+            totals['pending_expenses'] += amount
+        elif invoice['status'] == 'overdue':
+            totals['overdue_count'] += 1
+            if invoice['type'] == 'income':
+                totals['overdue_income'] += amount
+    
+    def _snapshot_loaders(self) -> Dict[str, Callable[[], Any]]:
+        """Independent queries behind the report, keyed by the snapshot part they fill"""
         return {
-            'total_invoices': len(invoices),
-            'pending_income': pending_income,
-            'overdue_income': overdue_income,
-            'pending_expenses': pending_expenses,
-            'overdue_count': len([i for i in invoices if i['status'] == 'overdue'])
+            'month_transactions': self._fetch_month_transactions,
+            'budgets': self._fetch_budgets,
+            'recurring': self.get_upcoming_recurring_payments,
+            'stocks': self._fetch_stocks,
+            'mutual_funds': self._fetch_mutual_funds,
+            'cash_balance': self._fetch_cash_balance,
+            'trading': self._fetch_trading,
+            'value_history': self._fetch_value_history,
+            'invoices': self._fetch_invoice_summary,
+        }
+    
+    def _load_parallel(self, timeout: float) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Run every loader at once; parts that raise or outlive `timeout` come back as errors"""
+        loaders = self._snapshot_loaders()
+        pool = ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix='summary-query')
+        futures = {pool.submit(PROFILER.traced(f"load:{part}")(loader)): part for part, loader in loaders.items()}
+        done, pending = wait(futures, timeout=timeout)
+        # Don't block the report on a hung query. Its thread carries on in the background until the
+        # client's own request timeout (the same value) ends the HTTP call, so exit waits at most that long
+        pool.shutdown(wait=False, cancel_futures=True)
+        
+        results: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        for future in done:
+            part = futures[future]
+            try:
+                results[part] = future.result()
+            except Exception as e:
+                errors[part] = str(e) or type(e).__name__
+        for future in pending:
+            errors[futures[future]] = f"timed out after {timeout:g}s"
+        return results, errors
+    
+    def load_snapshot(self, refresh: bool = False, parallel: bool = True, timeout: float = QUERY_TIMEOUT) -> Dict[str, Any]:
+        """Load every dataset the report needs once per run.
+
+        The text, file and Discord renderers all read from this snapshot, so a
+        Discord failure falls back to the console without re-querying Supabase
+        and every output reflects the same data.
+
+        In parallel mode the independent queries run concurrently, so loading
+        takes about as long as the slowest one. A query that fails or times out
+        leaves its section empty and is listed under snapshot['errors'];
+        sequential mode raises on the first failure as before.
+        """
+        if self._snapshot is None or refresh:
+            with PROFILER.span('load'):
+                if parallel:
+                    results, errors = self._load_parallel(timeout)
+                    for part in errors:
+                        results[part] = empty_part(part)
+                else:
+                    results = {part: PROFILER.traced(f"load:{part}")(loader)() for part, loader in self._snapshot_loaders().items()}
+                    errors = {}
+            
+            self.use_snapshot(results, errors)
+        return self._snapshot
+    
+    @PROFILER.traced('aggregate')
+    def use_snapshot(self, results: Dict[str, Any], errors: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Install a snapshot from already-loaded parts (keys of _snapshot_loaders)"""
+        from portfolio_series import changes as value_changes
+        # One columnar frame over the month's rows feeds today, month and budget figures
+        frame = results['month_transactions']
+        portfolio = self._build_portfolio(results['stocks'], results['mutual_funds'], results['cash_balance'])
+        self._snapshot = {
+            'today_trans': self._summarize_today(frame),
+            'month_summary': self._summarize_month(frame),
+            'budget_status': self._summarize_budgets(results['budgets'], frame),
+            'recurring': results['recurring'],
+            'portfolio': portfolio,
+            'value_changes': value_changes(results['value_history'], self.today, portfolio['total_portfolio_value']),
+            'trading': results['trading'],
+            'invoices': results['invoices'],
+            'errors': errors or {},
         }
+        return self._snapshot
     
     def format_currency(self, amount: float) -> str:
         """Format currency with commas"""
         return f"Rs. {amount:,.2f}"
     
+    @PROFILER.traced('render')
     def generate_summary_message(self) -> str:
         """Generate the complete beautiful summary message"""
         # Get all data
-        today_trans = self.get_today_transactions()
-        month_summary = self.get_month_summary()
-        budget_status = self.get_budget_status()
-        recurring = self.get_upcoming_recurring_payments()
-        portfolio = self.get_portfolio_summary()
-        invoices = self.get_invoice_summary()
+        snapshot = self.load_snapshot()
+        today_trans = snapshot['today_trans']
+        month_summary = snapshot['month_summary']
+        budget_status = snapshot['budget_status']
+        recurring = snapshot['recurring']
+        portfolio = snapshot['portfolio']
+        invoices = snapshot['invoices']
+        trading = snapshot['trading']
         
         # Build the message
         lines = []
@@ -306,6 +496,16 @@ class DailyFinancialSummary:
         lines.append(f"\n  📈 Stocks:")
         lines.append(f"    • Holdings: {portfolio['stocks']['count']} stocks")
         lines.append(f"    • Total Invested: {self.format_currency(portfolio['stocks']['total_invested'])}")
+        lines.append(f"    • Market Value: {self.format_currency(portfolio['stocks']['market_value'])}")
+        stock_indicator = "📈" if portfolio['stocks']['unrealized_pl'] >= 0 else "📉"
+        lines.append(f"    • Unrealized P/L: {stock_indicator} {self.format_currency(portfolio['stocks']['unrealized_pl'])} "
+                     f"({portfolio['stocks']['unrealized_pct']:+.1f}%)")
+        if portfolio['stocks']['by_sector']:
+            lines.append("    • By Sector:")
+            for sector, figures in sorted(portfolio['stocks']['by_sector'].items(), key=lambda x: x[1]['market_value'], reverse=True):
+                lines.append(f"      ◦ {sector}: {self.format_currency(figures['market_value'])} ({figures['unrealized_pct']:+.1f}%)")
+        if portfolio['stocks']['unpriced']:
+            lines.append(f"    ⚠️  {portfolio['stocks']['unpriced']} holdings have no current price and are shown at cost")
         
         lines.append(f"\n  🏦 Mutual Funds:")
         lines.append(f"    • Holdings: {portfolio['mutual_funds']['count']} funds")
@@ -314,7 +514,20 @@ class DailyFinancialSummary:
         profit_indicator = "📈" if portfolio['mutual_funds']['profit_loss'] >= 0 else "📉"
         lines.append(f"    • Profit/Loss: {profit_indicator} {self.format_currency(portfolio['mutual_funds']['profit_loss'])}")
         
+        if any(trading['lifetime'].values()):
+            month_figures, lifetime = trading['month'], trading['lifetime']
+            lines.append(f"\n  💹 Trading Results (this month / all time):")
+            lines.append(f"    • Realized Gains: {self.format_currency(month_figures['realized'])} / {self.format_currency(lifetime['realized'])}")
+            lines.append(f"    • Dividends: {self.format_currency(month_figures['dividends'])} / {self.format_currency(lifetime['dividends'])}")
+            lines.append(f"    • Fees: {self.format_currency(month_figures['fees'])} / {self.format_currency(lifetime['fees'])}")
+            lines.append(f"    • Net: {self.format_currency(month_figures['net'])} / {self.format_currency(lifetime['net'])}")
+            if trading['unmatched_shares']:
+                lines.append(f"    ⚠️  {trading['unmatched_shares']:g} sold shares have no recorded purchase")
+        
         lines.append(f"\n  💎 Total Portfolio Value: {self.format_currency(portfolio['total_portfolio_value'])}")
+        change_parts = self._format_value_changes(snapshot['value_changes'])
+        if change_parts:
+            lines.append(f"  📊 Change: {' · '.join(change_parts)}")
         
         # INVOICE SUMMARY
         if invoices['total_invoices'] > 0:
@@ -363,195 +576,229 @@ class DailyFinancialSummary:
             else:
                 lines.append("     ⚠️  Need better budget control.")
         
+        if snapshot['errors']:
+            lines.append("\n" + "─" * 70)
+            lines.append("⚠️  INCOMPLETE REPORT - these sections could not be loaded:")
+            for part, error in sorted(snapshot['errors'].items()):
+                lines.append(f"    • {part}: {error}")
+        
         lines.append("\n" + "=" * 70)
         lines.append("Generated: " + self.now_pk.strftime('%Y-%m-%d %H:%M:%S') + " PKT")
         lines.append("=" * 70)
         
         return "\n".join(lines)
     
+    def _format_value_changes(self, changes: Dict[str, Optional[Dict[str, float]]]) -> List[str]:
+        """'Day Rs. x (+y%)' style entries for the periods the value series covers"""
+        return [
+            f"{period.capitalize()} {self.format_currency(change['change'])} ({change['percentage']:+.1f}%)"
+            for period, change in changes.items() if change is not None
+        ]
+    
     def save_to_file(self, message: str, filename: Optional[str] = None):
         """Save the summary to a file"""
         if not filename:
             filename = f"financial_summary_{self.today.isoformat()}.txt"
         
-        with open(filename, 'w', encoding='utf-8') as f:
+        with PROFILER.span('deliver'), open(filename, 'w', encoding='utf-8') as f:
             f.write(message)
         
         print(f"✅ Summary saved to: {filename}")
     
-    def send_to_discord(self, webhook_url: str) -> bool:
-        """Send the summary to Discord via webhook"""
-        try:
-            # Get all data for Discord embed
-            today_trans = self.get_today_transactions()
-            month_summary = self.get_month_summary()
-            budget_status = self.get_budget_status()
-            recurring = self.get_upcoming_recurring_payments()
-            portfolio = self.get_portfolio_summary()
-            invoices = self.get_invoice_summary()
-            
-            # Create Discord embed
-            embed = {
-                "title": f"📊 Daily Financial Summary - {self.today.strftime('%B %d, %Y')}",
-                "color": 0x00ff00 if today_trans['net'] >= 0 else 0xff0000,
-                "fields": [],
-                "footer": {
-                    "text": f"Generated at {self.now_pk.strftime('%I:%M %p')} PKT"
-                },
-                "timestamp": self.now_pk.isoformat()
-            }
-            
-            # User info
-            embed["description"] = f"**👤 {self.user_name}**\n📧 {self.user_email}"
-            
-            # Today's activity
-            today_value = (
-                f"✅ Income: **{self.format_currency(today_trans['total_income'])}**\n"
-                f"❌ Expenses: **{self.format_currency(today_trans['total_expenses'])}**\n"
-                f"📈 Net: **{self.format_currency(today_trans['net'])}**\n"
-                f"📝 Transactions: {today_trans['count']}"
-            )
-            embed["fields"].append({
-                "name": "💰 Today's Activity",
-                "value": today_value,
-                "inline": False
-            })
+    @PROFILER.traced('render')
+    def discord_payload(self) -> Dict[str, Any]:
+        """The webhook payload for this report; the delivery layer splits it if it is over Discord's limits"""
+        # Get all data for Discord embed
+        snapshot = self.load_snapshot()
+        today_trans = snapshot['today_trans']
+        month_summary = snapshot['month_summary']
+        budget_status = snapshot['budget_status']
+        recurring = snapshot['recurring']
+        portfolio = snapshot['portfolio']
+        invoices = snapshot['invoices']
+        trading = snapshot['trading']
+        
+        # Create Discord embed
+        embed = {
+            "title": f"📊 Daily Financial Summary - {self.today.strftime('%B %d, %Y')}",
+            "color": 0x00ff00 if today_trans['net'] >= 0 else 0xff0000,
+            "fields": [],
+            "footer": {
+                "text": f"Generated at {self.now_pk.strftime('%I:%M %p')} PKT"
+            },
+            "timestamp": self.now_pk.isoformat()
+        }
+        
+        # User info
+        embed["description"] = f"**👤 {self.user_name}**\n📧 {self.user_email}"
+        
+        # Today's activity
+        today_value = (
+            f"✅ Income: **{self.format_currency(today_trans['total_income'])}**\n"
+            f"❌ Expenses: **{self.format_currency(today_trans['total_expenses'])}**\n"
+            f"📈 Net: **{self.format_currency(today_trans['net'])}**\n"
+            f"📝 Transactions: {today_trans['count']}"
+        )
+        embed["fields"].append({
+            "name": "💰 Today's Activity",
+            "value": today_value,
+            "inline": False
+        })
+        
+        # Month summary
+        month_value = (
+            f"✅ Income: **{self.format_currency(month_summary['total_income'])}**\n"
+            f"❌ Expenses: **{self.format_currency(month_summary['total_expenses'])}**\n"
+            f"📈 Net: **{self.format_currency(month_summary['net'])}**"
+        )
+        embed["fields"].append({
+            "name": f"📅 This Month ({self.today.strftime('%B %Y')})",
+            "value": month_value,
+            "inline": False
+        })
+        
+        # Budget status - only show alerts
+        if budget_status:
+            over_budget = [b for b in budget_status if b['status'] == 'over_budget']
+            warning = [b for b in budget_status if b['status'] == 'warning']
             
-            # Month summary
-            month_value = (
-                f"✅ Income: **{self.format_currency(month_summary['total_income'])}**\n"
-                f"❌ Expenses: **{self.format_currency(month_summary['total_expenses'])}**\n"
-                f"📈 Net: **{self.format_currency(month_summary['net'])}**"
-            )
-            embed["fields"].append({
-                "name": f"📅 This Month ({self.today.strftime('%B %Y')})",
-                "value": month_value,
-                "inline": False
-            })
+            budget_lines = []
+            if over_budget:
+                budget_lines.append("🚨 **OVER BUDGET:**")
+                for b in over_budget[:3]:  # Limit to 3
+                    budget_lines.append(f"• {b['category']}: {self.format_currency(b['spent'])} / {self.format_currency(b['budget'])}")
             
-            # Budget status - only show alerts
-            if budget_status:
-                over_budget = [b for b in budget_status if b['status'] == 'over_budget']
-                warning = [b for b in budget_status if b['status'] == 'warning']
-                
-                budget_lines = []
-                if over_budget:
-                    budget_lines.append("🚨 **OVER BUDGET:**")
-                    for b in over_budget[:3]:  # Limit to 3
-                        budget_lines.append(f"• {b['category']}: {self.format_currency(b['spent'])} / {self.format_currency(b['budget'])}")
-                
-                if warning:
-                    if budget_lines:
-                        budget_lines.append("")
-                    budget_lines.append("⚠️ **WARNING:**")
-                    for b in warning[:3]:  # Limit to 3
-                        budget_lines.append(f"• {b['category']}: {self.format_currency(b['spent'])} / {self.format_currency(b['budget'])}")
-                
+            if warning:
                 if budget_lines:
-                    embed["fields"].append({
-                        "name": "🎯 Budget Alerts",
-                        "value": "\n".join(budget_lines),
-                        "inline": False
-                    })
+                    budget_lines.append("")
+                budget_lines.append("⚠️ **WARNING:**")
+                for b in warning[:3]:  # Limit to 3
+                    budget_lines.append(f"• {b['category']}: {self.format_currency(b['spent'])} / {self.format_currency(b['budget'])}")
             
-            # Recurring payments
-            if recurring:
-                recurring_lines = []
-                for payment in recurring[:3]:  # Limit to 3
-                    next_date = datetime.strptime(payment['next_payment_date'], '%Y-%m-%d').date()
-                    days_until = (next_date - self.today).days
-                    
-                    if days_until == 0:
-                        urgency = "⚠️ **DUE TODAY**"
-                    elif days_until == 1:
-                        urgency = "⏰ **Due Tomorrow**"
-                    else:
-                        urgency = f"📅 Due in {days_until} days"
-                    
-                    recurring_lines.append(
-                        f"{urgency}\n"
-                        f"• {payment['name']}: {self.format_currency(float(payment['amount']))}"
-                    )
-                
+            if budget_lines:
                 embed["fields"].append({
-                    "name": "🔔 Upcoming Payments (Next 2 Days)",
-                    "value": "\n\n".join(recurring_lines),
+                    "name": "🎯 Budget Alerts",
+                    "value": "\n".join(budget_lines),
                     "inline": False
                 })
+        
+        # Recurring payments
+        if recurring:
+            recurring_lines = []
+            for payment in recurring[:3]:  # Limit to 3
+                next_date = datetime.strptime(payment['next_payment_date'], '%Y-%m-%d').date()
+                days_until = (next_date - self.today).days
+                
+                if days_until == 0:
+                    urgency = "⚠️ **DUE TODAY**"
+                elif days_until == 1:
+                    urgency = "⏰ **Due Tomorrow**"
+                else:
+                    urgency = f"📅 Due in {days_until} days"
+                
+                recurring_lines.append(
+                    f"{urgency}\n"
+                    f"• {payment['name']}: {self.format_currency(float(payment['amount']))}"
+                )
             
-            # Portfolio summary
-            portfolio_value = (
-                f"💵 Cash: **{self.format_currency(portfolio['cash_balance'])}**\n"
-                f"📈 Stocks: {portfolio['stocks']['count']} holdings - {self.format_currency(portfolio['stocks']['total_invested'])}\n"
-                f"🏦 Mutual Funds: {portfolio['mutual_funds']['count']} funds - {self.format_currency(portfolio['mutual_funds']['current_value'])}\n"
-                f"💎 **Total Value: {self.format_currency(portfolio['total_portfolio_value'])}**"
-            )
             embed["fields"].append({
-                "name": "💼 Investment Portfolio",
-                "value": portfolio_value,
+                "name": "🔔 Upcoming Payments (Next 2 Days)",
+                "value": "\n\n".join(recurring_lines),
                 "inline": False
             })
+        
+        # Portfolio summary
+        portfolio_value = (
+            f"💵 Cash: **{self.format_currency(portfolio['cash_balance'])}**\n"
+            f"📈 Stocks: {portfolio['stocks']['count']} holdings - {self.format_currency(portfolio['stocks']['market_value'])} "
+            f"({portfolio['stocks']['unrealized_pct']:+.1f}%)\n"
+            f"🏦 Mutual Funds: {portfolio['mutual_funds']['count']} funds - {self.format_currency(portfolio['mutual_funds']['current_value'])}\n"
+            f"💎 **Total Value: {self.format_currency(portfolio['total_portfolio_value'])}**"
+        )
+        change_parts = self._format_value_changes(snapshot['value_changes'])
+        if change_parts:
+            portfolio_value += "\n📊 " + " · ".join(change_parts)
+        if any(trading['lifetime'].values()):
+            portfolio_value += (
+                f"\n💹 This month: realized {self.format_currency(trading['month']['realized'])}, "
+                f"dividends {self.format_currency(trading['month']['dividends'])}, "
+                f"fees {self.format_currency(trading['month']['fees'])}"
+            )
+        embed["fields"].append({
+            "name": "💼 Investment Portfolio",
+            "value": portfolio_value,
+            "inline": False
+        })
+        
+        # Invoices (only if there are alerts)
+        if invoices['overdue_income'] > 0 or invoices['pending_income'] > 0:
+            invoice_lines = []
+            if invoices['overdue_income'] > 0:
+                invoice_lines.append(f"🚨 **Overdue**: {self.format_currency(invoices['overdue_income'])} ({invoices['overdue_count']} invoices)")
+            if invoices['pending_income'] > 0:
+                invoice_lines.append(f"💰 Pending: {self.format_currency(invoices['pending_income'])}")
             
-            # Invoices (only if there are alerts)
-            if invoices['overdue_income'] > 0 or invoices['pending_income'] > 0:
-                invoice_lines = []
-                if invoices['overdue_income'] > 0:
-                    invoice_lines.append(f"🚨 **Overdue**: {self.format_currency(invoices['overdue_income'])} ({invoices['overdue_count']} invoices)")
-                if invoices['pending_income'] > 0:
-                    invoice_lines.append(f"💰 Pending: {self.format_currency(invoices['pending_income'])}")
-                
-                embed["fields"].append({
-                    "name": "🧾 Invoices",
-                    "value": "\n".join(invoice_lines),
-                    "inline": False
-                })
+            embed["fields"].append({
+                "name": "🧾 Invoices",
+                "value": "\n".join(invoice_lines),
+                "inline": False
+            })
+        
+        # Financial health
+        if month_summary['total_income'] > 0:
+            savings_rate = ((month_summary['total_income'] - month_summary['total_expenses']) / month_summary['total_income']) * 100
             
-            # Financial health
-            if month_summary['total_income'] > 0:
-                savings_rate = ((month_summary['total_income'] - month_summary['total_expenses']) / month_summary['total_income']) * 100
-                
-                if savings_rate >= 20:
-                    health_emoji = "✅"
-                    health_msg = "Excellent savings!"
-                elif savings_rate >= 10:
-                    health_emoji = "⚠️"
-                    health_msg = "Good, but can improve"
-                elif savings_rate >= 0:
-                    health_emoji = "⚠️"
-                    health_msg = "Low savings rate"
-                else:
-                    health_emoji = "🚨"
-                    health_msg = "Spending exceeds income!"
-                
-                health_value = f"{health_emoji} Savings Rate: **{savings_rate:.1f}%**\n{health_msg}"
-                
-                over_budget_count = len([b for b in budget_status if b['status'] == 'over_budget'])
-                if budget_status:
-                    compliance = ((len(budget_status) - over_budget_count) / len(budget_status)) * 100
-                    health_value += f"\n🎯 Budget Compliance: **{compliance:.1f}%**"
-                
-                embed["fields"].append({
-                    "name": "🏥 Financial Health",
-                    "value": health_value,
-                    "inline": False
-                })
+            if savings_rate >= 20:
+                health_emoji = "✅"
+                health_msg = "Excellent savings!"
+            elif savings_rate >= 10:
+                health_emoji = "⚠️"
+                health_msg = "Good, but can improve"
+            elif savings_rate >= 0:
+                health_emoji = "⚠️"
+                health_msg = "Low savings rate"
+            else:
+                health_emoji = "🚨"
+                health_msg = "Spending exceeds income!"
             
-            # Send to Discord
-            payload = {
-                "embeds": [embed],
-                "username": "Fynix",
-           }
+            health_value = f"{health_emoji} Savings Rate: **{savings_rate:.1f}%**\n{health_msg}"
             
-            response = requests.post(webhook_url, json=payload)
+            over_budget_count = len([b for b in budget_status if b['status'] == 'over_budget'])
+            if budget_status:
+                compliance = ((len(budget_status) - over_budget_count) / len(budget_status)) * 100
+                health_value += f"\n🎯 Budget Compliance: **{compliance:.1f}%**"
             
-            if response.status_code == 204:
-                print("✅ Summary sent to Discord successfully!")
-                return True
-            else:
-                print(f"❌ Failed to send to Discord. Status code: {response.status_code}")
-                print(f"Response: {response.text}")
-                return False
-                
+            embed["fields"].append({
+                "name": "🏥 Financial Health",
+                "value": health_value,
+                "inline": False
+            })
+        
+        if snapshot['errors']:
+            embed["fields"].append({
+                "name": "⚠️ Incomplete Report",
+                "value": "Could not load: " + ", ".join(sorted(snapshot['errors'])),
+                "inline": False
+            })
+        
+        return {
+            "embeds": [embed],
+            "username": "Fynix",
+        }
+    
+    def send_to_discord(self, webhook_url: str, delivery: Optional[DiscordDelivery] = None) -> bool:
+        """Send the summary to Discord via webhook; 429s and 5xx are retried by the delivery layer"""
+        from discord_delivery import DeliveryError
+        try:
+            payload = self.discord_payload()
+            with PROFILER.span('deliver'), PROFILER.timed('http', 'discord webhook'):
+                messages = (delivery or shared_delivery()).send(webhook_url, payload)
+            suffix = f" in {messages} messages" if messages > 1 else ""
+            print(f"✅ Summary sent to Discord successfully{suffix}!")
+            return True
+        except DeliveryError as e:
+            print(f"❌ Failed to send to Discord: {str(e)}")
+            return False
         except Exception as e:
             print(f"❌ Error sending to Discord: {str(e)}")
             import traceback
@@ -559,29 +806,294 @@ class DailyFinancialSummary:
             return False
 
 
+class BatchSummaryLoader:
+    """Load report data for many users with bulk `user_id IN (...)` queries.
+
+    Each table is streamed once per chunk of users (keyset-paged past the
+    PostgREST row cap) and the rows are partitioned in memory, so the number of round
+    trips grows with data volume rather than with users x queries.
+    """
+    
+    def __init__(self, user_chunk_size: int = 100, use_rollups: bool = False):
+        self.user_chunk_size = user_chunk_size
+        self.use_rollups = use_rollups
+    
+    def load_users(self, emails: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """User rows for `emails` (or every user), plus the emails that matched nobody"""
+        columns = 'id,email,name'
+        if emails is None:
+            return list(stream_rows(lambda: supabase.table('users').select(columns))), []
+        users: List[Dict[str, Any]] = []
+        for start in range(0, len(emails), self.user_chunk_size):
+            chunk = emails[start:start + self.user_chunk_size]
+            users.extend(stream_rows(lambda: supabase.table('users').select(columns).in_('email', chunk)))
+        found = {u['email'] for u in users}
+        return users, [email for email in emails if email not in found]
+    
+    @staticmethod
+    def _partition(rows: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Group rows by user, dropping the `user_id` the single-user queries don't select"""
+        by_user: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_user.setdefault(row.pop('user_id'), []).append(row)
+        return by_user
+    
+    def load(self, summaries: List['DailyFinancialSummary']) -> Dict[str, str]:
+        """Install a snapshot on every summary; returns {email: error} for chunks that failed to load"""
+        failures: Dict[str, str] = {}
+        for start in range(0, len(summaries), self.user_chunk_size):
+            chunk = summaries[start:start + self.user_chunk_size]
+            try:
+                self._load_chunk(chunk)
+            except Exception as e:
+                for summary in chunk:
+                    failures[summary.user_email] = str(e) or type(e).__name__
+        return failures
+    
+    def _load_chunk(self, chunk: List['DailyFinancialSummary']) -> None:
+        from transaction_frame import TransactionFrameBuilder
+        from transaction_rollups import ROLLUP_TABLE, ROLLUP_FRAME_COLUMNS
+        from portfolio_valuation import attach_prices, fetch_prices
+        from lot_engine import LotEngine
+        from portfolio_series import PortfolioSeries
+        ids = [summary.user_id for summary in chunk]
+        today = chunk[0].today
+        first_day = today.replace(day=1)
+        two_days_later = chunk[0].two_days_later
+        
+        # Month-to-date rows serve today's activity, the month totals and budget spend;
+        # they stream straight into per-user columnar builders
+        builders = {uid: TransactionFrameBuilder(keep_day=None if self.use_rollups else today) for uid in ids}
+        table, columns = (ROLLUP_TABLE, ROLLUP_FRAME_COLUMNS) if self.use_rollups else ('transactions', TRANSACTION_COLUMNS)
+        for row in stream_rows(lambda: supabase.table(table).select(
+            'user_id,' + columns
+        ).in_('user_id', ids).gte('date', first_day.isoformat()).lte('date', today.isoformat()), keys=('date', 'id')):
+            builders[row.pop('user_id')].add(row)
+        
+        invoice_totals = {uid: empty_part('invoices') for uid in ids}
+        for row in stream_rows(lambda: supabase.table('invoices').select('user_id,' + INVOICE_COLUMNS).in_('user_id', ids)):
+            DailyFinancialSummary._add_invoice(invoice_totals[row.pop('user_id')], row)
+        
+        budgets = self._partition(stream_rows(lambda: supabase.table('budgets').select('user_id,' + BUDGET_COLUMNS).in_(
+            'user_id', ids
+        ).eq('period', 'monthly')))
+        recurring = self._partition(stream_rows(lambda: supabase.table('recurring_payments').select('user_id,' + RECURRING_COLUMNS).in_(
+            'user_id', ids
+        ).eq('status', 'active').lte('next_payment_date', two_days_later.isoformat()).gte(
+            'next_payment_date', today.isoformat()
+        ), keys=('next_payment_date', 'id')))
+        # One price lookup for every symbol held anywhere in the chunk
+        stock_rows = list(stream_rows(lambda: supabase.table('stocks').select('user_id,' + STOCK_COLUMNS).in_('user_id', ids)))
+        stocks = self._partition(attach_prices(stock_rows, fetch_prices(supabase, (s['symbol'] for s in stock_rows))))
+        mutual_funds = self._partition(stream_rows(lambda: supabase.table('mutual_funds').select('user_id,' + MUTUAL_FUND_COLUMNS).in_('user_id', ids)))
+        cash = self._partition(stream_rows(lambda: supabase.table('cash_account').select('id,user_id,balance').in_('user_id', ids)))
+        month = today.strftime('%Y-%m')
+        errors: Dict[str, Dict[str, str]] = {}
+        trading: Dict[str, Dict[str, Any]] = {}
+        engine = LotEngine(supabase)
+        try:
+            trading = {uid: book.report(month) for uid, book in engine.update_many(ids).items()}
+        except Exception:
+            # Retry one user at a time so a single bad book only blanks that user's section
+            for uid in ids:
+                try:
+                    trading[uid] = engine.update(uid).report(month)
+                except Exception as e:
+                    trading[uid] = empty_part('trading')
+                    errors.setdefault(uid, {})['trading'] = str(e) or type(e).__name__
+        
+        # The series cache is per user; one builder shares a single price history sync
+        series = PortfolioSeries(supabase)
+        value_history: Dict[str, Dict[str, Any]] = {}
+        for uid in ids:
+            try:
+                value_history[uid] = series.extend(uid, today)['days']
+            except Exception as e:
+                value_history[uid] = {}
+                errors.setdefault(uid, {})['value_history'] = str(e) or type(e).__name__
+        
+        for summary in chunk:
+            uid = summary.user_id
+            cash_rows = cash.get(uid, [])
+            summary.use_snapshot({
+                'month_transactions': builders[uid].build(),
+                'budgets': budgets.get(uid, []),
+                'recurring': recurring.get(uid, []),
+                'stocks': stocks.get(uid, []),
+                'mutual_funds': mutual_funds.get(uid, []),
+                'cash_balance': float(cash_rows[0]['balance']) if cash_rows else 0,
+                'trading': trading[uid],
+                'value_history': value_history[uid],
+                'invoices': invoice_totals[uid],
+            }, errors.get(uid))
+
+
+def deliver_summary(summary: DailyFinancialSummary, webhook_url: Optional[str], output_dir: str,
+                    delivery: Optional[DiscordDelivery] = None) -> str:
+    """Send one user's report to Discord, falling back to a file; returns where it went"""
+    if webhook_url and summary.send_to_discord(webhook_url, delivery):
+        return 'discord'
+    safe_email = re.sub(r'[^A-Za-z0-9._-]', '_', summary.user_email)
+    filename = os.path.join(output_dir, f"financial_summary_{summary.today.isoformat()}_{safe_email}.txt")
+    summary.save_to_file(summary.generate_summary_message(), filename)
+    return 'file'
+
+
+def run_batch(emails: Optional[List[str]], workers: int, manifest_path: Optional[str], output_dir: str,
+              use_rollups: bool = False, webhook_url: Optional[str] = None,
+              delivery: Optional[DiscordDelivery] = None) -> bool:
+    """Generate and deliver reports for many users; writes a per-user manifest and returns True if all succeeded.
+
+    A caller-supplied `delivery` is reused and left open (the scheduler keeps one for its lifetime).
+    """
+    started = time.perf_counter()
+    loader = BatchSummaryLoader(use_rollups=use_rollups)
+    users, missing = loader.load_users(emails)
+    print(f"🔄 Generating daily financial summaries for {len(users)} users\n")
+    
+    entries: Dict[str, Dict[str, Any]] = {
+        email: {'email': email, 'status': 'failed', 'error': 'user not found'} for email in missing
+    }
+    summaries = [DailyFinancialSummary(user['email'], user_data=user, use_rollups=use_rollups) for user in users]
+    with PROFILER.span('load'):
+        load_failures = loader.load(summaries)
+    for email, error in load_failures.items():
+        entries[email] = {'email': email, 'status': 'failed', 'error': f"load failed: {error}"}
+    
+    os.makedirs(output_dir, exist_ok=True)
+    ready = [summary for summary in summaries if summary.user_email not in load_failures]
+    # Sized to the render workers so none of them waits for a pooled connection
+    own_delivery = delivery is None
+    if own_delivery:
+        from discord_delivery import DiscordDelivery
+        delivery = DiscordDelivery(workers=workers)
+    stats_before = dict(delivery.stats)
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='summary-deliver') as pool:
+        futures = {pool.submit(deliver_summary, summary, webhook_url, output_dir, delivery): summary for summary in ready}
+        for future in as_completed(futures):
+            summary = futures[future]
+            entry: Dict[str, Any] = {'email': summary.user_email, 'user_id': summary.user_id}
+            try:
+                entry.update(status='ok', delivered=future.result())
+            except Exception as e:
+                entry.update(status='failed', error=str(e) or type(e).__name__)
+            missing_parts = summary.load_snapshot()['errors']
+            if missing_parts:
+                entry['missing_sections'] = sorted(missing_parts)
+            entries[summary.user_email] = entry
+    
+    run_date = nowPk().date().isoformat()
+    manifest = {
+        'date': run_date,
+        'duration_seconds': round(time.perf_counter() - started, 3),
+        'succeeded': sum(1 for e in entries.values() if e['status'] == 'ok'),
+        'failed': sum(1 for e in entries.values() if e['status'] != 'ok'),
+        'users': sorted(entries.values(), key=lambda e: e['email']),
+    }
+    if own_delivery:
+        delivery.close()
+    if webhook_url:
+        stats = {key: value - stats_before[key] for key, value in delivery.stats.items()}
+        manifest['discord'] = dict(stats, wait_seconds=round(stats['wait_seconds'], 3))
+    manifest_path = manifest_path or os.path.join(output_dir, f"summary_manifest_{run_date}.json")
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    
+    print(f"\n📋 {manifest['succeeded']} succeeded, {manifest['failed']} failed in {manifest['duration_seconds']}s")
+    print(f"📋 Manifest written to: {manifest_path}")
+    return manifest['failed'] == 0
+
+
+def refresh_rollups() -> bool:
+    """Bring the daily rollups up to date before reading them; False means fall back to raw transactions"""
+    try:
+        from transaction_rollups import TransactionRollups
+        result = TransactionRollups(supabase).refresh()
+        print(f"🔄 Rollups refreshed ({result['mode']}): {result['written']} rows written")
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not refresh rollups, reading raw transactions: {str(e)}")
+        return False
+
+
+def parse_args() -> argparse.Namespace:
+    from summary_cache import MAX_BYTES as CACHE_MAX_BYTES
+    parser = argparse.ArgumentParser(description="Generate the daily financial summary for a user")
+    parser.add_argument("emails", nargs="*", metavar="email", help="user email(s) (defaults to USER_EMAIL)")
+    parser.add_argument("--all-users", action="store_true", help="generate a report for every user")
+    parser.add_argument("--workers", type=int, default=4, help="reports rendered and delivered at once in batch mode")
+    parser.add_argument("--manifest", help="where batch mode writes its per-user JSON manifest")
+    parser.add_argument("--output-dir", default=".", help="directory for batch report files and the manifest")
+    parser.add_argument("--sequential", action="store_true", help="run the report queries one after another")
+    parser.add_argument("--query-timeout", type=float, default=float(os.getenv("SUMMARY_QUERY_TIMEOUT", QUERY_TIMEOUT)),
+                        help="seconds to wait for each query when loading in parallel")
+    parser.add_argument("--use-rollups", action="store_true", default=env_flag("SUMMARY_USE_ROLLUPS"),
+                        help="refresh and read the daily transaction rollups instead of scanning raw transactions")
+    parser.add_argument("--cache", action="store_true", default=env_flag("SUMMARY_CACHE"),
+                        help="keep transactions and invoices in a local SQLite cache and fetch only changes")
+    parser.add_argument("--cache-max-mb", type=float, default=CACHE_MAX_BYTES / 1024 / 1024,
+                        help="evict least recently used cache partitions beyond this size")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
 def main():
     """Main function"""
+    global supabase
+    # Before parsing: .env supplies the flag defaults as well as the credentials
+    load_env()
+    args = parse_args()
+    if isinstance(supabase, LazyClient) and not supabase.loaded:
+        supabase.timeout = args.query_timeout
+    if start_from_args(args):
+        supabase = PROFILER.wrap_client(supabase)
+    try:
+        run(args)
+    finally:
+        finish_from_args(args)
+
+
+def run(args: argparse.Namespace):
+    """Generate and deliver the report(s) requested on the command line"""
     # Get user email from environment or command line
     import sys
     
-    if len(sys.argv) > 1:
-        user_email = sys.argv[1]
-    else:
-        user_email = os.getenv("USER_EMAIL")
-        if not user_email:
-            print("❌ Error: Please provide user email as argument or set USER_EMAIL environment variable")
-            print("Usage: python daily_financial_summary.py user@example.com")
+    use_rollups = args.use_rollups and refresh_rollups()
+    if args.all_users or len(args.emails) > 1:
+        try:
+            ok = run_batch(None if args.all_users else args.emails, args.workers, args.manifest, args.output_dir, use_rollups,
+                           os.getenv("DISCORD_WEBHOOK_URL"))
+        except Exception as e:
+            print(f"❌ Error running batch summary: {str(e)}")
+            import traceback
+            traceback.print_exc()
             sys.exit(1)
+        sys.exit(0 if ok else 1)
+    
+    user_email = args.emails[0] if args.emails else os.getenv("USER_EMAIL")
+    if not user_email:
+        print("❌ Error: Please provide user email as argument or set USER_EMAIL environment variable")
+        print("Usage: python daily_financial_summary.py user@example.com")
+        sys.exit(1)
     
     try:
         print(f"🔄 Generating daily financial summary for: {user_email}\n")
         
-        summary = DailyFinancialSummary(user_email)
+        from summary_cache import SummaryCache
+        cache = SummaryCache(max_bytes=int(args.cache_max_mb * 1024 * 1024)) if args.cache else None
+        summary = DailyFinancialSummary(user_email, use_rollups=use_rollups, cache=cache)
+        snapshot = summary.load_snapshot(parallel=not args.sequential, timeout=args.query_timeout)
+        for part, error in sorted(snapshot['errors'].items()):
+            print(f"⚠️  Could not load {part}: {error}")
+        if cache is not None:
+            print(f"💾 Cache: {cache.stats['rows_fetched']} rows fetched ({cache.stats['bytes_fetched'] / 1024:,.1f} KiB), "
+                  f"{cache.stats['rows_reused']} reused")
         
         # Send to Discord if webhook URL is configured
-        if DISCORD_WEBHOOK_URL:
+        webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
+        if webhook_url:
             print("🔄 Sending to Discord...")
-            discord_sent = summary.send_to_discord(DISCORD_WEBHOOK_URL)
+            discord_sent = summary.send_to_discord(webhook_url)
             if not discord_sent:
                 # If Discord fails, print the message to console
                 message = summary.generate_summary_message()
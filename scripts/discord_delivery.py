@@ -0,0 +1,277 @@
+"""
+Discord webhook delivery: pooled, rate-limit aware, with retries.
+
+- Every post goes through one keep-alive `requests.Session`, with its pool
+  sized to the number of sender threads.
+- Posts to the same webhook are serialized through a bucket. The bucket
+  tracks Discord's `X-RateLimit-Remaining` / `X-RateLimit-Reset-After`
+  headers and waits for the reset instead of running into a 429.
+- A 429 waits out its `retry_after` (global limits block every webhook).
+  5xx responses and network errors are retried with exponential backoff and
+  full jitter. Any other 4xx fails straight away: resending the same payload
+  cannot fix it.
+- Payloads that exceed Discord's limits are split into several messages.
+  Long content is sent in 2000-character chunks; long descriptions, footers
+  and field values continue in further embeds or fields, and embeds are
+  spread over as many messages as needed.
+
+`submit()` queues a payload on the sender threads and returns a future;
+`send()` delivers one and blocks until it's done.
+"""
+
+import copy
+import time
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+# https://discord.com/developers/docs/resources/channel#embed-object-embed-limits
+MAX_TITLE = 256
+MAX_DESCRIPTION = 4096
+MAX_FIELDS = 25
+MAX_FIELD_NAME = 256
+MAX_FIELD_VALUE = 1024
+MAX_FOOTER = 2048
+MAX_EMBED_CHARS = 6000  # across every embed in one message
+MAX_EMBEDS = 10
+MAX_CONTENT = 2000  # message text outside the embeds
+
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+
+class DeliveryError(Exception):
+    """A payload could not be delivered; `status` is the last HTTP status, if any"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def _chunks(text: str, limit: int) -> List[str]:
+    """Split on line breaks where possible so each chunk fits in `limit` characters"""
+    chunks: List[str] = []
+    current = ''
+    for line in text.split('\n'):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = candidate
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
+
+def embed_size(embed: Dict[str, Any]) -> int:
+    """Characters Discord counts against the 6000-per-message limit"""
+    size = len(embed.get('title', '')) + len(embed.get('description', ''))
+    size += len(embed.get('footer', {}).get('text', '')) + len(embed.get('author', {}).get('name', ''))
+    return size + sum(len(field['name']) + len(field['value']) for field in embed.get('fields', []))
+
+
+def split_embed(embed: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One embed -> embeds that each respect Discord's per-embed limits, text kept in order.
+
+    A description or footer too long for one embed continues in the next ones,
+    as do the fields; the timestamp goes on the last.
+    """
+    fields: List[Dict[str, Any]] = []
+    for field in embed.get('fields', []):
+        name = _truncate(field['name'], MAX_FIELD_NAME)
+        for index, value in enumerate(_chunks(field['value'], MAX_FIELD_VALUE)):
+            part = dict(field, name=name if index == 0 else _truncate(f"{field['name']} (cont.)", MAX_FIELD_NAME),
+                        value=value or '\u200b')
+            fields.append(part)
+
+    continuation = {'color': embed['color']} if 'color' in embed else {}
+    embeds = [{key: value for key, value in embed.items() if key not in ('description', 'fields', 'footer', 'timestamp')}]
+    if 'title' in embeds[0]:
+        embeds[0]['title'] = _truncate(embeds[0]['title'], MAX_TITLE)
+
+    def room_for(key: str, size: int) -> Dict[str, Any]:
+        """The last embed if it can take `size` more characters under `key`, else a new one"""
+        current = embeds[-1]
+        full = len(current.get('fields', [])) >= MAX_FIELDS if key == 'fields' else key in current
+        if full or embed_size(current) + size > MAX_EMBED_CHARS:
+            current = dict(continuation)
+            embeds.append(current)
+        return current
+
+    if 'description' in embed:
+        for text in _chunks(embed['description'], MAX_DESCRIPTION):
+            room_for('description', len(text))['description'] = text
+    for field in fields:
+        room_for('fields', len(field['name']) + len(field['value'])).setdefault('fields', []).append(field)
+    if 'footer' in embed:
+        for text in _chunks(embed['footer'].get('text', ''), MAX_FOOTER):
+            room_for('footer', len(text))['footer'] = dict(embed['footer'], text=text)
+    if 'timestamp' in embed:
+        embeds[-1]['timestamp'] = embed['timestamp']
+    return embeds
+
+
+def split_payload(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """A webhook payload -> one or more payloads within the per-message content and embed limits"""
+    embeds = [part for embed in payload.get('embeds', []) for part in split_embed(embed)]
+    contents = _chunks(payload['content'], MAX_CONTENT) if payload.get('content') else []
+    if len(contents) <= 1 and len(embeds) <= MAX_EMBEDS and sum(embed_size(e) for e in embeds) <= MAX_EMBED_CHARS:
+        return [dict(payload, embeds=embeds)] if 'embeds' in payload else [payload]
+    common = {key: value for key, value in payload.items() if key not in ('embeds', 'content')}
+    # Content goes first, as it would above the embeds of a single message
+    messages = [dict(common, content=text) for text in contents] or [dict(common)]
+    size = 0
+    for embed in embeds:
+        current = messages[-1]
+        if current.get('embeds') and (len(current['embeds']) >= MAX_EMBEDS or size + embed_size(embed) > MAX_EMBED_CHARS):
+            current = dict(common)
+            messages.append(current)
+            size = 0
+        current.setdefault('embeds', []).append(embed)
+        size += embed_size(embed)
+    return messages
+
+
+class _Bucket:
+    """Rate-limit state for one webhook; holding `lock` is the right to post to it"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+
+
+class DiscordDelivery:
+    def __init__(self, workers: int = 4, timeout: float = 10.0, retries: int = 5,
+                 backoff: float = 0.5, max_backoff: float = 30.0, max_wait: float = 60.0):
+        self.workers = max(workers, 1)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # A Retry-After longer than this fails the delivery instead of stalling the run
+        self.max_wait = max_wait
+        self.stats = {'messages': 0, 'requests': 0, 'throttled': 0, 'retried': 0, 'failed': 0, 'wait_seconds': 0.0}
+        self._session = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._buckets: Dict[str, _Bucket] = {}
+        self._global_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                self._session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers)
+                self._session.mount('https://', adapter)
+                self._session.mount('http://', adapter)
+            return self._session
+
+    def _bucket(self, webhook_url: str) -> _Bucket:
+        with self._lock:
+            return self._buckets.setdefault(webhook_url.split('?')[0], _Bucket())
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def _wait_until(self, moment: float) -> None:
+        delay = moment - time.monotonic()
+        if delay > 0:
+            self._count('wait_seconds', delay)
+            time.sleep(delay)
+
+    def _backoff(self, attempt: int) -> None:
+        self._count('retried')
+        time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def _post(self, webhook_url: str, bucket: _Bucket, message: Dict[str, Any]) -> None:
+        import requests
+        throttles = 0
+        attempt = 0
+        while True:
+            self._wait_until(self._global_until)
+            if bucket.remaining == 0:
+                self._wait_until(bucket.reset_at)
+            self._count('requests')
+            try:
+                response = self.session.post(webhook_url, json=message, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt >= self.retries:
+                    raise DeliveryError(f"{type(e).__name__}: {e}") from e
+                self._backoff(attempt)
+                attempt += 1
+                continue
+
+            headers = response.headers
+            if 'X-RateLimit-Remaining' in headers:
+                bucket.remaining = int(headers['X-RateLimit-Remaining'])
+                bucket.reset_at = time.monotonic() + float(headers.get('X-RateLimit-Reset-After', 0))
+            if response.status_code < 300:
+                return
+            if response.status_code == 429:
+                self._count('throttled')
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {}
+                retry_after = float(body.get('retry_after') or headers.get('Retry-After') or 1)
+                throttles += 1
+                if retry_after > self.max_wait or throttles > self.retries * 4:
+                    raise DeliveryError(f"rate limited for {retry_after:.1f}s", 429)
+                resume = time.monotonic() + retry_after
+                if body.get('global') or headers.get('X-RateLimit-Global'):
+                    with self._lock:
+                        self._global_until = max(self._global_until, resume)
+                else:
+                    bucket.remaining, bucket.reset_at = 0, resume
+                continue
+            if response.status_code in RETRYABLE_STATUS and attempt < self.retries:
+                self._backoff(attempt)
+                attempt += 1
+                continue
+            raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", response.status_code)
+
+    def send(self, webhook_url: str, payload: Dict[str, Any]) -> int:
+        """Deliver `payload`, split as needed; returns the number of messages posted"""
+        messages = split_payload(copy.deepcopy(payload))
+        bucket = self._bucket(webhook_url)
+        # Holding the bucket for the whole payload keeps split messages in order
+        with bucket.lock:
+            for index, message in enumerate(messages):
+                try:
+                    self._post(webhook_url, bucket, message)
+                except DeliveryError as e:
+                    self._count('failed')
+                    raise DeliveryError(f"message {index + 1}/{len(messages)}: {e}", e.status) from e
+                self._count('messages')
+        return len(messages)
+
+    def submit(self, webhook_url: str, payload: Dict[str, Any]) -> Future:
+        """Queue `payload` for the sender threads"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='discord')
+        return self._pool.submit(self.send, webhook_url, payload)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
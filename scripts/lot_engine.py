@@ -0,0 +1,372 @@
+"""
+Incremental FIFO lot tracking over stock_transactions, dividends and trading_fees.
+
+Each user's book (open lots per symbol, realized gains, dividend income and
+fees, lifetime and per month) is checkpointed to a JSON file together with a
+created_at watermark per source table. An update applies only the rows added
+since the checkpoint. Buys open lots; sells consume the oldest lots first.
+
+The app only ever appends trades, but a trade can be backdated behind one
+already applied, which would break FIFO order. The book notices that and
+replays the user's full history. Deletes are caught by a row-count probe: the
+checkpoint records how many rows it applied from each table, all created at
+or before that table's watermark, and a different count for the same range
+means rows were removed, so the history is replayed. A full replay also runs
+when the checkpoint is older than FULL_REPLAY_DAYS, and `--verify` compares
+the checkpoint with a fresh replay.
+
+Usage:
+    python lot_engine.py USER_ID            # bring the checkpoint up to date and print it
+    python lot_engine.py USER_ID --replay   # rebuild the checkpoint from the full history
+    python lot_engine.py USER_ID --verify   # compare the checkpoint against a full replay
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from supabase_stream import stream_rows
+from sync_state import WATERMARK_OVERLAP, write_json
+
+STATE_DIR = os.getenv("LOT_STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".lot_state"))
+FULL_REPLAY_DAYS = int(os.getenv("LOT_FULL_REPLAY_DAYS", "7"))
+
+# Below this many shares a lot counts as used up (DECIMAL(15, 4) quantities)
+SHARE_EPSILON = 1e-6
+
+SOURCES = {
+    'stock_transactions': 'id,symbol,transaction_type,shares,price_per_share,transaction_date,created_at',
+    'dividends': 'id,symbol,amount,dividend_date,created_at',
+    'trading_fees': 'id,fee_type,amount,fee_date,created_at',
+}
+
+EMPTY_FIGURES = {'realized': 0.0, 'dividends': 0.0, 'fees': 0.0}
+EMPTY_REPORT: Dict[str, Any] = {
+    'month': dict(EMPTY_FIGURES, net=0.0),
+    'lifetime': dict(EMPTY_FIGURES, net=0.0),
+    'open_lots': 0,
+    'unmatched_shares': 0.0,
+    'realized_by_symbol': {},
+}
+
+
+class BackdatedTrade(Exception):
+    """A trade dated before one already applied for the same symbol"""
+
+
+class LotBook:
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        # {symbol: [[shares, cost_per_share, opened_on], ...]} oldest first
+        self.lots: Dict[str, List[List[Any]]] = state.get('lots', {})
+        self.last_trade_date: Dict[str, str] = state.get('last_trade_date', {})
+        self.lifetime: Dict[str, float] = state.get('lifetime', dict(EMPTY_FIGURES))
+        self.months: Dict[str, Dict[str, float]] = state.get('months', {})
+        self.realized_by_symbol: Dict[str, float] = state.get('realized_by_symbol', {})
+        self.fees_by_type: Dict[str, float] = state.get('fees_by_type', {})
+        self.unmatched_shares: float = state.get('unmatched_shares', 0.0)
+        # {source: rows applied}; None until the checkpoint has been counted
+        self.counts: Optional[Dict[str, int]] = state.get('counts')
+        self.watermarks: Dict[str, Optional[str]] = state.get('watermarks', {source: None for source in SOURCES})
+        # {source: {id: created_at}} for rows inside the overlap window behind each watermark
+        self.recent_ids: Dict[str, Dict[str, str]] = state.get('recent_ids', {source: {} for source in SOURCES})
+        self.replayed_at: Optional[str] = state.get('replayed_at')
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            'lots': self.lots,
+            'last_trade_date': self.last_trade_date,
+            'lifetime': self.lifetime,
+            'months': self.months,
+            'realized_by_symbol': self.realized_by_symbol,
+            'fees_by_type': self.fees_by_type,
+            'unmatched_shares': self.unmatched_shares,
+            'counts': self.counts,
+            'watermarks': self.watermarks,
+            'recent_ids': self.recent_ids,
+            'replayed_at': self.replayed_at,
+        }
+
+    def _book(self, figure: str, day: str, amount: float) -> None:
+        self.lifetime[figure] += amount
+        month = self.months.setdefault(day[:7], dict(EMPTY_FIGURES))
+        month[figure] += amount
+
+    def apply_trade(self, row: Dict[str, Any]) -> None:
+        symbol = row['symbol'].upper()
+        day = row['transaction_date']
+        if day < self.last_trade_date.get(symbol, ''):
+            raise BackdatedTrade(f"{symbol} trade on {day} after {self.last_trade_date[symbol]}")
+        self.last_trade_date[symbol] = day
+        shares = float(row['shares'])
+        price = float(row['price_per_share'])
+        lots = self.lots.setdefault(symbol, [])
+
+        if row['transaction_type'] == 'buy':
+            lots.append([shares, price, day])
+            return
+
+        remaining = shares
+        cost = 0.0
+        while remaining > SHARE_EPSILON and lots:
+            lot = lots[0]
+            used = min(lot[0], remaining)
+            cost += used * lot[1]
+            lot[0] -= used
+            remaining -= used
+            if lot[0] <= SHARE_EPSILON:
+                lots.pop(0)
+        if remaining > SHARE_EPSILON:
+            # Sold more than the recorded buys cover; the excess has no known basis
+            self.unmatched_shares += remaining
+        gain = (shares - max(remaining, 0.0)) * price - cost
+        self._book('realized', day, gain)
+        self.realized_by_symbol[symbol] = self.realized_by_symbol.get(symbol, 0.0) + gain
+        if not lots:
+            del self.lots[symbol]
+
+    def apply_dividend(self, row: Dict[str, Any]) -> None:
+        self._book('dividends', row['dividend_date'], float(row['amount']))
+
+    def apply_fee(self, row: Dict[str, Any]) -> None:
+        amount = float(row['amount'])
+        self._book('fees', row['fee_date'], amount)
+        self.fees_by_type[row['fee_type']] = self.fees_by_type.get(row['fee_type'], 0.0) + amount
+
+    def apply(self, source: str, rows: List[Dict[str, Any]]) -> None:
+        """Apply rows from one source table in booking order"""
+        if self.counts is not None:
+            self.counts[source] = self.counts.get(source, 0) + len(rows)
+        if source == 'stock_transactions':
+            for row in sorted(rows, key=lambda r: (r['transaction_date'], r['created_at'], str(r['id']))):
+                self.apply_trade(row)
+        elif source == 'dividends':
+            for row in rows:
+                self.apply_dividend(row)
+        else:
+            for row in rows:
+                self.apply_fee(row)
+
+    def advance(self, source: str, rows: List[Dict[str, Any]], scanned_at: Optional[str] = None) -> None:
+        """Move a source's watermark past `rows`, remembering ids inside the overlap window.
+
+        A source with no rows at all gets `scanned_at` (when its scan began)
+        as its watermark, so later updates still only read newer rows.
+        """
+        stamps = [r['created_at'] for r in rows]
+        if self.watermarks.get(source):
+            stamps.append(self.watermarks[source])
+        if not stamps:
+            if scanned_at:
+                self.watermarks[source] = scanned_at
+            return
+        newest = max(stamps, key=datetime.fromisoformat)
+        cutoff = datetime.fromisoformat(newest) - WATERMARK_OVERLAP
+        recent = dict(self.recent_ids.get(source, {}))
+        recent.update((str(r['id']), r['created_at']) for r in rows)
+        self.watermarks[source] = newest
+        self.recent_ids[source] = {
+            row_id: created_at for row_id, created_at in recent.items() if datetime.fromisoformat(created_at) >= cutoff
+        }
+
+    def report(self, month: str) -> Dict[str, Any]:
+        this_month = self.months.get(month, EMPTY_FIGURES)
+        return {
+            'month': dict(this_month, net=this_month['realized'] + this_month['dividends'] - this_month['fees']),
+            'lifetime': dict(self.lifetime, net=self.lifetime['realized'] + self.lifetime['dividends'] - self.lifetime['fees']),
+            'open_lots': sum(len(lots) for lots in self.lots.values()),
+            'unmatched_shares': self.unmatched_shares,
+            'realized_by_symbol': dict(self.realized_by_symbol),
+        }
+
+
+class LotEngine:
+    def __init__(self, client: Any, state_dir: str = STATE_DIR, full_replay_days: int = FULL_REPLAY_DAYS):
+        self.client = client
+        self.state_dir = state_dir
+        self.full_replay_days = full_replay_days
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _path(self, user_id: str) -> str:
+        return os.path.join(self.state_dir, f"{user_id}.json")
+
+    def load(self, user_id: str) -> Optional[LotBook]:
+        try:
+            with open(self._path(user_id), encoding='utf-8') as f:
+                return LotBook(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, user_id: str, book: LotBook) -> None:
+        path = self._path(user_id)
+        write_json(path, book.to_state())
+
+    def _rows(self, source: str, user_id: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        def query():
+            select = self.client.table(source).select(SOURCES[source]).eq('user_id', user_id)
+            return select.gte('created_at', since) if since else select
+        return list(stream_rows(query, keys=('created_at', 'id') if since else ('id',)))
+
+    def replay(self, user_id: str, save: bool = True) -> LotBook:
+        """Rebuild a user's book from every trade, dividend and fee"""
+        book = LotBook({'counts': {}})
+        for source in SOURCES:
+            scanned_at = datetime.now(timezone.utc).isoformat()
+            rows = self._rows(source, user_id)
+            book.apply(source, rows)
+            book.advance(source, rows, scanned_at)
+        book.replayed_at = datetime.now(timezone.utc).isoformat()
+        if save:
+            self.save(user_id, book)
+        return book
+
+    def _stale(self, book: LotBook) -> bool:
+        if not book.replayed_at or book.counts is None or not all(book.watermarks.get(s) for s in SOURCES):
+            return True
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(book.replayed_at)
+        return age > timedelta(days=self.full_replay_days)
+
+    def _since(self, book: LotBook, source: str) -> Optional[str]:
+        watermark = book.watermarks.get(source)
+        return (datetime.fromisoformat(watermark) - WATERMARK_OVERLAP).isoformat() if watermark else None
+
+    def _deleted(self, source: str, books: Dict[str, LotBook]) -> List[str]:
+        """Users with fewer `source` rows at or before their watermark than their checkpoint applied.
+
+        One count covers all of `books`; only when the total is off does each
+        user get a count of their own.
+        """
+        def count(user_ids: List[str]) -> Optional[int]:
+            ranges = ','.join(f"and(user_id.eq.{uid},created_at.lte.{books[uid].watermarks[source]})" for uid in user_ids)
+            return self.client.table(source).select('id', count='exact').or_(ranges).limit(1).execute().count
+
+        user_ids = list(books)
+        if count(user_ids) == sum(books[uid].counts.get(source, 0) for uid in user_ids):
+            return []
+        if len(user_ids) == 1:
+            return user_ids
+        return [uid for uid in user_ids if count([uid]) != books[uid].counts.get(source, 0)]
+
+    def _apply_fresh(self, user_id: str, book: LotBook, fresh: Dict[str, List[Dict[str, Any]]]) -> LotBook:
+        if not any(fresh.values()):
+            return book
+        try:
+            for source, rows in fresh.items():
+                book.apply(source, rows)
+                book.advance(source, rows)
+        except BackdatedTrade:
+            return self.replay(user_id)
+        self.save(user_id, book)
+        return book
+
+    def update(self, user_id: str) -> LotBook:
+        """Apply rows added since the checkpoint, falling back to a full replay when needed"""
+        book = self.load(user_id)
+        if book is None or self._stale(book) or any(self._deleted(source, {user_id: book}) for source in SOURCES):
+            return self.replay(user_id)
+
+        fresh: Dict[str, List[Dict[str, Any]]] = {}
+        for source in SOURCES:
+            seen = set(book.recent_ids.get(source, {}))
+            fresh[source] = [row for row in self._rows(source, user_id, self._since(book, source)) if str(row['id']) not in seen]
+        return self._apply_fresh(user_id, book, fresh)
+
+    def update_many(self, user_ids: List[str]) -> Dict[str, LotBook]:
+        """`update` for many users with one delta query per source table"""
+        books: Dict[str, LotBook] = {}
+        current: Dict[str, LotBook] = {}
+        for user_id in user_ids:
+            book = self.load(user_id)
+            if book is None or self._stale(book):
+                books[user_id] = self.replay(user_id)
+            else:
+                current[user_id] = book
+        if current:
+            for user_id in {uid for source in SOURCES for uid in self._deleted(source, current)}:
+                books[user_id] = self.replay(user_id)
+                del current[user_id]
+        if not current:
+            return books
+
+        fresh: Dict[str, Dict[str, List[Dict[str, Any]]]] = {uid: {source: [] for source in SOURCES} for uid in current}
+        ids = list(current)
+        for source in SOURCES:
+            cutoffs = {uid: self._since(book, source) for uid, book in current.items()}
+            # Every checkpoint has a watermark per source (see _stale), so each
+            # user's window starts at or after the earliest cutoff
+            since = min(cutoffs.values(), key=datetime.fromisoformat)
+            seen = {uid: set(book.recent_ids.get(source, {})) for uid, book in current.items()}
+            for row in stream_rows(lambda: self._bulk_query(source, ids, since), keys=('created_at', 'id')):
+                uid = row['user_id']
+                if str(row['id']) in seen[uid] or datetime.fromisoformat(row['created_at']) < datetime.fromisoformat(cutoffs[uid]):
+                    continue
+                fresh[uid][source].append(row)
+
+        for uid, book in current.items():
+            books[uid] = self._apply_fresh(uid, book, fresh[uid])
+        return books
+
+    def _bulk_query(self, source: str, user_ids: List[str], since: str) -> Any:
+        return self.client.table(source).select('user_id,' + SOURCES[source]).in_('user_id', user_ids).gte('created_at', since)
+
+    def verify(self, user_id: str, tolerance: float = 0.005) -> List[str]:
+        """Differences between the checkpoint and a full replay; empty means they agree"""
+        checkpoint = self.load(user_id)
+        if checkpoint is None:
+            return ["no checkpoint"]
+        replayed = self.replay(user_id, save=False)
+        problems = []
+        for figure in EMPTY_FIGURES:
+            have, want = checkpoint.lifetime[figure], replayed.lifetime[figure]
+            if abs(have - want) > tolerance:
+                problems.append(f"lifetime {figure}: checkpoint {have:,.2f} vs replay {want:,.2f}")
+        for symbol in sorted(set(checkpoint.lots) | set(replayed.lots)):
+            have = _open_position(checkpoint.lots.get(symbol, []))
+            want = _open_position(replayed.lots.get(symbol, []))
+            if abs(have[0] - want[0]) > SHARE_EPSILON or abs(have[1] - want[1]) > tolerance:
+                problems.append(f"{symbol} open lots: checkpoint {have[0]:g} sh / {have[1]:,.2f} vs replay {want[0]:g} sh / {want[1]:,.2f}")
+        return problems
+
+
+def _open_position(lots: List[List[Any]]) -> Tuple[float, float]:
+    """(shares, cost basis) over a symbol's open lots"""
+    return sum(lot[0] for lot in lots), sum(lot[0] * lot[1] for lot in lots)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain a user's FIFO lot checkpoint")
+    parser.add_argument("user_id")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--replay", action="store_true", help="rebuild the checkpoint from the full history")
+    mode.add_argument("--verify", action="store_true", help="compare the checkpoint against a full replay")
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    args = parser.parse_args()
+
+    from daily_financial_summary import supabase
+    engine = LotEngine(supabase, args.state_dir)
+    if args.verify:
+        problems = engine.verify(args.user_id)
+        for problem in problems:
+            print(f"❌ {problem}")
+        print("✅ Checkpoint matches a full replay" if not problems else f"❌ {len(problems)} differences")
+        return 1 if problems else 0
+
+    book = engine.replay(args.user_id) if args.replay else engine.update(args.user_id)
+    report = book.report(datetime.now(timezone.utc).strftime('%Y-%m'))
+    for period in ('month', 'lifetime'):
+        figures = report[period]
+        print(f"{period:<9} realized {figures['realized']:>+14,.2f}  dividends {figures['dividends']:>12,.2f}  "
+              f"fees {figures['fees']:>10,.2f}  net {figures['net']:>+14,.2f}")
+    for symbol, lots in sorted(book.lots.items()):
+        shares, cost = _open_position(lots)
+        print(f"  {symbol:<10}{len(lots):>3} lots {shares:>12,.4f} sh  basis {cost:>14,.2f}")
+    if report['unmatched_shares']:
+        print(f"⚠️  {report['unmatched_shares']:g} sold shares had no matching buy lots")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
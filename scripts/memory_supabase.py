@@ -0,0 +1,407 @@
+"""
+In-memory stand-in for the Supabase client, for offline benchmarks.
+
+It implements the slice of the PostgREST query builder that the scripts use:
+- `table().select(columns, count='exact')`, with `alias:column` renames;
+- `insert`, `upsert(on_conflict=..., ignore_duplicates=...)`, `update` and
+  `delete`;
+- the filters `eq`, `neq`, `gt`, `gte`, `lt`, `lte`, `in_`, `is_` and `or_`
+  (including the nested `and(...)` form that keyset paging sends);
+- `order(desc=...)`, `limit` and `range`, then `execute()`.
+
+Like a real project, it caps every response at `max_rows` (1000 by default),
+so code that forgets to page is caught here too.
+
+Rows live in plain lists of dicts. Equality and range filters are answered
+from lazily built hash and sorted indexes, which are dropped on every write,
+so keyset paging over a million rows stays fast.
+
+`stats` counts queries and rows returned per table and operation. The
+benchmarks use it to report how many round trips each stage would have made.
+"""
+
+import re
+import bisect
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Row = Dict[str, Any]
+Predicate = Callable[[Row], bool]
+
+MAX_ROWS = 1000
+
+# PostgREST's `col.op.value` filter syntax, as used inside or_() strings
+_CONDITION = re.compile(r'^([\w.]+?)\.(eq|neq|gt|gte|lt|lte|is|in)\.(.*)$', re.S)
+
+
+class APIResponse:
+    def __init__(self, data: List[Row], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _key(value: Any) -> Any:
+    """Hashable equality key that matches PostgREST's text comparison of filter values"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _like(value: Any, sample: Any) -> Any:
+    """Convert a filter value to the type of the column it is compared against"""
+    if isinstance(sample, bool) or sample is None:
+        return value
+    if isinstance(sample, (int, float)):
+        return float(value) if isinstance(value, str) else value
+    if isinstance(sample, str) and not isinstance(value, str):
+        # Dates and datetimes go over the wire as ISO strings
+        return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    return value
+
+
+def _compare(op: str, column: str, value: Any) -> Predicate:
+    if op == 'eq':
+        target = _key(value)
+        return lambda row: row.get(column) is not None and _key(row[column]) == target
+    if op == 'neq':
+        target = _key(value)
+        return lambda row: row.get(column) is not None and _key(row[column]) != target
+    if op == 'is':
+        wanted = {'null': None, 'true': True, 'false': False}.get(str(value).lower(), value)
+        return lambda row: row.get(column) is wanted
+    if op == 'in':
+        targets = {_key(v) for v in value}
+        return lambda row: row.get(column) is not None and _key(row[column]) in targets
+    compare = {
+        'gt': lambda a, b: a > b, 'gte': lambda a, b: a >= b,
+        'lt': lambda a, b: a < b, 'lte': lambda a, b: a <= b,
+    }[op]
+
+    def predicate(row: Row) -> bool:
+        current = row.get(column)
+        return current is not None and compare(current, _like(value, current))
+    return predicate
+
+
+def _split_top(text: str) -> List[str]:
+    """Split a PostgREST logic string on commas that are not inside parentheses"""
+    parts: List[str] = []
+    depth = 0
+    start = 0
+    for index, char in enumerate(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(text[start:index])
+            start = index + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _logic(text: str) -> Predicate:
+    """Predicate for one or_() term: `and(...)`, `or(...)` or `col.op.value`"""
+    for name, combine in (('and(', all), ('or(', any)):
+        if text.startswith(name) and text.endswith(')'):
+            terms = [_logic(part) for part in _split_top(text[len(name):-1])]
+            return lambda row, terms=terms, combine=combine: combine(term(row) for term in terms)
+    match = _CONDITION.match(text)
+    if not match:
+        raise ValueError(f"unsupported filter: {text}")
+    column, op, value = match.groups()
+    if op == 'in':
+        value = [v.strip().strip('"') for v in value.strip('()').split(',')]
+    return _compare(op, column, value)
+
+
+class _Table:
+    """One table's rows plus indexes that are rebuilt on demand after writes"""
+
+    def __init__(self):
+        self.rows: List[Row] = []
+        self.sequence = 0
+        self._hash: Dict[str, Dict[Any, List[Row]]] = {}
+        self._sorted: Dict[str, Tuple[List[Any], List[Row]]] = {}
+        self._unique: Dict[Tuple[str, ...], Dict[Tuple[Any, ...], Row]] = {}
+
+    def changed(self) -> None:
+        self._hash.clear()
+        self._sorted.clear()
+        self._unique.clear()
+
+    def hash_index(self, column: str) -> Dict[Any, List[Row]]:
+        index = self._hash.get(column)
+        if index is None:
+            index = {}
+            for row in self.rows:
+                if row.get(column) is not None:
+                    index.setdefault(_key(row[column]), []).append(row)
+            self._hash[column] = index
+        return index
+
+    def sorted_index(self, column: str) -> Tuple[List[Any], List[Row]]:
+        index = self._sorted.get(column)
+        if index is None:
+            pairs = sorted(((row[column], n) for n, row in enumerate(self.rows) if row.get(column) is not None))
+            index = ([value for value, _ in pairs], [self.rows[n] for _, n in pairs])
+            self._sorted[column] = index
+        return index
+
+    def unique_index(self, columns: Tuple[str, ...]) -> Dict[Tuple[Any, ...], Row]:
+        index = self._unique.get(columns)
+        if index is None:
+            index = {tuple(_key(row.get(c)) for c in columns): row for row in self.rows}
+            self._unique[columns] = index
+        return index
+
+
+class _Query:
+    def __init__(self, client: 'MemorySupabase', name: str):
+        self._client = client
+        self._name = name
+        self._operation = 'select'
+        self._columns = '*'
+        self._count: Optional[str] = None
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+        self._ignore_duplicates = False
+        self._filters: List[Predicate] = []
+        # (column, op, value) for top-level filters an index can answer
+        self._indexable: List[Tuple[str, str, Any]] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._range: Optional[Tuple[int, int]] = None
+
+    # Operations
+
+    def select(self, columns: str = '*', count: Optional[str] = None, **kwargs) -> '_Query':
+        self._columns = columns
+        self._count = count
+        return self
+
+    def insert(self, rows: Any, **kwargs) -> '_Query':
+        self._operation = 'insert'
+        self._payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows: Any, on_conflict: Optional[str] = None, ignore_duplicates: bool = False, **kwargs) -> '_Query':
+        self._operation = 'upsert'
+        self._payload = rows if isinstance(rows, list) else [rows]
+        self._on_conflict = on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values: Row, **kwargs) -> '_Query':
+        self._operation = 'update'
+        self._payload = values
+        return self
+
+    def delete(self, **kwargs) -> '_Query':
+        self._operation = 'delete'
+        return self
+
+    # Filters
+
+    def _filter(self, op: str, column: str, value: Any) -> '_Query':
+        self._filters.append(_compare(op, column, value))
+        if op in ('eq', 'in', 'gt', 'gte', 'lt', 'lte'):
+            self._indexable.append((column, op, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> '_Query':
+        return self._filter('eq', column, value)
+
+    def neq(self, column: str, value: Any) -> '_Query':
+        return self._filter('neq', column, value)
+
+    def gt(self, column: str, value: Any) -> '_Query':
+        return self._filter('gt', column, value)
+
+    def gte(self, column: str, value: Any) -> '_Query':
+        return self._filter('gte', column, value)
+
+    def lt(self, column: str, value: Any) -> '_Query':
+        return self._filter('lt', column, value)
+
+    def lte(self, column: str, value: Any) -> '_Query':
+        return self._filter('lte', column, value)
+
+    def in_(self, column: str, values: Iterable[Any]) -> '_Query':
+        return self._filter('in', column, list(values))
+
+    def is_(self, column: str, value: Any) -> '_Query':
+        return self._filter('is', column, value)
+
+    def or_(self, filters: str, **kwargs) -> '_Query':
+        terms = [_logic(part) for part in _split_top(filters)]
+        self._filters.append(lambda row: any(term(row) for term in terms))
+        return self
+
+    # Modifiers
+
+    def order(self, column: str, desc: bool = False, **kwargs) -> '_Query':
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs) -> '_Query':
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs) -> '_Query':
+        self._range = (start, end)
+        return self
+
+    # Execution
+
+    def _candidates(self, table: _Table) -> Sequence[Row]:
+        """The smallest row set an index can narrow the filters to; the filters still run over it"""
+        best: Sequence[Row] = table.rows
+        bounds: Dict[str, Dict[str, Any]] = {}
+        for column, op, value in self._indexable:
+            if op == 'eq':
+                found = table.hash_index(column).get(_key(value), [])
+            elif op == 'in':
+                index = table.hash_index(column)
+                found = [row for v in dict.fromkeys(_key(v) for v in value) for row in index.get(v, [])]
+            else:
+                bounds.setdefault(column, {})[op] = value
+                continue
+            if len(found) < len(best):
+                best = found
+        for column, ops in bounds.items():
+            values, rows = table.sorted_index(column)
+            if not values:
+                return []
+            lo, hi = 0, len(values)
+            for op, value in ops.items():
+                value = _like(value, values[0])
+                if op == 'gt':
+                    lo = max(lo, bisect.bisect_right(values, value))
+                elif op == 'gte':
+                    lo = max(lo, bisect.bisect_left(values, value))
+                elif op == 'lt':
+                    hi = min(hi, bisect.bisect_left(values, value))
+                else:
+                    hi = min(hi, bisect.bisect_right(values, value))
+            if max(hi - lo, 0) < len(best):
+                best = rows[lo:hi]
+        return best
+
+    def _matching(self, table: _Table) -> List[Row]:
+        candidates = self._candidates(table)
+        if not self._filters:
+            return list(candidates)
+        return [row for row in candidates if all(f(row) for f in self._filters)]
+
+    def _project(self, row: Row) -> Row:
+        if self._columns.strip() == '*':
+            return dict(row)
+        projected = {}
+        for column in self._columns.split(','):
+            alias, _, source = column.strip().partition(':')
+            projected[alias] = row.get(source or alias)
+        return projected
+
+    def _write(self, table: _Table) -> List[Row]:
+        if self._operation == 'update':
+            matched = self._matching(table)
+            for row in matched:
+                row.update(self._payload)
+            table.changed()
+            return [dict(row) for row in matched]
+        if self._operation == 'delete':
+            matched = self._matching(table)
+            doomed = {id(row) for row in matched}
+            table.rows = [row for row in table.rows if id(row) not in doomed]
+            table.changed()
+            return [dict(row) for row in matched]
+
+        conflict = tuple(c.strip() for c in (self._on_conflict or 'id').split(','))
+        existing = table.unique_index(conflict) if self._operation == 'upsert' else {}
+        written = []
+        for payload in self._payload:
+            key = tuple(_key(payload.get(c)) for c in conflict)
+            row = existing.get(key)
+            if row is not None:
+                if not self._ignore_duplicates:
+                    row.update(payload)
+                    written.append(dict(row))
+                continue
+            row = dict(payload)
+            if 'id' not in row:
+                # BIGSERIAL-style ids for tables that let the database assign them
+                table.sequence += 1
+                row['id'] = table.sequence
+            table.rows.append(row)
+            existing[tuple(_key(row.get(c)) for c in conflict)] = row
+            written.append(dict(row))
+        table.changed()
+        return written
+
+    def execute(self) -> APIResponse:
+        client = self._client
+        with client.lock:
+            table = client.tables.setdefault(self._name, _Table())
+            if self._operation != 'select':
+                data = self._write(table)
+                client.stats[(self._name, self._operation)] += 1
+                return APIResponse(data)
+
+            matched = self._matching(table)
+            for column, desc in reversed(self._order):
+                # Nulls sort last ascending and first descending, as in Postgres
+                present = [row for row in matched if row.get(column) is not None]
+                missing = [row for row in matched if row.get(column) is None]
+                present.sort(key=lambda row: row[column], reverse=desc)
+                matched = missing + present if desc else present + missing
+            count = len(matched) if self._count else None
+            if self._range is not None:
+                matched = matched[self._range[0]:self._range[1] + 1]
+            if self._limit is not None:
+                matched = matched[:self._limit]
+            data = [self._project(row) for row in matched[:client.max_rows]]
+            client.stats[(self._name, 'select')] += 1
+            client.rows_returned[self._name] += len(data)
+            return APIResponse(data, count)
+
+
+class MemorySupabase:
+    def __init__(self, tables: Optional[Dict[str, List[Row]]] = None, max_rows: int = MAX_ROWS):
+        self.max_rows = max_rows
+        self.tables: Dict[str, _Table] = {}
+        self.lock = threading.RLock()
+        self.stats: Counter = Counter()
+        self.rows_returned: Counter = Counter()
+        for name, rows in (tables or {}).items():
+            self.load(name, rows)
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def from_(self, name: str) -> _Query:
+        return self.table(name)
+
+    def load(self, name: str, rows: Iterable[Row]) -> int:
+        """Bulk-append rows without counting them as queries"""
+        with self.lock:
+            table = self.tables.setdefault(name, _Table())
+            before = len(table.rows)
+            table.rows.extend(rows)
+            table.changed()
+            return len(table.rows) - before
+
+    def rows(self, name: str) -> List[Row]:
+        table = self.tables.get(name)
+        return table.rows if table else []
+
+    def queries(self) -> int:
+        return sum(self.stats.values())
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.stats.clear()
+            self.rows_returned.clear()
@@ -0,0 +1,237 @@
+"""
+Daily total-portfolio-value series per user.
+
+The series is built by one sweep over date-sorted events:
+- stock trades change share positions;
+- NAV updates and fund invest/withdraw change mutual fund values;
+- PSX closes from the local price history cache re-price positions (read
+  straight from psx_price_history for the needed symbols and days when the
+  cache is empty).
+
+Cash is reconstructed backwards from the current balance using the trades and
+dividends dated after each day.
+
+Finished days (up to yesterday) are cached in a JSON file per user, along with
+the positions at the end of the last finished day. A later run only fetches
+events dated after that day and sweeps forward from there. A row-count probe
+on events dated on or before it catches backdated or deleted rows; when the
+counts disagree, the series is rebuilt from scratch.
+
+Usage:
+    python portfolio_series.py USER_ID            # extend and print the last 30 days
+    python portfolio_series.py USER_ID --rebuild  # discard the cache and sweep the full history
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from supabase_stream import stream_rows
+from sync_state import write_json
+from price_history import PriceHistoryCache, fetchDailyCloses
+
+SERIES_DIR = os.getenv("PORTFOLIO_SERIES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".portfolio_series"))
+
+# source table -> (date column, columns read); sources sharing a date sort in this order
+SOURCES = {
+    'stock_transactions': ('transaction_date', 'id,symbol,transaction_type,shares,price_per_share,total_amount,transaction_date,created_at'),
+    'dividends': ('dividend_date', 'id,amount,dividend_date,created_at'),
+    'mutual_fund_value_history': ('update_date', 'id,mutual_fund_id,fund_name,new_value,update_date,created_at'),
+    'mutual_fund_transactions': ('transaction_date', 'id,mutual_fund_id,fund_name,transaction_type,amount,transaction_date,created_at'),
+}
+SOURCE_ORDER = {source: rank for rank, source in enumerate(SOURCES)}
+
+Event = Tuple[str, str, Dict[str, Any]]
+
+
+def _fund_key(row: Dict[str, Any]) -> str:
+    return row.get('mutual_fund_id') or f"name:{row['fund_name']}"
+
+
+def _cash_effect(source: str, row: Dict[str, Any]) -> float:
+    """How an event moved the cash account (buys draw it down; sells and dividends pay into it)"""
+    if source == 'stock_transactions':
+        amount = float(row['total_amount'])
+        return -amount if row['transaction_type'] == 'buy' else amount
+    if source == 'dividends':
+        return float(row['amount'])
+    return 0.0
+
+
+class PortfolioSeries:
+    def __init__(self, client: Any, series_dir: str = SERIES_DIR, prices: Optional[PriceHistoryCache] = None):
+        self.client = client
+        self.series_dir = series_dir
+        self.prices = prices or PriceHistoryCache()
+        self._synced = False
+        self._cold = False
+        os.makedirs(series_dir, exist_ok=True)
+
+    def _path(self, user_id: str) -> str:
+        return os.path.join(self.series_dir, f"{user_id}.json")
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(user_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, user_id: str, state: Dict[str, Any]) -> None:
+        path = self._path(user_id)
+        write_json(path, state)
+
+    def _count_through(self, source: str, user_id: str, through: str) -> Optional[int]:
+        date_column, _ = SOURCES[source]
+        return self.client.table(source).select('id', count='exact').eq('user_id', user_id).lte(
+            date_column, through
+        ).limit(1).execute().count
+
+    def _events(self, user_id: str, after: Optional[str]) -> List[Event]:
+        events: List[Event] = []
+        for source, (date_column, columns) in SOURCES.items():
+            def query():
+                select = self.client.table(source).select(columns).eq('user_id', user_id)
+                return select.gt(date_column, after) if after else select
+            events.extend((row[date_column], source, row) for row in stream_rows(query))
+        events.sort(key=lambda e: (e[0], SOURCE_ORDER[e[1]], e[2].get('created_at') or '', str(e[2]['id'])))
+        return events
+
+    def _cash_balance(self, user_id: str) -> float:
+        response = self.client.table('cash_account').select('balance').eq('user_id', user_id).execute()
+        return float(response.data[0]['balance']) if response.data else 0.0
+
+    def _daily_closes(self, symbols: List[str], start: date, end: date) -> Dict[str, Dict[date, float]]:
+        if not self._synced:
+            # With no local cache (a fresh CI runner), syncing would pull the whole table;
+            # read just these symbols and days instead
+            self._cold = not self.prices.symbols()
+            if not self._cold:
+                try:
+                    self.prices.sync(self.client)
+                except Exception:
+                    # Stale closes are still better than none; trade prices fill any gaps
+                    pass
+            self._synced = True
+        if self._cold:
+            try:
+                return fetchDailyCloses(self.client, symbols, start, end)
+            except Exception:
+                return {}
+        return {symbol: self.prices.dailyCloses(symbol, start, end) for symbol in symbols}
+
+    def extend(self, user_id: str, today: date, rebuild: bool = False) -> Dict[str, Any]:
+        """Sweep every finished day not cached yet; returns the user's state with its 'days' series"""
+        yesterday = (today - timedelta(days=1)).isoformat()
+        state = None if rebuild else self.load(user_id)
+        if state is not None:
+            counts = {source: self._count_through(source, user_id, state['through']) for source in SOURCES}
+            if any(counts[source] is not None and counts[source] != state['counts'].get(source) for source in SOURCES):
+                state = None
+        if state is not None and state['through'] >= yesterday:
+            return state
+
+        events = self._events(user_id, state['through'] if state else None)
+        if state is None:
+            if not events:
+                return {'through': yesterday, 'days': {}, 'positions': {}, 'funds': {}, 'last_price': {},
+                        'counts': {source: 0 for source in SOURCES}}
+            state = {'through': (date.fromisoformat(events[0][0]) - timedelta(days=1)).isoformat(),
+                     'days': {}, 'positions': {}, 'funds': {}, 'last_price': {}, 'counts': {source: 0 for source in SOURCES}}
+
+        start = date.fromisoformat(state['through']) + timedelta(days=1)
+        end = today - timedelta(days=1)
+        positions: Dict[str, float] = state['positions']
+        funds: Dict[str, float] = state['funds']
+        last_price: Dict[str, float] = state['last_price']
+        symbols = sorted(set(positions) | {row['symbol'].upper() for _, source, row in events if source == 'stock_transactions'})
+        closes = self._daily_closes(symbols, start, end) if start <= end else {}
+
+        # Cash at the end of day d = current balance minus every cash move dated after d
+        cash_after = sum(_cash_effect(source, row) for _, source, row in events)
+        cash = self._cash_balance(user_id) - cash_after
+
+        index = 0
+        day = start
+        while day <= end:
+            key = day.isoformat()
+            while index < len(events) and events[index][0] <= key:
+                _, source, row = events[index]
+                index += 1
+                state['counts'][source] = state['counts'].get(source, 0) + 1
+                cash += _cash_effect(source, row)
+                if source == 'stock_transactions':
+                    symbol = row['symbol'].upper()
+                    shares = float(row['shares'])
+                    positions[symbol] = positions.get(symbol, 0.0) + (shares if row['transaction_type'] == 'buy' else -shares)
+                    if positions[symbol] <= 1e-6:
+                        del positions[symbol]
+                    last_price[symbol] = float(row['price_per_share'])
+                elif source == 'mutual_fund_value_history':
+                    funds[_fund_key(row)] = float(row['new_value'])
+                elif source == 'mutual_fund_transactions':
+                    amount = float(row['amount'])
+                    fund = _fund_key(row)
+                    funds[fund] = max(funds.get(fund, 0.0) + (amount if row['transaction_type'] == 'invest' else -amount), 0.0)
+            for symbol in positions:
+                close = closes.get(symbol, {}).get(day)
+                if close is not None:
+                    last_price[symbol] = close
+            stock_value = sum(shares * last_price.get(symbol, 0.0) for symbol, shares in positions.items())
+            fund_value = sum(funds.values())
+            state['days'][key] = {
+                'stocks': round(stock_value, 2),
+                'mutual_funds': round(fund_value, 2),
+                'cash': round(cash, 2),
+                'total': round(stock_value + fund_value + cash, 2),
+            }
+            day += timedelta(days=1)
+
+        state['through'] = max(state['through'], yesterday)
+        self._save(user_id, state)
+        return state
+
+
+def changes(days: Dict[str, Dict[str, float]], today: date, current_total: float) -> Dict[str, Optional[Dict[str, float]]]:
+    """Change in total value against yesterday, a week ago and the previous month's close"""
+    references = {
+        'day': today - timedelta(days=1),
+        'week': today - timedelta(days=7),
+        'month': today.replace(day=1) - timedelta(days=1),
+    }
+    result: Dict[str, Optional[Dict[str, float]]] = {}
+    for period, reference in references.items():
+        point = days.get(reference.isoformat())
+        if point is None:
+            result[period] = None
+            continue
+        change = current_total - point['total']
+        result[period] = {
+            'change': change,
+            'percentage': (change / point['total'] * 100) if point['total'] else 0.0,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a user's daily portfolio value series")
+    parser.add_argument("user_id")
+    parser.add_argument("--rebuild", action="store_true", help="discard the cached days and sweep the full history")
+    parser.add_argument("--days", type=int, default=30, help="how many recent days to print")
+    args = parser.parse_args()
+
+    from daily_financial_summary import supabase
+    from psx_calendar import nowPk
+    state = PortfolioSeries(supabase).extend(args.user_id, nowPk().date(), rebuild=args.rebuild)
+    for key in sorted(state['days'])[-args.days:]:
+        point = state['days'][key]
+        print(f"{key}  stocks {point['stocks']:>14,.2f}  funds {point['mutual_funds']:>14,.2f}  "
+              f"cash {point['cash']:>14,.2f}  total {point['total']:>14,.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
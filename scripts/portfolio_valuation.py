@@ -0,0 +1,161 @@
+"""
+Mark-to-market valuation of stock holdings against psx_stocks prices.
+
+Holdings from any number of users are priced with one bulk `symbol IN (...)`
+lookup per chunk of distinct symbols, then valued as NumPy columns: market
+value, unrealized P&L and the per-sector / per-user rollups are array
+arithmetic and bincounts rather than per-holding loops. A holding whose
+symbol has no current price is carried at cost and flagged as unpriced.
+
+Usage:
+    python portfolio_valuation.py                 # every user's holdings, by user and sector
+    python portfolio_valuation.py --user-id UUID  # one user's holdings
+"""
+
+import sys
+import argparse
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+from supabase_stream import stream_rows
+
+PRICE_COLUMNS = 'symbol,sector,current_price,last_updated'
+UNKNOWN_SECTOR = 'Other'
+
+
+def fetch_prices(client: Any, symbols: Iterable[str], chunk_size: int = 200) -> Dict[str, Dict[str, Any]]:
+    """{SYMBOL: psx_stocks row} for every listed symbol in `symbols`"""
+    wanted = sorted({symbol.upper() for symbol in symbols})
+    prices: Dict[str, Dict[str, Any]] = {}
+    for start in range(0, len(wanted), chunk_size):
+        chunk = wanted[start:start + chunk_size]
+        for row in stream_rows(lambda: client.table('psx_stocks').select(PRICE_COLUMNS).in_('symbol', chunk), keys=('symbol',)):
+            prices[row['symbol'].upper()] = row
+    return prices
+
+
+def attach_prices(holdings: List[Dict[str, Any]], prices: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copy sector, current_price and price_updated onto each holding row"""
+    priced = []
+    for holding in holdings:
+        quote = prices.get(holding['symbol'].upper(), {})
+        priced.append({
+            **holding,
+            'sector': quote.get('sector') or UNKNOWN_SECTOR,
+            'current_price': quote.get('current_price'),
+            'price_updated': quote.get('last_updated'),
+        })
+    return priced
+
+
+class Valuation:
+    """Columnar market values for a set of priced holdings (see attach_prices)"""
+
+    def __init__(self, holdings: List[Dict[str, Any]]):
+        self.rows = holdings
+        self.shares = np.array([float(h['total_shares']) for h in holdings], dtype=np.float64)
+        self.invested = np.array([float(h['total_invested']) for h in holdings], dtype=np.float64)
+        self.price = np.array([
+            float(h['current_price']) if h.get('current_price') is not None else np.nan for h in holdings
+        ], dtype=np.float64)
+        self.priced = ~np.isnan(self.price)
+        # Unpriced holdings are carried at cost so totals don't collapse when a quote is missing
+        self.market_value = np.where(self.priced, self.shares * np.nan_to_num(self.price), self.invested)
+        self.unrealized = self.market_value - self.invested
+        self.sectors, self._sector_codes = np.unique(
+            np.array([h.get('sector') or UNKNOWN_SECTOR for h in holdings], dtype=object), return_inverse=True
+        ) if holdings else (np.array([], dtype=object), np.array([], dtype=np.intp))
+        self.users, self._user_codes = np.unique(
+            np.array([h.get('user_id', '') for h in holdings], dtype=object), return_inverse=True
+        ) if holdings else (np.array([], dtype=object), np.array([], dtype=np.intp))
+
+    @staticmethod
+    def _pct(pl: float, invested: float) -> float:
+        return (pl / invested * 100) if invested > 0 else 0.0
+
+    def _totals(self, mask: np.ndarray) -> Dict[str, Any]:
+        invested = float(self.invested[mask].sum())
+        market_value = float(self.market_value[mask].sum())
+        return {
+            'count': int(mask.sum()),
+            'total_invested': invested,
+            'market_value': market_value,
+            'unrealized_pl': market_value - invested,
+            'unrealized_pct': self._pct(market_value - invested, invested),
+            'unpriced': int((mask & ~self.priced).sum()),
+        }
+
+    def totals(self) -> Dict[str, Any]:
+        return self._totals(np.ones(len(self.rows), dtype=bool))
+
+    def _grouped(self, labels: np.ndarray, codes: np.ndarray) -> Dict[str, Dict[str, Any]]:
+        size = len(labels)
+        invested = np.bincount(codes, weights=self.invested, minlength=size)
+        value = np.bincount(codes, weights=self.market_value, minlength=size)
+        count = np.bincount(codes, minlength=size)
+        return {
+            str(labels[i]): {
+                'count': int(count[i]),
+                'total_invested': float(invested[i]),
+                'market_value': float(value[i]),
+                'unrealized_pl': float(value[i] - invested[i]),
+                'unrealized_pct': self._pct(float(value[i] - invested[i]), float(invested[i])),
+            }
+            for i in range(size)
+        }
+
+    def by_sector(self) -> Dict[str, Dict[str, Any]]:
+        return self._grouped(self.sectors, self._sector_codes)
+
+    def by_user(self) -> Dict[str, Dict[str, Any]]:
+        return self._grouped(self.users, self._user_codes)
+
+    def holdings(self) -> List[Dict[str, Any]]:
+        """Holding rows with market_value, unrealized_pl/pct and priced added, largest value first"""
+        valued = []
+        for i, row in enumerate(self.rows):
+            valued.append({
+                **row,
+                'market_value': float(self.market_value[i]),
+                'unrealized_pl': float(self.unrealized[i]),
+                'unrealized_pct': self._pct(float(self.unrealized[i]), float(self.invested[i])),
+                'priced': bool(self.priced[i]),
+            })
+        return sorted(valued, key=lambda h: h['market_value'], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Value stock holdings at current PSX prices")
+    parser.add_argument("--user-id", help="only this user's holdings")
+    args = parser.parse_args()
+
+    from daily_financial_summary import supabase
+
+    def holdings_query():
+        query = supabase.table('stocks').select('id,user_id,symbol,company_name,total_shares,total_invested')
+        return query.eq('user_id', args.user_id) if args.user_id else query
+
+    holdings = list(stream_rows(holdings_query))
+    valuation = Valuation(attach_prices(holdings, fetch_prices(supabase, (h['symbol'] for h in holdings))))
+
+    def line(label: str, figures: Dict[str, Any]) -> str:
+        return (f"{label:<38}{figures['count']:>5}{figures['total_invested']:>16,.2f}"
+                f"{figures['market_value']:>16,.2f}{figures['unrealized_pl']:>+16,.2f}{figures['unrealized_pct']:>+9.1f}%")
+
+    print(f"{'':<38}{'n':>5}{'invested':>16}{'value':>16}{'p&l':>16}")
+    if not args.user_id:
+        for user_id, figures in sorted(valuation.by_user().items()):
+            print(line(user_id, figures))
+        print()
+    for sector, figures in sorted(valuation.by_sector().items(), key=lambda item: -item[1]['market_value']):
+        print(line(sector, figures))
+    totals = valuation.totals()
+    print(line("TOTAL", totals))
+    if totals['unpriced']:
+        print(f"⚠️  {totals['unpriced']} holdings have no current price and are carried at cost")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""PSX price history: batched appends to psx_price_history plus a local columnar cache.
+
+The cache keeps two memory-mapped columns per symbol, `<SYMBOL>.ts` (int64
+epoch seconds) and `<SYMBOL>.px` (float64 prices), both sorted by time, so a
+range query is a binary search and a slice instead of a scan over JSON rows.
+
+Usage:
+    python price_history.py LUCK --days 30          # LUCK snapshots over the last 30 days
+    python price_history.py --on 2026-10-16         # every symbol's close on a date
+    python price_history.py --sync                  # pull snapshots the cache hasn't seen yet
+"""
+
+import os
+import sys
+import mmap
+import bisect
+import argparse
+from array import array
+from datetime import datetime, date, timedelta, timezone
+from psx_calendar import pkTz
+from supabase_stream import stream_rows
+
+CACHE_DIR=os.environ.get("PSX_PRICE_HISTORY_DIR",os.path.join(os.path.dirname(os.path.abspath(__file__)),".price_history"))
+
+def appendHistory(client,rows,chunkSize=500):
+    """Insert (symbol, price, captured_at) rows in chunks; replays of the same snapshot are ignored.
+
+    Returns the number of rows sent and a list of per-chunk error messages.
+    """
+    sent=0
+    errors=[]
+    for start in range(0,len(rows),chunkSize):
+        chunk=rows[start:start+chunkSize]
+        try:
+            client.table("psx_price_history").upsert(
+                chunk,on_conflict="symbol,captured_at",ignore_duplicates=True
+            ).execute()
+            sent+=len(chunk)
+        except Exception as e:
+            errors.append(str(e))
+    return sent,errors
+
+def fetchDailyCloses(client,symbols,start,end,pageSize=1000,groupSize=200):
+    """{symbol: {date: last price that PKT day}} for days `start`..`end`, straight from psx_price_history.
+
+    For runners without a local cache: only these symbols and days are read,
+    instead of syncing the whole table first.
+    """
+    since=pkTz().localize(datetime.combine(start,datetime.min.time())).isoformat()
+    until=pkTz().localize(datetime.combine(end+timedelta(days=1),datetime.min.time())).isoformat()
+    closes={}
+    for first in range(0,len(symbols),groupSize):
+        group=symbols[first:first+groupSize]
+        offset=0
+        while True:
+            rows=client.table("psx_price_history").select("symbol,price,captured_at").in_("symbol",group).gte(
+                "captured_at",since
+            ).lt("captured_at",until).order("captured_at").order("symbol").range(offset,offset+pageSize-1).execute().data
+            for row in rows:
+                day=datetime.fromisoformat(row["captured_at"]).astimezone(pkTz()).date()
+                closes.setdefault(row["symbol"].upper(),{})[day]=float(row["price"])
+            offset+=len(rows)
+            if len(rows)<pageSize:
+                break
+    return closes
+
+def toEpoch(value):
+    if isinstance(value,str):
+        value=datetime.fromisoformat(value)
+    return int(value.timestamp())
+
+class _Column:
+    """A read-only mmap over one column file, viewed as a typed array."""
+    def __init__(self,path,typecode):
+        self.view=None
+        self.map=None
+        self.file=None
+        if os.path.exists(path) and os.path.getsize(path):
+            self.file=open(path,"rb")
+            self.map=mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+            self.view=memoryview(self.map).cast(typecode)
+
+    def __len__(self):
+        return len(self.view) if self.view is not None else 0
+
+    def __getitem__(self,index):
+        return self.view[index]
+
+    def close(self):
+        if self.view is not None:
+            self.view.release()
+            self.map.close()
+            self.file.close()
+
+class PriceHistoryCache:
+    def __init__(self,directory=CACHE_DIR):
+        self.directory=directory
+        os.makedirs(directory,exist_ok=True)
+
+    def _paths(self,symbol):
+        base=os.path.join(self.directory,symbol.upper())
+        return base+".ts",base+".px"
+
+    def symbols(self):
+        return sorted(name[:-3] for name in os.listdir(self.directory) if name.endswith(".ts"))
+
+    def lastTimestamp(self,symbol):
+        tsPath,_=self._paths(symbol)
+        size=os.path.getsize(tsPath) if os.path.exists(tsPath) else 0
+        if not size:
+            return None
+        with open(tsPath,"rb") as f:
+            f.seek(size-8)
+            last=array("q")
+            last.frombytes(f.read(8))
+        return last[0]
+
+    def append(self,rows):
+        """Append {symbol, price, captured_at} rows; anything not newer than a symbol's last snapshot is dropped."""
+        bySymbol={}
+        for row in rows:
+            bySymbol.setdefault(row["symbol"].upper(),[]).append((toEpoch(row["captured_at"]),float(row["price"])))
+        added=0
+        for symbol,points in bySymbol.items():
+            points.sort()
+            last=self.lastTimestamp(symbol)
+            timestamps=array("q")
+            prices=array("d")
+            for ts,price in points:
+                if last is not None and ts<=last:
+                    continue
+                timestamps.append(ts)
+                prices.append(price)
+                last=ts
+            if not timestamps:
+                continue
+            tsPath,pxPath=self._paths(symbol)
+            # Price column first: a crash between the writes leaves an orphan price, never a
+            # timestamp without one, and trimming the price column to the timestamp count repairs it
+            tsBytes=os.path.getsize(tsPath) if os.path.exists(tsPath) else 0
+            with open(pxPath,"ab") as f:
+                f.truncate(tsBytes)
+                prices.tofile(f)
+            with open(tsPath,"ab") as f:
+                timestamps.tofile(f)
+            added+=len(timestamps)
+        return added
+
+    def range(self,symbol,start,end):
+        """[(datetime, price)] for `symbol` with start <= captured_at < end."""
+        tsPath,pxPath=self._paths(symbol)
+        ts=_Column(tsPath,"q")
+        px=_Column(pxPath,"d")
+        try:
+            lo=bisect.bisect_left(ts,toEpoch(start))
+            hi=bisect.bisect_left(ts,toEpoch(end))
+            return [(datetime.fromtimestamp(ts[i],timezone.utc),px[i]) for i in range(lo,hi)]
+        finally:
+            ts.close()
+            px.close()
+
+    def priceAt(self,symbol,moment):
+        """The last snapshot at or before `moment`, or None."""
+        tsPath,pxPath=self._paths(symbol)
+        ts=_Column(tsPath,"q")
+        px=_Column(pxPath,"d")
+        try:
+            index=bisect.bisect_right(ts,toEpoch(moment))-1
+            return px[index] if index>=0 else None
+        finally:
+            ts.close()
+            px.close()
+
+    def closesOn(self,day,symbols=None):
+        """{symbol: last price captured on or before `day` (PKT)}."""
+        endOfDay=pkTz().localize(datetime.combine(day+timedelta(days=1),datetime.min.time()))-timedelta(seconds=1)
+        closes={}
+        for symbol in symbols or self.symbols():
+            price=self.priceAt(symbol,endOfDay)
+            if price is not None:
+                closes[symbol]=price
+        return closes
+
+    def dailyCloses(self,symbol,start,end):
+        """{date: last price captured that PKT day} for days from `start` to `end` inclusive."""
+        since=pkTz().localize(datetime.combine(start,datetime.min.time()))
+        until=pkTz().localize(datetime.combine(end+timedelta(days=1),datetime.min.time()))
+        closes={}
+        for capturedAt,price in self.range(symbol,since,until):
+            closes[capturedAt.astimezone(pkTz()).date()]=price
+        return closes
+
+    def dayOverDay(self,day,symbols=None):
+        """{symbol: (previous close, close on `day`)} for symbols priced on both days."""
+        today=self.closesOn(day,symbols)
+        previous=self.closesOn(day-timedelta(days=1),list(today))
+        return {symbol:(previous[symbol],price) for symbol,price in today.items() if symbol in previous}
+
+    def sync(self,client,pageSize=1000,groupSize=200):
+        """Pull psx_price_history rows newer than each symbol's own newest cached snapshot.
+
+        Symbols are grouped by their last cached timestamp (a refresh writes
+        every symbol at once, so there are only a few groups) and each group is
+        fetched from its own bound. Listed symbols with no cache yet get their
+        whole history, so a lagging or new symbol never misses rows.
+        """
+        bounds={}
+        for symbol in self.symbols():
+            bounds.setdefault(self.lastTimestamp(symbol),[]).append(symbol)
+        listed=[row["symbol"].upper() for row in stream_rows(lambda:client.table("psx_stocks").select("id,symbol"))]
+        cached={symbol for group in bounds.values() for symbol in group}
+        bounds.setdefault(None,[]).extend(sorted(set(listed)-cached))
+        added=0
+        for latest,symbols in bounds.items():
+            for start in range(0,len(symbols),groupSize):
+                added+=self._syncGroup(client,symbols[start:start+groupSize],latest,pageSize)
+        return added
+
+    def _syncGroup(self,client,symbols,latest,pageSize):
+        added=0
+        offset=0
+        # Offset paging over a fixed lower bound: a whole refresh shares one captured_at,
+        # so keyset paging on the timestamp alone could stall inside a run
+        while True:
+            query=client.table("psx_price_history").select("symbol,price,captured_at").in_("symbol",symbols)
+            if latest is not None:
+                # The cache keeps whole seconds and runTimestamp has microseconds, so the newest
+                # cached snapshot sits inside second `latest`; start after it or it's re-read every sync
+                query=query.gte("captured_at",datetime.fromtimestamp(latest+1,timezone.utc).isoformat())
+            rows=query.order("captured_at").order("symbol").range(offset,offset+pageSize-1).execute().data
+            added+=self.append(rows)
+            offset+=len(rows)
+            if len(rows)<pageSize:
+                return added
+
+def main():
+    parser=argparse.ArgumentParser(description="Query the local PSX price history cache")
+    parser.add_argument("symbol",nargs="?")
+    parser.add_argument("--days",type=int,default=30)
+    parser.add_argument("--on",type=date.fromisoformat,help="every symbol's close on this date")
+    parser.add_argument("--sync",action="store_true",help="pull new snapshots from psx_price_history first")
+    parser.add_argument("--cache-dir",default=CACHE_DIR)
+    args=parser.parse_args()
+
+    cache=PriceHistoryCache(args.cache_dir)
+    if args.sync:
+        from update_tables import supabase
+        print(f"synced {cache.sync(supabase)} snapshots")
+    if args.on:
+        for symbol,price in sorted(cache.closesOn(args.on).items()):
+            print(f"{symbol:<10}{price:>12,.2f}")
+    elif args.symbol:
+        end=datetime.now(timezone.utc)
+        for capturedAt,price in cache.range(args.symbol,end-timedelta(days=args.days),end):
+            print(f"{capturedAt.astimezone(pkTz()):%Y-%m-%d %H:%M}  {price:,.2f}")
+    elif not args.sync:
+        parser.print_help()
+        return 1
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Opt-in timing instrumentation shared by the summary and price refresh scripts.
+
+`PROFILER` is disabled until a script's `--profile` flag enables it. Until
+then spans and wrappers are no-ops and the Supabase client is used unwrapped.
+Once enabled, it records:
+- every Supabase `execute()`, with table, operation, rows returned and
+  JSON-encoded payload size;
+- every HTTP fetch, with time and bytes read;
+- parse steps and the stage spans the scripts mark (load, aggregate, render,
+  deliver, ...).
+
+At exit it prints a breakdown table. It can also write the raw events as JSON
+lines and dump a cProfile of the main thread.
+"""
+
+import json
+import time
+import threading
+import cProfile
+import functools
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Builder methods that pick the operation a Supabase query performs
+OPERATIONS = ('select', 'insert', 'upsert', 'update', 'delete')
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._started = time.perf_counter()
+
+    def enable(self, cprofile: bool = False) -> None:
+        self.enabled = True
+        self._started = time.perf_counter()
+        if cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def record(self, kind: str, name: str, seconds: float, **fields: Any) -> None:
+        if not self.enabled:
+            return
+        event = {'kind': kind, 'name': name, 'ms': round(seconds * 1000, 3),
+                 'at': round(time.perf_counter() - self._started, 4), 'thread': threading.current_thread().name}
+        event.update((key, value) for key, value in fields.items() if value is not None)
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def timed(self, kind: str, name: str) -> Iterator[Dict[str, Any]]:
+        """Time a block; the yielded dict's entries (rows, bytes, ...) are stored with the event"""
+        fields: Dict[str, Any] = {}
+        if not self.enabled:
+            yield fields
+            return
+        started = time.perf_counter()
+        try:
+            yield fields
+        except Exception as e:
+            fields['error'] = type(e).__name__
+            raise
+        finally:
+            self.record(kind, name, time.perf_counter() - started, **fields)
+
+    def span(self, name: str):
+        """A stage span; spans may nest (e.g. aggregate inside load)"""
+        return self.timed('stage', name)
+
+    def traced(self, name: str) -> Callable:
+        """Decorator form of span"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def wrap_client(self, client: Any) -> Any:
+        """The client itself when disabled, otherwise a proxy that times every query's execute()"""
+        return _Instrumented(client, self, None, None) if self.enabled else client
+
+    def summary_rows(self) -> List[Dict[str, Any]]:
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        for event in self.events:
+            group = groups.setdefault((event['kind'], event['name']), {
+                'kind': event['kind'], 'name': event['name'], 'count': 0, 'ms': 0.0, 'max_ms': 0.0,
+                'rows': 0, 'bytes': 0, 'errors': 0,
+            })
+            group['count'] += 1
+            group['ms'] += event['ms']
+            group['max_ms'] = max(group['max_ms'], event['ms'])
+            group['rows'] += event.get('rows', 0)
+            group['bytes'] += event.get('bytes', 0)
+            group['errors'] += 1 if 'error' in event else 0
+        return sorted(groups.values(), key=lambda g: (g['kind'] != 'stage', -g['ms']))
+
+    def report(self) -> str:
+        wall = (time.perf_counter() - self._started) * 1000
+        lines = [f"{'kind':<7}{'name':<40}{'calls':>6}{'total ms':>11}{'mean ms':>10}{'max ms':>10}"
+                 f"{'% wall':>8}{'rows':>9}{'KiB':>9}{'err':>5}"]
+        for g in self.summary_rows():
+            lines.append(
+                f"{g['kind']:<7}{g['name'][:39]:<40}{g['count']:>6}{g['ms']:>11,.1f}{g['ms'] / g['count']:>10,.1f}"
+                f"{g['max_ms']:>10,.1f}{g['ms'] / wall * 100 if wall else 0:>7.1f}%{g['rows']:>9,}"
+                f"{g['bytes'] / 1024:>9,.1f}{g['errors'] or '':>5}"
+            )
+        lines.append(f"wall time {wall:,.1f} ms; calls on worker threads overlap, so totals can exceed it")
+        return "\n".join(lines)
+
+    def finish(self, jsonl_path: Optional[str] = None, cprofile_path: Optional[str] = None) -> None:
+        """Print the breakdown and write the optional outputs"""
+        if not self.enabled:
+            return
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            if cprofile_path:
+                self._cprofile.dump_stats(cprofile_path)
+        print("\n⏱️  Profile")
+        print(self.report())
+        if jsonl_path:
+            with open(jsonl_path, 'w', encoding='utf-8') as f:
+                for event in self.events:
+                    f.write(json.dumps(event) + "\n")
+            print(f"⏱️  {len(self.events)} events written to {jsonl_path}")
+        if cprofile_path and self._cprofile is not None:
+            print(f"⏱️  cProfile stats written to {cprofile_path}")
+
+
+class _Instrumented:
+    """Proxy over a Supabase client or query builder; times the final execute()"""
+
+    def __init__(self, target: Any, profiler: Profiler, table: Optional[str], operation: Optional[str]):
+        self._target = target
+        self._profiler = profiler
+        self._table = table
+        self._operation = operation
+
+    def table(self, name: str) -> '_Instrumented':
+        return _Instrumented(self._target.table(name), self._profiler, name, None)
+
+    def from_(self, name: str) -> '_Instrumented':
+        return self.table(name)
+
+    def execute(self) -> Any:
+        name = f"{self._table}.{self._operation or 'select'}"
+        with self._profiler.timed('db', name) as fields:
+            response = self._target.execute()
+            data = getattr(response, 'data', None)
+            if isinstance(data, list):
+                fields['rows'] = len(data)
+                fields['bytes'] = len(json.dumps(data, default=str))
+            return response
+
+    def __getattr__(self, attr: str) -> Any:
+        value = getattr(self._target, attr)
+        if not callable(value):
+            return value
+        operation = attr if attr in OPERATIONS and self._operation is None else self._operation
+
+        def call(*args, **kwargs):
+            result = value(*args, **kwargs)
+            # Builder methods return the next builder; wrap it so execute() stays timed
+            if hasattr(result, 'execute') or attr in OPERATIONS:
+                return _Instrumented(result, self._profiler, self._table, operation)
+            return result
+        return call
+
+
+PROFILER = Profiler()
+
+
+def add_profile_arguments(parser: Any) -> None:
+    parser.add_argument("--profile", action="store_true", help="time every query, fetch and stage and print a breakdown")
+    parser.add_argument("--profile-jsonl", help="also write each profiled event as a JSON line to this file")
+    parser.add_argument("--profile-cprofile", help="also dump a cProfile of the main thread to this file")
+
+
+def start_from_args(args: Any) -> bool:
+    """Enable PROFILER if any profiling flag was given; returns whether it is on"""
+    if args.profile or args.profile_jsonl or args.profile_cprofile:
+        PROFILER.enable(cprofile=bool(args.profile_cprofile))
+    return PROFILER.enabled
+
+
+def finish_from_args(args: Any) -> None:
+    PROFILER.finish(args.profile_jsonl, args.profile_cprofile)
@@ -0,0 +1,70 @@
+"""PSX trading hours and holidays, evaluated in Pakistan time."""
+
+import os
+from datetime import datetime, date, time, timedelta
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def pkTz():
+    """Asia/Karachi; pytz is imported on first use so importing the calendar stays cheap."""
+    import pytz
+    return pytz.timezone("Asia/Karachi")
+
+# Regular market sessions per weekday (Mon=0); Friday breaks for Jumu'ah
+TRADING_SESSIONS={
+    0:[(time(9,30),time(15,30))],
+    1:[(time(9,30),time(15,30))],
+    2:[(time(9,30),time(15,30))],
+    3:[(time(9,30),time(15,30))],
+    4:[(time(9,15),time(12,0)),(time(14,30),time(16,30))],
+}
+
+# Gazetted holidays that fall on the same date every year (month, day)
+FIXED_HOLIDAYS={(2,5),(3,23),(5,1),(5,28),(8,14),(11,9),(12,25)}
+
+def loadHolidays(path=None):
+    """Extra closures (Eid, Ashura, ad-hoc) as ISO dates from PSX_HOLIDAYS and/or a file, one per line."""
+    holidays=set()
+    raw=os.environ.get("PSX_HOLIDAYS","")
+    entries=[d for d in raw.split(",") if d.strip()]
+    if path and os.path.exists(path):
+        with open(path,encoding="utf-8") as f:
+            entries+=[line.split("#")[0] for line in f if line.split("#")[0].strip()]
+    for entry in entries:
+        holidays.add(date.fromisoformat(entry.strip()))
+    return holidays
+
+def isTradingDay(day,holidays=frozenset()):
+    return day.weekday() in TRADING_SESSIONS and (day.month,day.day) not in FIXED_HOLIDAYS and day not in holidays
+
+def sessionsOn(day,holidays=frozenset()):
+    """(open, close) datetimes in PKT for every session on `day`; empty on closed days."""
+    if not isTradingDay(day,holidays):
+        return []
+    return [(pkTz().localize(datetime.combine(day,start)),pkTz().localize(datetime.combine(day,end)))
+            for start,end in TRADING_SESSIONS[day.weekday()]]
+
+def nowPk():
+    return datetime.now(pkTz())
+
+def isMarketOpen(now=None,holidays=frozenset()):
+    now=(now or nowPk()).astimezone(pkTz())
+    return any(start<=now<end for start,end in sessionsOn(now.date(),holidays))
+
+def lastClose(now=None,holidays=frozenset()):
+    """The most recent session close at or before `now`, looking back up to two weeks."""
+    now=(now or nowPk()).astimezone(pkTz())
+    for back in range(15):
+        for _,end in reversed(sessionsOn(now.date()-timedelta(days=back),holidays)):
+            if end<=now:
+                return end
+    return None
+
+def nextOpen(now=None,holidays=frozenset()):
+    """The next session open strictly after `now`, looking ahead up to two weeks."""
+    now=(now or nowPk()).astimezone(pkTz())
+    for ahead in range(15):
+        for start,_ in sessionsOn(now.date()+timedelta(days=ahead),holidays):
+            if start>now:
+                return start
+    return None
@@ -0,0 +1,61 @@
+"""Parsers for PSX data portal pages (company quote pages and market watch)."""
+
+import re
+
+# The close div may wrap its text in inline markup (e.g. <span class="currency">Rs.</span>145.30)
+QUOTE_CLOSE_RE=re.compile(rb'<div[^>]*\bclass="[^"]*\bquote__close\b[^"]*"[^>]*>((?:[^<]|<(?!/div\b)[^>]*>)*)</div')
+TAG_RE=re.compile(rb'<[^>]*>')
+# A page without this anywhere has no close price for BeautifulSoup to find either
+QUOTE_CLOSE_MARKER=b"quote__close"
+# Bytes kept from the previous chunk so a tag split across chunk boundaries still matches
+SCAN_OVERLAP=512
+
+def extractPriceFast(body,scanFrom=0):
+    """Pull the close price straight out of the raw bytes, or None if the tag isn't there."""
+    match=QUOTE_CLOSE_RE.search(body,scanFrom)
+    if not match:
+        return None
+    try:
+        return parsePrice(TAG_RE.sub(b"",match.group(1)).decode("utf-8","replace"))
+    except ValueError:
+        return None
+
+def extractPriceSoup(html):
+    from bs4 import BeautifulSoup
+    soup=BeautifulSoup(html,"html.parser")
+    priceTag=soup.select_one("div.quote__close")
+    if not priceTag:
+        return None
+    try:
+        return parsePrice(priceTag.text)
+    except ValueError:
+        return None
+
+def parsePrice(text):
+    return float(text.replace(",","").replace("Rs.","").strip())
+
+def parseMarketWatch(html):
+    """Map every symbol on a PSX market-watch page to its current price.
+
+    Column positions come from the table header so a reordered layout still
+    parses; rows whose price cell isn't numeric are left out.
+    """
+    from bs4 import BeautifulSoup
+    soup=BeautifulSoup(html,"html.parser")
+    table=soup.find("table")
+    if table is None:
+        return {}
+    headers=[th.get_text(strip=True).upper() for th in table.find_all("th")]
+    symbolCol=headers.index("SYMBOL") if "SYMBOL" in headers else 0
+    priceCol=headers.index("CURRENT") if "CURRENT" in headers else 7
+    prices={}
+    for row in table.find_all("tr"):
+        cells=row.find_all("td")
+        if len(cells)<=max(symbolCol,priceCol):
+            continue
+        symbol=cells[symbolCol].get_text(strip=True).upper()
+        try:
+            prices[symbol]=parsePrice(cells[priceCol].get_text())
+        except ValueError:
+            continue
+    return prices
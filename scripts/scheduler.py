@@ -0,0 +1,430 @@
+"""
+Resident scheduler for the price refresh and the daily summaries.
+
+Under cron every job is a fresh Python process. Each one pays again for
+imports, building the Supabase client, TLS handshakes to PSX, Supabase and
+Discord, and loading data. This daemon runs both jobs from one long-lived
+process instead:
+- prices are refreshed every --refresh-minutes while PSX is open (per
+  psx_calendar), plus one closing snapshot after each session ends;
+- summaries go out at each user's `users.summary_time` (Asia/Karachi). Users
+  passed with --emails get --summary-time unless they set their own. Users
+  due at the same time are batched into one run_batch call;
+- budget and payment alerts are checked every --alert-minutes. The
+  evaluator's counters stay in memory between checks.
+
+One Supabase client, one keep-alive PSX session and one Discord sender are
+shared by every run, and imported modules stay loaded between runs.
+
+Each run starts up to --jitter seconds after its slot, so restarts and
+neighbouring jobs don't hit PSX and Supabase in lockstep. A job is never
+stacked on itself: if a run is still going when the next one falls due, the
+two collapse into one run after it finishes. A lock file keeps a second
+daemon from starting on the same machine. SIGTERM/SIGINT stop scheduling, let
+running jobs finish (up to --shutdown-timeout) and close the sessions; a
+second signal exits at once.
+
+Usage:
+    python scheduler.py                                        # run until stopped
+    python scheduler.py --emails me@example.com --summary-time 23:30
+    python scheduler.py --refresh-args "--source market-watch" --refresh-minutes 10
+    python scheduler.py --once                                 # run whatever is due now, then exit
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shlex
+import signal
+import argparse
+import threading
+import traceback
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, time as dtime
+from typing import Any, Dict, List, Optional, Set
+
+import update_tables
+import daily_financial_summary as summary_module
+from budget_alerts import AlertEvaluator, alerts_webhook_url, deliver_alerts
+from discord_delivery import DiscordDelivery
+from psx_calendar import pkTz, isMarketOpen, lastClose, nextOpen, loadHolidays, nowPk
+from supabase_client import load_env
+from supabase_stream import stream_rows
+from sync_state import write_json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.getenv("SCHEDULER_STATE_PATH", os.path.join(HERE, ".scheduler_state.json"))
+LOCK_PATH = os.getenv("SCHEDULER_LOCK_PATH", os.path.join(HERE, ".scheduler.lock"))
+
+# The old GitHub Actions cron ran the summary at 18:30 UTC
+DEFAULT_SUMMARY_TIME = "23:30"
+
+
+def log(message: str) -> None:
+    print(f"[{nowPk():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+
+def parse_time(value: str) -> dtime:
+    """'HH:MM' or Postgres TIME 'HH:MM:SS' -> time"""
+    parts = [int(part) for part in str(value).split(':')[:3]]
+    return dtime(*parts)
+
+
+def at(day: date, moment: dtime) -> datetime:
+    return pkTz().localize(datetime.combine(day, moment))
+
+
+class Job(ABC):
+    """Something the scheduler starts when it falls due; subclasses supply plan() and run()"""
+    name = 'job'
+
+    def __init__(self, jitter: float = 0.0):
+        self.jitter = jitter
+        self.last_started: Optional[datetime] = None
+        self.runs = 0
+        self.failures = 0
+        # The slot the job is waiting for; run() is passed the slot, not the jittered start
+        self.slot: Optional[datetime] = None
+        self._due: Optional[datetime] = None
+
+    @abstractmethod
+    def plan(self, now: datetime) -> Optional[datetime]:
+        """The next slot this job should run in (may be `now`); None for never"""
+
+    @abstractmethod
+    def run(self, planned: datetime) -> None:
+        """Do the work for slot `planned`"""
+
+    def due_at(self, now: datetime) -> Optional[datetime]:
+        """The slot plus jitter; kept until the job runs so polling doesn't re-roll the jitter"""
+        if self._due is None:
+            self.slot = self.plan(now)
+            if self.slot is None:
+                return None
+            self._due = self.slot + timedelta(seconds=random.uniform(0, self.jitter))
+        return self._due
+
+    def replan(self) -> None:
+        self.slot = self._due = None
+
+
+class PriceRefreshJob(Job):
+    name = 'refresh'
+
+    def __init__(self, args: argparse.Namespace, interval: timedelta, holidays: Set[date], jitter: float = 0.0):
+        super().__init__(jitter)
+        self.args = args
+        self.interval = interval
+        self.holidays = holidays
+        self.session = None
+
+    def plan(self, now: datetime) -> Optional[datetime]:
+        if isMarketOpen(now, self.holidays):
+            if self.last_started is None:
+                return now
+            return max(now, self.last_started + self.interval)
+        # One more run once a session closes picks up the closing prices
+        close = lastClose(now, self.holidays)
+        if close is not None and (self.last_started is None or self.last_started < close):
+            return now
+        return nextOpen(now, self.holidays)
+
+    def run(self, planned: datetime) -> None:
+        if self.session is None:
+            self.session = update_tables.makeSession(self.args.concurrency)
+        update_tables.run(self.args, self.session)
+
+    def close(self) -> None:
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+
+class SentLog:
+    """Who has had today's summary; kept on disk so a restart doesn't send it twice"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.day: Optional[str] = None
+        self.sent: Set[str] = set()
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            self.day, self.sent = state['date'], set(state['sent'])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def sent_on(self, day: date) -> Set[str]:
+        return self.sent if self.day == day.isoformat() else set()
+
+    def mark(self, day: date, emails: List[str]) -> None:
+        if self.day != day.isoformat():
+            self.day, self.sent = day.isoformat(), set()
+        self.sent.update(emails)
+        write_json(self.path, {'date': self.day, 'sent': sorted(self.sent)})
+
+
+class SummaryJob(Job):
+    name = 'summary'
+
+    def __init__(self, emails: List[str], default_time: dtime, sent: SentLog, output_dir: str, workers: int,
+                 use_rollups: bool, delivery: DiscordDelivery, reload_every: timedelta, jitter: float = 0.0):
+        super().__init__(jitter)
+        self.emails = emails
+        self.default_time = default_time
+        self.sent = sent
+        self.output_dir = output_dir
+        self.workers = workers
+        self.use_rollups = use_rollups
+        self.delivery = delivery
+        self.reload_every = reload_every
+        self.schedule: Dict[str, dtime] = {}
+        self._loaded_at: Optional[datetime] = None
+        self._column_missing = False
+
+    def load_schedule(self) -> Dict[str, dtime]:
+        """email -> delivery time: users with a summary_time, plus --emails at the default time"""
+        schedule = {email: self.default_time for email in self.emails}
+        if self._column_missing:
+            return schedule
+        try:
+            rows = stream_rows(lambda: summary_module.supabase.table('users').select('id,email,summary_time'))
+            schedule.update((row['email'], parse_time(row['summary_time'])) for row in rows if row.get('summary_time'))
+        except Exception as e:
+            # Before the summary-schedule migration there is no column to read; only --emails are scheduled
+            self._column_missing = 'summary_time' in str(e)
+            log(f"summary: could not read users.summary_time ({e}); scheduling --emails only")
+        return schedule
+
+    def due_at(self, now: datetime) -> Optional[datetime]:
+        if self._loaded_at is None or now - self._loaded_at >= self.reload_every:
+            self.schedule = self.load_schedule()
+            self._loaded_at = now
+            self.replan()
+        return super().due_at(now)
+
+    def plan(self, now: datetime) -> Optional[datetime]:
+        today = now.date()
+        sent = self.sent.sent_on(today)
+        pending = [moment for email, moment in self.schedule.items() if email not in sent]
+        if pending:
+            return max(now, at(today, min(pending)))
+        if self.schedule:
+            return at(today + timedelta(days=1), min(self.schedule.values()))
+        return None
+
+    def run(self, planned: datetime) -> None:
+        # The slot's date, not the clock's: jitter can push a 23:59 slot past midnight
+        day = planned.date()
+        sent = self.sent.sent_on(day)
+        due = sorted(email for email, moment in self.schedule.items()
+                     if email not in sent and at(day, moment) <= planned)
+        if not due:
+            return
+        use_rollups = self.use_rollups and summary_module.refresh_rollups()
+        manifest = os.path.join(self.output_dir, f"summary_manifest_{day.isoformat()}_{planned:%H%M}.json")
+        os.makedirs(self.output_dir, exist_ok=True)
+        try:
+            summary_module.run_batch(due, self.workers, manifest, self.output_dir, use_rollups,
+                                     os.getenv("DISCORD_WEBHOOK_URL"), self.delivery)
+        finally:
+            # One attempt per user per day, as under cron; failures are in the manifest
+            self.sent.mark(day, due)
+
+
+class AlertJob(Job):
+    name = 'alerts'
+
+    def __init__(self, evaluator: AlertEvaluator, interval: timedelta, delivery: DiscordDelivery, jitter: float = 0.0):
+        super().__init__(jitter)
+        self.evaluator = evaluator
+        self.interval = interval
+        self.delivery = delivery
+
+    def plan(self, now: datetime) -> Optional[datetime]:
+        return now if self.last_started is None else max(now, self.last_started + self.interval)
+
+    def run(self, planned: datetime) -> None:
+        alerts = self.evaluator.check()
+        sent = deliver_alerts(summary_module.supabase, alerts, alerts_webhook_url(), self.delivery)
+        if alerts:
+            log(f"alerts: {len(alerts)} raised, {sent} messages sent")
+
+
+class Scheduler:
+    def __init__(self, jobs: List[Job], poll: float = 60.0):
+        self.jobs = jobs
+        # Re-check at least this often so a suspended machine or clock change is noticed
+        self.poll = poll
+        self.stopping = threading.Event()
+        self._wake = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max(len(jobs), 1), thread_name_prefix='job')
+        self._running: Dict[str, Future] = {}
+
+    def stop(self) -> None:
+        self.stopping.set()
+        self._wake.set()
+
+    def _execute(self, job: Job, planned: datetime) -> None:
+        started = time.perf_counter()
+        log(f"{job.name}: starting (slot {planned:%H:%M:%S})")
+        try:
+            job.run(planned)
+            job.runs += 1
+            log(f"{job.name}: finished in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            job.failures += 1
+            log(f"{job.name}: failed after {time.perf_counter() - started:.1f}s: {e}")
+            traceback.print_exc()
+        finally:
+            job.replan()
+            self._wake.set()
+
+    def tick(self, now: datetime) -> Optional[datetime]:
+        """Start every idle job that is due; returns the earliest upcoming start"""
+        upcoming = []
+        for job in self.jobs:
+            running = self._running.get(job.name)
+            if running is not None and not running.done():
+                # Not stacked: it is replanned, and runs again if still due, once this run ends
+                continue
+            due = job.due_at(now)
+            if due is None:
+                continue
+            if due <= now:
+                # The slot, not the jittered start, so refresh intervals don't drift by the jitter
+                job.last_started = job.slot
+                self._running[job.name] = self._pool.submit(self._execute, job, job.slot)
+            else:
+                upcoming.append(due)
+        return min(upcoming, default=None)
+
+    def run_forever(self) -> None:
+        while not self.stopping.is_set():
+            now = nowPk()
+            upcoming = self.tick(now)
+            timeout = self.poll if upcoming is None else min(self.poll, max((upcoming - now).total_seconds(), 0.0))
+            if upcoming is not None and timeout >= 1:
+                log(f"next run at {min(upcoming, now + timedelta(seconds=timeout)):%H:%M:%S}")
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def drain(self, timeout: Optional[float]) -> bool:
+        """Wait for running jobs; False if some were still going after `timeout` seconds"""
+        running = [future for future in self._running.values() if not future.done()]
+        if running:
+            names = ', '.join(name for name, future in self._running.items() if not future.done())
+            log(f"waiting {'' if timeout is None else f'up to {timeout:.0f}s '}for: {names}")
+        _, pending = wait(running, timeout)
+        self._pool.shutdown(wait=not pending)
+        return not pending
+
+
+def acquire_lock(path: str) -> Optional[Any]:
+    """An exclusive lock on `path` held for the life of the process; None if another daemon holds it"""
+    handle = open(path, 'a+')
+    try:
+        import fcntl
+    except ImportError:
+        # No flock on Windows; keeping a single daemon is then up to whoever starts it
+        return handle
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run price refreshes and daily summaries from one resident process")
+    parser.add_argument("--emails", nargs="*", default=[], help="users to summarize at --summary-time (besides users.summary_time)")
+    parser.add_argument("--summary-time", type=parse_time, default=parse_time(os.getenv("SUMMARY_TIME", DEFAULT_SUMMARY_TIME)),
+                        help="Asia/Karachi time (HH:MM) for --emails users without their own summary_time")
+    parser.add_argument("--refresh-minutes", type=float, default=15.0, help="minutes between refreshes while PSX is open")
+    parser.add_argument("--refresh-args", default="", help="extra update_tables.py flags, e.g. \"--source market-watch\"")
+    parser.add_argument("--no-refresh", action="store_true", help="don't schedule price refreshes")
+    parser.add_argument("--no-summaries", action="store_true", help="don't schedule summaries")
+    parser.add_argument("--alert-minutes", type=float, default=5.0, help="minutes between budget/payment alert checks")
+    parser.add_argument("--no-alerts", action="store_true", help="don't check for budget and payment alerts")
+    parser.add_argument("--workers", type=int, default=4, help="reports rendered and delivered at once")
+    parser.add_argument("--output-dir", default=".", help="directory for report files and manifests")
+    parser.add_argument("--use-rollups", action="store_true", default=summary_module.env_flag("SUMMARY_USE_ROLLUPS"),
+                        help="refresh and read the daily transaction rollups")
+    parser.add_argument("--holidays-file", help="extra PSX closure dates (YYYY-MM-DD, one per line)")
+    parser.add_argument("--jitter", type=float, default=60.0, help="start each run up to this many seconds after its slot")
+    parser.add_argument("--poll", type=float, default=60.0, help="longest sleep between schedule checks, in seconds")
+    parser.add_argument("--user-reload-minutes", type=float, default=15.0, help="how often to re-read users' summary times")
+    parser.add_argument("--shutdown-timeout", type=float, default=300.0, help="seconds to let running jobs finish on shutdown")
+    parser.add_argument("--state", default=STATE_PATH, help="where to record who has had today's summary")
+    parser.add_argument("--lock", default=LOCK_PATH, help="lock file that keeps a second daemon from starting")
+    parser.add_argument("--once", action="store_true", help="run every job that is due now (no jitter), wait for them and exit")
+    return parser.parse_args()
+
+
+def main():
+    load_env()
+    args = parse_args()
+    lock = acquire_lock(args.lock)
+    if lock is None:
+        print(f"❌ Another scheduler holds {args.lock}; exiting")
+        sys.exit(1)
+
+    update_tables.PSX_BASE_URL = os.environ.get("PSX_BASE_URL", update_tables.PSX_BASE_URL)
+    # Both jobs talk to Supabase through the summary's client
+    update_tables.supabase = summary_module.supabase
+    jitter = 0.0 if args.once else args.jitter
+    holidays = loadHolidays(args.holidays_file)
+    delivery = DiscordDelivery(workers=args.workers)
+
+    jobs: List[Job] = []
+    refresh: Optional[PriceRefreshJob] = None
+    if not args.no_refresh:
+        refresh_args = update_tables.parseArgs(shlex.split(args.refresh_args))
+        if args.holidays_file and not refresh_args.holidays_file:
+            refresh_args.holidays_file = args.holidays_file
+        refresh = PriceRefreshJob(refresh_args, timedelta(minutes=args.refresh_minutes), holidays, jitter)
+        jobs.append(refresh)
+    if not args.no_summaries:
+        jobs.append(SummaryJob(args.emails, args.summary_time, SentLog(args.state), args.output_dir, args.workers,
+                               args.use_rollups, delivery, timedelta(minutes=args.user_reload_minutes), jitter))
+    if not args.no_alerts:
+        jobs.append(AlertJob(AlertEvaluator(summary_module.supabase), timedelta(minutes=args.alert_minutes), delivery, jitter))
+    scheduler = Scheduler(jobs, args.poll)
+
+    def handle_signal(signum, frame):
+        if scheduler.stopping.is_set():
+            log("second signal: exiting without waiting")
+            os._exit(1)
+        log(f"{signal.Signals(signum).name}: shutting down after running jobs finish")
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    log(f"scheduler started: {', '.join(job.name for job in jobs) or 'no jobs'}")
+    if args.once:
+        scheduler.tick(nowPk())
+    else:
+        scheduler.run_forever()
+    clean = scheduler.drain(None if args.once else args.shutdown_timeout)
+    delivery.close()
+    if refresh is not None:
+        refresh.close()
+    log("scheduler stopped" if clean else "scheduler stopped with jobs still running")
+    lock.close()
+    if not clean:
+        # The worker threads would otherwise hold the interpreter open; checkpoints let the refresh resume
+        os._exit(1)
+    sys.exit(1 if any(job.failures for job in jobs) else 0)
+
+
+if __name__ == "__main__":
+    main()
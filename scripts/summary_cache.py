@@ -0,0 +1,235 @@
+"""
+On-disk SQLite cache of summary rows, kept between runs.
+
+Most of what the summary downloads never changes once written: earlier days'
+transactions, settled invoices. Those are the two tables cached here. Mutual
+fund value history is append-only too, but the report never reads it; only
+the daily value series does, and portfolio_series.py extends that from its
+own per-user checkpoint. The cache stores rows per partition
+(table, user, scope) together with a watermark on the table's change column
+(`created_at` / `updated_at`). A run then pulls only rows changed since the
+watermark and merges them locally. Deletes and late-committing rows don't
+move the watermark, so a row-count probe compares the partition with the
+server and reconciles ids when the two disagree.
+
+The file is bounded: once it outgrows `max_bytes`, the least recently used
+partitions are evicted.
+
+Usage:
+    python summary_cache.py stats
+    python summary_cache.py invalidate [--user-id UUID] [--table NAME]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from supabase_stream import stream_rows
+from sync_state import WATERMARK_OVERLAP
+
+CACHE_PATH = os.getenv(
+    "SUMMARY_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".summary_cache.sqlite"),
+)
+MAX_BYTES = int(float(os.getenv("SUMMARY_CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+# Ids per `in_` lookup when fetching rows the delta missed
+ID_CHUNK = 200
+
+Partition = Tuple[str, str, str]
+SelectFn = Callable[..., Any]
+
+
+class SummaryCache:
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS partitions (
+                tbl TEXT NOT NULL, user_id TEXT NOT NULL, scope TEXT NOT NULL,
+                watermark TEXT, last_used REAL NOT NULL,
+                PRIMARY KEY (tbl, user_id, scope)
+            );
+            CREATE TABLE IF NOT EXISTS cached_rows (
+                tbl TEXT NOT NULL, user_id TEXT NOT NULL, scope TEXT NOT NULL,
+                id TEXT NOT NULL, payload TEXT NOT NULL,
+                PRIMARY KEY (tbl, user_id, scope, id)
+            );
+        """)
+        self._db.commit()
+        # Per-process traffic counters, for reporting how much the cache saved
+        self.stats = {'rows_fetched': 0, 'bytes_fetched': 0, 'rows_reused': 0, 'reconciled': 0, 'evicted': 0}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _count_fetched(self, rows: List[Dict[str, Any]]) -> None:
+        self.stats['rows_fetched'] += len(rows)
+        self.stats['bytes_fetched'] += sum(len(json.dumps(row, default=str)) for row in rows)
+
+    def _store(self, partition: Partition, rows: List[Dict[str, Any]]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO cached_rows (tbl, user_id, scope, id, payload) VALUES (?, ?, ?, ?, ?)",
+            [(*partition, str(row['id']), json.dumps(row, default=str)) for row in rows],
+        )
+
+    def _local_ids(self, partition: Partition) -> List[str]:
+        return [row[0] for row in self._db.execute(
+            "SELECT id FROM cached_rows WHERE tbl = ? AND user_id = ? AND scope = ?", partition
+        )]
+
+    def _watermark(self, partition: Partition) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT watermark FROM partitions WHERE tbl = ? AND user_id = ? AND scope = ?", partition
+        ).fetchone()
+        return row[0] if row else None
+
+    def sync(self, table: str, user_id: str, scope: str, select: SelectFn, columns: str,
+             changed_column: str) -> List[Dict[str, Any]]:
+        """Every row of one partition, fetching only what changed since the last sync.
+
+        `select(columns, **kwargs)` must return `supabase.table(table).select(columns, **kwargs)`
+        with the partition's filters applied; `columns` must include `id` and
+        `changed_column`.
+        """
+        partition = (table, user_id, scope)
+        with self._lock:
+            watermark = self._watermark(partition)
+
+        if watermark is None:
+            fresh = list(stream_rows(lambda: select(columns)))
+        else:
+            since = (datetime.fromisoformat(watermark) - WATERMARK_OVERLAP).isoformat()
+            fresh = list(stream_rows(lambda: select(columns).gte(changed_column, since), keys=(changed_column, 'id')))
+        self._count_fetched(fresh)
+
+        with self._lock:
+            self._store(partition, fresh)
+            if watermark is not None:
+                remote_count = select('id', count='exact').limit(1).execute().count
+                if remote_count is not None and remote_count != len(self._local_ids(partition)):
+                    self._reconcile(partition, select, columns)
+            stamps = [row[changed_column] for row in fresh if row.get(changed_column)]
+            if watermark:
+                stamps.append(watermark)
+            newest = max(stamps, key=datetime.fromisoformat) if stamps else None
+            self._db.execute(
+                "INSERT OR REPLACE INTO partitions (tbl, user_id, scope, watermark, last_used) VALUES (?, ?, ?, ?, ?)",
+                (*partition, newest, time.time()),
+            )
+            rows = [json.loads(payload) for (payload,) in self._db.execute(
+                "SELECT payload FROM cached_rows WHERE tbl = ? AND user_id = ? AND scope = ?", partition
+            )]
+            self._db.commit()
+            self.stats['rows_reused'] += len(rows) - len(fresh)
+            self._evict(keep=partition)
+        return rows
+
+    def _reconcile(self, partition: Partition, select: SelectFn, columns: str) -> None:
+        """Drop locally cached rows the server no longer has and fetch ones the delta missed"""
+        self.stats['reconciled'] += 1
+        remote = {str(row['id']) for row in stream_rows(lambda: select('id'))}
+        local = set(self._local_ids(partition))
+        gone = local - remote
+        self._db.executemany(
+            "DELETE FROM cached_rows WHERE tbl = ? AND user_id = ? AND scope = ? AND id = ?",
+            [(*partition, row_id) for row_id in gone],
+        )
+        missing = sorted(remote - local)
+        for start in range(0, len(missing), ID_CHUNK):
+            chunk = missing[start:start + ID_CHUNK]
+            rows = list(stream_rows(lambda: select(columns).in_('id', chunk)))
+            self._count_fetched(rows)
+            self._store(partition, rows)
+
+    def size(self) -> int:
+        page_size, = self._db.execute("PRAGMA page_size").fetchone()
+        pages, = self._db.execute("PRAGMA page_count").fetchone()
+        free, = self._db.execute("PRAGMA freelist_count").fetchone()
+        return (pages - free) * page_size
+
+    def _evict(self, keep: Optional[Partition] = None) -> None:
+        """Drop least recently used partitions until the file fits in max_bytes"""
+        evicted = False
+        while self.size() > self.max_bytes:
+            victim = self._db.execute(
+                "SELECT tbl, user_id, scope FROM partitions WHERE NOT (tbl = ? AND user_id = ? AND scope = ?) "
+                "ORDER BY last_used LIMIT 1", keep or ('', '', '')
+            ).fetchone()
+            if victim is None:
+                break
+            self._drop(victim)
+            self.stats['evicted'] += 1
+            evicted = True
+        if evicted:
+            self._db.execute("PRAGMA incremental_vacuum")
+
+    def _drop(self, partition: Partition) -> None:
+        self._db.execute("DELETE FROM cached_rows WHERE tbl = ? AND user_id = ? AND scope = ?", partition)
+        self._db.execute("DELETE FROM partitions WHERE tbl = ? AND user_id = ? AND scope = ?", partition)
+        self._db.commit()
+
+    def invalidate(self, user_id: Optional[str] = None, table: Optional[str] = None) -> int:
+        """Forget cached partitions (all, or those matching user/table); returns how many were dropped"""
+        with self._lock:
+            clauses, params = [], []
+            if user_id:
+                clauses.append("user_id = ?")
+                params.append(user_id)
+            if table:
+                clauses.append("tbl = ?")
+                params.append(table)
+            where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+            partitions = self._db.execute("SELECT tbl, user_id, scope FROM partitions" + where, params).fetchall()
+            self._db.execute("DELETE FROM cached_rows" + where, params)
+            self._db.execute("DELETE FROM partitions" + where, params)
+            self._db.commit()
+            self._db.execute("PRAGMA incremental_vacuum")
+            return len(partitions)
+
+    def describe(self) -> List[Tuple[str, str, str, int, Optional[str]]]:
+        """(table, user_id, scope, rows, watermark) for every cached partition"""
+        with self._lock:
+            return self._db.execute("""
+                SELECT p.tbl, p.user_id, p.scope, COUNT(r.id), p.watermark
+                FROM partitions p LEFT JOIN cached_rows r
+                  ON r.tbl = p.tbl AND r.user_id = p.user_id AND r.scope = p.scope
+                GROUP BY p.tbl, p.user_id, p.scope ORDER BY p.last_used DESC
+            """).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the summary's local row cache")
+    parser.add_argument("command", choices=("stats", "invalidate"))
+    parser.add_argument("--user-id", help="only this user's partitions")
+    parser.add_argument("--table", help="only this table's partitions")
+    parser.add_argument("--path", default=CACHE_PATH)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"No cache at {args.path}")
+        return 0
+    cache = SummaryCache(args.path)
+    if args.command == "invalidate":
+        print(f"🗑️  Dropped {cache.invalidate(args.user_id, args.table)} cached partitions")
+    else:
+        for table, user_id, scope, rows, watermark in cache.describe():
+            print(f"{table:<14}{user_id:<38}{scope:<10}{rows:>8} rows  since {watermark}")
+        print(f"💾 {cache.size() / 1024:,.1f} KiB used of {cache.max_bytes / 1024 / 1024:g} MiB")
+    cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
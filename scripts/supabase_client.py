@@ -0,0 +1,67 @@
+"""
+Lazily constructed Supabase client shared by the scripts.
+
+Importing `supabase` costs a few hundred milliseconds, and building a client
+requires credentials. Neither should happen just because a module was
+imported (tests, `--help`, paths that never touch the database), so scripts
+hold a `LazyClient` instead. It reads `.env` and builds the real client the
+first time an attribute such as `.table` is used.
+
+`timeout` bounds each PostgREST request (seconds). Without it a hung query
+holds its thread for httpx's default of two minutes, which is longer than
+any caller waits for it.
+"""
+
+import os
+import threading
+from typing import Any, Optional
+
+_env_loaded = False
+
+
+def load_env() -> None:
+    """Load `.env` into os.environ once; values already set in the environment win"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+def create_supabase(url: Optional[str] = None, key: Optional[str] = None, timeout: Optional[float] = None) -> Any:
+    load_env()
+    from supabase import create_client, ClientOptions
+    options = ClientOptions(postgrest_client_timeout=timeout) if timeout else None
+    return create_client(url or os.getenv("NEXT_PUBLIC_SUPABASE_URL"), key or os.getenv("SUPABASE_SERVICE_ROLE_KEY"),
+                         options=options)
+
+
+class LazyClient:
+    """Stands in for a Supabase client and builds it on first use"""
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, timeout: Optional[float] = None):
+        self._url = url
+        self._key = key
+        # Can still be changed (e.g. from a CLI flag) until the client is built
+        self.timeout = timeout
+        self._client: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._client is not None
+
+    def get(self) -> Any:
+        if self._client is None:
+            # Loader threads can hit the client at the same moment; build it only once
+            with self._lock:
+                if self._client is None:
+                    self._client = create_supabase(self._url, self._key, self.timeout)
+        return self._client
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.get(), attr)
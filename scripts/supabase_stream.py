@@ -0,0 +1,48 @@
+"""
+Keyset-paginated streaming over Supabase (PostgREST) queries.
+
+A plain `.execute().data` silently stops at the server's max-rows cap and
+materialises every row at once. `stream_rows` walks the result in pages
+ordered by the given key columns, resuming each page strictly after the last
+key seen, and yields rows one at a time so callers can aggregate in a single
+pass without holding the whole result.
+"""
+
+import os
+from typing import Any, Callable, Dict, Iterator, Sequence
+
+PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", "1000"))
+
+
+def _after(query: Any, keys: Sequence[str], last: Dict[str, Any]) -> Any:
+    """Restrict `query` to rows ordered strictly after `last` on (keys...)"""
+    if len(keys) == 1:
+        return query.gt(keys[0], last[keys[0]])
+    if len(keys) == 2:
+        first, second = keys
+        return query.or_(
+            f"{first}.gt.{last[first]},and({first}.eq.{last[first]},{second}.gt.{last[second]})"
+        )
+    raise ValueError("keyset pagination supports one or two key columns")
+
+
+def stream_rows(build_query: Callable[[], Any], keys: Sequence[str] = ('id',),
+                page_size: int = PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield every row of `build_query()` in `keys` order, one page at a time.
+
+    `build_query` must return a fresh filtered select (without order/limit)
+    whose column list includes every key column; the last key should be unique
+    (normally `id`) so pages never skip or repeat rows.
+    """
+    last = None
+    while True:
+        query = build_query()
+        for key in keys:
+            query = query.order(key)
+        if last is not None:
+            query = _after(query, keys, last)
+        page = query.limit(page_size).execute().data
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
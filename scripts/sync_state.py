@@ -0,0 +1,23 @@
+"""
+Pieces shared by the incremental syncs that keep local or materialized state.
+
+Each sync remembers the newest change timestamp it has applied and next time
+reads from `WATERMARK_OVERLAP` before it: created_at is stamped when an
+insert starts, so a transaction that commits late can land behind a
+watermark a concurrent scan already recorded. Checkpoint files go through
+`write_json`, so a crash mid-save leaves the previous state intact.
+"""
+
+import os
+import json
+from datetime import timedelta
+from typing import Any
+
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def write_json(path: str, state: Any) -> None:
+    """Replace `path` with `state` as JSON, atomically"""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
@@ -0,0 +1,302 @@
+"""
+Seeded synthetic Fynix data for offline benchmarks.
+
+`generate()` builds users together with everything the summary and refresher
+read:
+- transactions spread over the last few years;
+- budgets, recurring payments and invoices;
+- stock holdings with the buy/sell history behind them, dividends and
+  trading fees;
+- mutual funds with their transactions and NAV history;
+- a cash account per user and a `psx_stocks` price table.
+
+The same seed always yields the same rows, so runs can be compared.
+
+Rows are bulk-loaded into a MemorySupabase. Any other client gets chunked
+inserts, so the same data can seed a scratch project.
+
+Usage:
+    python synthetic_data.py --transactions 100000          # print table sizes and build time
+    python synthetic_data.py --users 50 --transactions 20000 --seed 7
+"""
+
+import sys
+import time
+import uuid
+import random
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+EXPENSE_CATEGORIES = [
+    'Food', 'Groceries', 'Transport', 'Fuel', 'Rent', 'Utilities', 'Internet', 'Mobile', 'Health', 'Education',
+    'Shopping', 'Clothing', 'Entertainment', 'Travel', 'Gifts', 'Charity', 'Insurance', 'Maintenance',
+    'Subscriptions', 'Dining Out', 'Personal Care', 'Household', 'Pets', 'Electronics', 'Other',
+]
+INCOME_CATEGORIES = ['Salary', 'Freelance', 'Business', 'Rental Income', 'Interest', 'Other Income']
+SECTORS = [
+    'CEMENT', 'COMMERCIAL BANKS', 'OIL & GAS EXPLORATION COMPANIES', 'FERTILIZER', 'POWER GENERATION & DISTRIBUTION',
+    'TECHNOLOGY & COMMUNICATION', 'AUTOMOBILE ASSEMBLER', 'PHARMACEUTICALS', 'TEXTILE COMPOSITE', 'FOOD & PERSONAL CARE PRODUCTS',
+]
+FREQUENCIES = ['daily', 'weekly', 'monthly', 'monthly', 'monthly', 'quarterly', 'yearly']
+INVOICE_STATUSES = ['draft', 'sent', 'sent', 'paid', 'paid', 'paid', 'overdue', 'cancelled']
+
+INSERT_CHUNK = 500
+
+
+def _symbols(count: int) -> List[str]:
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    return [letters[n // 676 % 26] + letters[n // 26 % 26] + letters[n % 26] + 'X' for n in range(count)]
+
+
+class _Generator:
+    def __init__(self, seed: int, today: date, years: float):
+        self.rng = random.Random(seed)
+        self.today = today
+        self.days = max(int(years * 365), 1)
+        self.now = datetime.now(timezone.utc)
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def day(self) -> date:
+        """A uniformly random day in the history window, today included"""
+        return self.today - timedelta(days=self.rng.randint(0, self.days))
+
+    def created(self, day: date) -> str:
+        """A random moment on `day`, but never after now: a row stamped in the future would sit past every watermark"""
+        moment = datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(seconds=self.rng.randint(0, 86399))
+        return min(moment, self.now).isoformat()
+
+    def money(self, low: float, high: float) -> float:
+        # Log-uniform: lots of small amounts, a long tail of large ones
+        return round(low * (high / low) ** self.rng.random(), 2)
+
+
+def generate(client: Any, users: int = 1, transactions: int = 1000, seed: int = 0, today: Optional[date] = None,
+             years: float = 3.0, budgets: int = 20, holdings: int = 30, trades_per_holding: int = 8,
+             funds: int = 5, recurring: int = 25, invoices: Optional[int] = None, symbols: int = 500) -> Dict[str, Any]:
+    """Seed `client` and return {'users': [...], 'counts': {table: rows}, 'seconds': build time}.
+
+    `transactions`, `budgets`, `holdings`, ... are per user; `invoices`
+    defaults to one per 50 transactions.
+    """
+    started = time.perf_counter()
+    today = today or date.today()
+    gen = _Generator(seed, today, years)
+    rng = gen.rng
+    invoices = max(transactions // 50, 5) if invoices is None else invoices
+    tables: Dict[str, List[Dict[str, Any]]] = {name: [] for name in (
+        'users', 'transactions', 'budgets', 'recurring_payments', 'invoices', 'cash_account', 'psx_stocks', 'stocks',
+        'stock_transactions', 'dividends', 'trading_fees', 'mutual_funds', 'mutual_fund_transactions',
+        'mutual_fund_value_history',
+    )}
+
+    listed = _symbols(symbols)
+    prices = {}
+    for symbol in listed:
+        prices[symbol] = gen.money(5, 2000)
+        tables['psx_stocks'].append({
+            'id': gen.uuid(), 'symbol': symbol, 'company_name': f"{symbol} Limited", 'sector': rng.choice(SECTORS),
+            'current_price': prices[symbol], 'last_updated': gen.created(today - timedelta(days=1)),
+            'created_at': gen.created(today - timedelta(days=gen.days)),
+        })
+
+    for n in range(users):
+        user_id = gen.uuid()
+        tables['users'].append({'id': user_id, 'email': f"user{n}@example.com", 'name': f"User {n}",
+                                'created_at': gen.created(today - timedelta(days=gen.days))})
+        _user_transactions(gen, tables, user_id, transactions)
+        _user_budgets(gen, tables, user_id, budgets)
+        _user_recurring(gen, tables, user_id, recurring)
+        _user_invoices(gen, tables, user_id, n, invoices)
+        _user_portfolio(gen, tables, user_id, rng.sample(listed, min(holdings, len(listed))), prices, trades_per_holding)
+        _user_funds(gen, tables, user_id, funds)
+
+    for name, rows in tables.items():
+        _load(client, name, rows)
+    return {
+        'users': tables['users'],
+        'counts': {name: len(rows) for name, rows in tables.items()},
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def _load(client: Any, name: str, rows: List[Dict[str, Any]]) -> None:
+    if hasattr(client, 'load'):
+        client.load(name, rows)
+        return
+    for start in range(0, len(rows), INSERT_CHUNK):
+        client.table(name).insert(rows[start:start + INSERT_CHUNK]).execute()
+
+
+def _user_transactions(gen: _Generator, tables: Dict[str, List], user_id: str, count: int) -> None:
+    rng = gen.rng
+    rows = tables['transactions']
+    for _ in range(count):
+        day = gen.day()
+        if rng.random() < 0.15:
+            kind, category, amount = 'income', rng.choice(INCOME_CATEGORIES), gen.money(1000, 400000)
+        else:
+            kind, category, amount = 'expense', rng.choice(EXPENSE_CATEGORIES), gen.money(50, 60000)
+        rows.append({
+            'id': gen.uuid(), 'user_id': user_id, 'type': kind, 'amount': amount, 'category': category,
+            'description': f"{category} #{rng.randint(1, 9999)}", 'date': day.isoformat(), 'created_at': gen.created(day),
+        })
+
+
+def _user_budgets(gen: _Generator, tables: Dict[str, List], user_id: str, count: int) -> None:
+    for category in gen.rng.sample(EXPENSE_CATEGORIES, min(count, len(EXPENSE_CATEGORIES))):
+        row = {'id': gen.uuid(), 'user_id': user_id, 'category': category, 'budget_amount': gen.money(2000, 150000),
+               'period': 'monthly', 'is_custom_category': False, 'created_at': gen.created(gen.day())}
+        tables['budgets'].append(dict(row, updated_at=row['created_at']))
+
+
+def _user_recurring(gen: _Generator, tables: Dict[str, List], user_id: str, count: int) -> None:
+    rng = gen.rng
+    for n in range(count):
+        category = rng.choice(EXPENSE_CATEGORIES)
+        row = {
+            'id': gen.uuid(), 'user_id': user_id, 'name': f"{category} plan {n}", 'category': category,
+            'amount': gen.money(200, 50000), 'frequency': rng.choice(FREQUENCIES),
+            'next_payment_date': (gen.today + timedelta(days=rng.randint(-3, 45))).isoformat(),
+            'status': 'active' if rng.random() < 0.85 else 'paused', 'created_at': gen.created(gen.day()),
+        }
+        tables['recurring_payments'].append(dict(row, updated_at=row['created_at']))
+
+
+def _user_invoices(gen: _Generator, tables: Dict[str, List], user_id: str, user_number: int, count: int) -> None:
+    rng = gen.rng
+    for n in range(count):
+        issued = gen.day()
+        created = gen.created(issued)
+        tables['invoices'].append({
+            'id': gen.uuid(), 'user_id': user_id, 'invoice_number': f"INV-{user_number}-{n:06d}",
+            'client_name': f"Client {rng.randint(1, 200)}", 'client_email': f"client{rng.randint(1, 200)}@example.com",
+            'invoice_date': issued.isoformat(), 'due_date': (issued + timedelta(days=30)).isoformat(),
+            'status': rng.choice(INVOICE_STATUSES), 'type': 'income' if rng.random() < 0.8 else 'expense',
+            'total_amount': gen.money(1000, 500000), 'created_at': created, 'updated_at': created,
+        })
+
+
+def _user_portfolio(gen: _Generator, tables: Dict[str, List], user_id: str, symbols: List[str],
+                    prices: Dict[str, float], trades: int) -> None:
+    rng = gen.rng
+    cash = gen.money(10000, 2000000)
+    for symbol in symbols:
+        stock_id = gen.uuid()
+        shares = invested = 0.0
+        for day in sorted(gen.day() for _ in range(max(trades, 1))):
+            price = round(prices[symbol] * rng.uniform(0.6, 1.2), 2)
+            if shares > 0 and rng.random() < 0.25:
+                sold = round(shares * rng.uniform(0.1, 0.5))
+                if sold <= 0:
+                    continue
+                cost = invested / shares * sold
+                shares -= sold
+                invested -= cost
+                kind, quantity = 'sell', sold
+            else:
+                quantity = rng.randint(10, 500)
+                shares += quantity
+                invested += quantity * price
+                kind = 'buy'
+            tables['stock_transactions'].append({
+                'id': gen.uuid(), 'user_id': user_id, 'stock_id': stock_id, 'symbol': symbol,
+                'company_name': f"{symbol} Limited", 'transaction_type': kind, 'shares': quantity,
+                'price_per_share': price, 'total_amount': round(quantity * price, 2),
+                'transaction_date': day.isoformat(), 'created_at': gen.created(day),
+            })
+            tables['trading_fees'].append({
+                'id': gen.uuid(), 'user_id': user_id, 'fee_type': rng.choice(['broker_charge', 'broker_charge', 'cgt', 'other']),
+                'amount': round(quantity * price * 0.0015, 2), 'fee_date': day.isoformat(), 'created_at': gen.created(day),
+            })
+        if shares <= 0:
+            continue
+        tables['stocks'].append({
+            'id': stock_id, 'user_id': user_id, 'symbol': symbol, 'company_name': f"{symbol} Limited",
+            'total_shares': shares, 'avg_buy_price': round(invested / shares, 2), 'total_invested': round(invested, 2),
+            'created_at': gen.created(gen.day()),
+        })
+        for _ in range(rng.randint(0, 3)):
+            day = gen.day()
+            tables['dividends'].append({
+                'id': gen.uuid(), 'user_id': user_id, 'stock_id': stock_id, 'symbol': symbol,
+                'company_name': f"{symbol} Limited", 'amount': gen.money(100, 50000),
+                'dividend_date': day.isoformat(), 'created_at': gen.created(day),
+            })
+    tables['cash_account'].append({'id': gen.uuid(), 'user_id': user_id, 'balance': cash,
+                                   'created_at': gen.created(gen.day())})
+
+
+def _user_funds(gen: _Generator, tables: Dict[str, List], user_id: str, count: int) -> None:
+    rng = gen.rng
+    for n in range(count):
+        fund_id = gen.uuid()
+        name = f"Fund {n} {rng.choice(['Equity', 'Income', 'Money Market', 'Balanced'])}"
+        value = invested = 0.0
+        day = gen.today - timedelta(days=gen.days)
+        # Monthly NAV updates with the odd top-up or withdrawal in between
+        while day < gen.today:
+            if rng.random() < 0.3 or invested == 0:
+                amount = gen.money(5000, 200000)
+                kind = 'withdraw' if invested and rng.random() < 0.2 else 'invest'
+                amount = min(amount, value) if kind == 'withdraw' else amount
+                if amount > 0:
+                    invested += amount if kind == 'invest' else -amount
+                    value += amount if kind == 'invest' else -amount
+                    tables['mutual_fund_transactions'].append({
+                        'id': gen.uuid(), 'user_id': user_id, 'mutual_fund_id': fund_id, 'fund_name': name,
+                        'transaction_type': kind, 'amount': round(amount, 2), 'transaction_date': day.isoformat(),
+                        'created_at': gen.created(day),
+                    })
+            previous = value
+            value = round(value * rng.uniform(0.97, 1.04), 2)
+            tables['mutual_fund_value_history'].append({
+                'id': gen.uuid(), 'user_id': user_id, 'mutual_fund_id': fund_id, 'fund_name': name,
+                'previous_value': previous, 'new_value': value, 'value_change': round(value - previous, 2),
+                'total_invested': round(invested, 2), 'profit_loss': round(value - invested, 2),
+                'update_date': day.isoformat(), 'created_at': gen.created(day),
+            })
+            day += timedelta(days=30)
+        tables['mutual_funds'].append({
+            'id': fund_id, 'user_id': user_id, 'fund_name': name, 'total_invested': round(invested, 2),
+            'current_value': value, 'profit_loss': round(value - invested, 2), 'created_at': gen.created(gen.day()),
+        })
+
+
+def market_watch_html(stocks: List[Dict[str, Any]], seed: int = 0) -> str:
+    """A PSX market-watch page pricing `stocks` (psx_stocks rows) for the refresher"""
+    rng = random.Random(seed)
+    rows: Iterator[str] = (
+        f"<tr><td data-search=\"{s['symbol']}\"><a class=\"tbl__symbol\" href=\"/company/{s['symbol']}\">"
+        f"<strong>{s['symbol']}</strong></a></td><td>{s['sector']}</td><td>ALLSHR</td>"
+        + "".join(f"<td>{float(s['current_price']) * rng.uniform(0.97, 1.03):,.2f}</td>" for _ in range(5))
+        + "<td>0.00</td><td>0.00%</td><td>1,000</td></tr>"
+        for s in stocks
+    )
+    return (
+        "<!DOCTYPE html>\n<html><body><table class=\"tbl\"><thead><tr><th>SYMBOL</th><th>SECTOR</th>"
+        "<th>LISTED IN</th><th>LDCP</th><th>OPEN</th><th>HIGH</th><th>LOW</th><th>CURRENT</th><th>CHANGE</th>"
+        "<th>CHANGE (%)</th><th>VOLUME</th></tr></thead><tbody>\n" + "\n".join(rows) + "\n</tbody></table></body></html>\n"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a seeded synthetic dataset in memory and report its size")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--transactions", type=int, default=1000, help="transactions per user")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--years", type=float, default=3.0, help="history length")
+    args = parser.parse_args()
+
+    from memory_supabase import MemorySupabase
+    result = generate(MemorySupabase(), users=args.users, transactions=args.transactions, seed=args.seed, years=args.years)
+    for name, count in sorted(result['counts'].items()):
+        print(f"{name:<28}{count:>12,}")
+    print(f"built in {result['seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
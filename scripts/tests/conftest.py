@@ -0,0 +1,72 @@
+"""Shared fixtures; the scripts are run from scripts/, so that directory goes on sys.path."""
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(SCRIPTS_DIR, 'fixtures')
+sys.path.insert(0, SCRIPTS_DIR)
+
+# Placeholder credentials so importing a script never needs a real project; tests pass in their own clients
+os.environ.setdefault('NEXT_PUBLIC_SUPABASE_URL', 'http://127.0.0.1:9')
+os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', 'test-key')
+
+
+def read_fixture(*parts: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, *parts), 'rb') as f:
+        return f.read()
+
+
+class StubPsx:
+    """A local stand-in for the PSX data portal.
+
+    `plan[path]` is a list of responses served in order, each a status code
+    or (status, body); the last one repeats. Unplanned paths get a 404.
+    `hits[path]` counts requests.
+    """
+
+    def __init__(self):
+        self.plan = {}
+        self.hits = {}
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub.lock:
+                    stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+                    responses = stub.plan.get(self.path) or [404]
+                    response = responses.pop(0) if len(responses) > 1 else responses[0]
+                status, body = response if isinstance(response, tuple) else (response, b'')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def psx_server(monkeypatch):
+    import update_tables
+    stub = StubPsx()
+    monkeypatch.setattr(update_tables, 'PSX_BASE_URL', stub.url)
+    # Retries back off with real sleeps; tests don't need to wait them out
+    monkeypatch.setattr(update_tables.time, 'sleep', lambda seconds: None)
+    yield stub
+    stub.close()
@@ -0,0 +1,154 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import books
+from books import CASH, GAINS, PAYABLE, RECEIVABLE, STOCKS, StatementEngine, post
+from lot_engine import LotBook
+from memory_supabase import MemorySupabase
+from synthetic_data import generate
+
+
+def net(postings):
+    """{account: net debit} over postings"""
+    totals = {}
+    for _, _, _, debit, credit, amount in postings:
+        assert amount > 0
+        totals[debit] = totals.get(debit, 0) + amount
+        totals[credit] = totals.get(credit, 0) - amount
+    assert sum(totals.values()) == 0
+    return totals
+
+
+def stock(row_id, kind, shares, price, day):
+    return {'id': row_id, 'symbol': 'luck', 'transaction_type': kind, 'shares': shares, 'price_per_share': price,
+            'total_amount': shares * price, 'transaction_date': day, 'created_at': f"{day}T10:00:00+00:00"}
+
+
+def test_transactions_post_to_cash():
+    lots = LotBook()
+    income = {'id': 1, 'type': 'income', 'amount': '1500.25', 'category': 'Salary', 'description': None, 'date': '2026-09-01'}
+    expense = {'id': 2, 'type': 'expense', 'amount': 99.99, 'category': 'Food', 'description': 'Lunch', 'date': '2026-09-02'}
+    assert net(post('transactions', income, lots)) == {CASH: 150025, 'Revenue - Salary': -150025}
+    assert net(post('transactions', expense, lots)) == {'Expense - Food': 9999, CASH: -9999}
+
+
+@pytest.mark.parametrize('kind,status,debit,credit', [
+    ('income', 'paid', CASH, 'Revenue - Invoiced'),
+    ('income', 'sent', RECEIVABLE, 'Revenue - Invoiced'),
+    ('expense', 'paid', 'Expense - Invoiced', CASH),
+    ('expense', 'overdue', 'Expense - Invoiced', PAYABLE),
+])
+def test_invoices_post_by_status(kind, status, debit, credit):
+    row = {'id': 1, 'invoice_number': 'INV-1', 'client_name': 'Acme', 'status': status, 'type': kind,
+           'total_amount': 500, 'invoice_date': '2026-09-03'}
+    assert net(post('invoices', row, LotBook())) == {debit: 50000, credit: -50000}
+
+
+def test_sell_at_a_gain_books_fifo_cost_and_gain():
+    lots = LotBook()
+    post('stock_transactions', stock('b1', 'buy', 10, 100, '2026-09-01'), lots)
+    post('stock_transactions', stock('b2', 'buy', 10, 200, '2026-09-02'), lots)
+    totals = net(post('stock_transactions', stock('s1', 'sell', 15, 300, '2026-09-03'), lots))
+    # Cost is 10 * 100 + 5 * 200; the rest of the 4,500 proceeds is gain
+    assert totals == {CASH: 450000, STOCKS: -200000, GAINS: -250000}
+
+
+def test_sell_at_a_loss_books_fifo_cost_and_loss():
+    lots = LotBook()
+    post('stock_transactions', stock('b1', 'buy', 10, 100, '2026-09-01'), lots)
+    totals = net(post('stock_transactions', stock('s1', 'sell', 4, 80, '2026-09-02'), lots))
+    assert totals == {CASH: 32000, STOCKS: -40000, GAINS: 8000}
+
+
+def test_dividends_and_fees():
+    lots = LotBook()
+    dividend = {'id': 1, 'symbol': 'luck', 'amount': 250, 'description': None, 'dividend_date': '2026-09-04'}
+    fee = {'id': 2, 'fee_type': 'cgt', 'amount': 12.5, 'description': None, 'fee_date': '2026-09-04'}
+    assert net(post('dividends', dividend, lots)) == {CASH: 25000, 'Revenue - Dividends': -25000}
+    assert net(post('trading_fees', fee, lots)) == {'Expense - cgt': 1250, CASH: -1250}
+
+
+@pytest.fixture
+def seeded():
+    client = MemorySupabase()
+    generate(client, users=1, transactions=600, seed=6, today=date(2026, 10, 17))
+    return client, client.rows('users')[0]['id']
+
+
+def statements(user_id, built):
+    return {name: rows(user_id, built) for name, rows in books.STATEMENTS.items()}
+
+
+def amounts(rows):
+    return {row['account']: row['amount'] for row in rows}
+
+
+def test_statements_balance(seeded, tmp_path):
+    client, user_id = seeded
+    built = StatementEngine(client, str(tmp_path), today=date(2026, 10, 17)).build(user_id, '2026-09')
+    out = statements(user_id, built)
+
+    assert sum(row['debit'] for row in out['trial_balance']) == sum(row['credit'] for row in out['trial_balance'])
+    sheet = amounts(out['balance_sheet'])
+    assert sheet['Total Assets'] == sheet['Total Liabilities and Equity']
+    flows, ledger = amounts(out['cash_flow']), {row['account']: row for row in out['ledger']}
+    assert flows['Beginning Cash'] == ledger[CASH]['opening']
+    assert flows['Ending Cash'] == ledger[CASH]['closing']
+    income = amounts(out['income_statement'])
+    assert income['Net Income'] == income['Total Revenue'] - income['Total Expenses']
+
+
+def test_next_month_reads_only_its_own_rows(seeded, tmp_path):
+    client, user_id = seeded
+    StatementEngine(client, str(tmp_path), today=date(2026, 10, 17)).build(user_id, '2026-09')
+    later = StatementEngine(client, str(tmp_path), today=date(2026, 11, 2))
+    built = later.build(user_id, '2026-10')
+    october = sum(1 for source, (column, _) in books.SOURCES.items() for row in client.rows(source)
+                  if row['user_id'] == user_id and str(row[column]).startswith('2026-10'))
+    assert built['rows'] == october and not built['reused']
+
+    rebuilt = StatementEngine(client, str(tmp_path / 'fresh'), today=date(2026, 11, 2)).build(user_id, '2026-10')
+    assert statements(user_id, built) == statements(user_id, rebuilt)
+
+
+def test_closed_month_export_keeps_its_journal(seeded, tmp_path):
+    client, user_id = seeded
+    engine = StatementEngine(client, str(tmp_path), today=date(2026, 10, 17))
+    first = engine.build(user_id, '2026-09')
+    again = engine.build(user_id, '2026-09')
+    assert again['reused']
+    assert sorted(again['journal']) == sorted(first['journal']) and first['journal']
+
+
+def test_late_and_deleted_rows_trigger_a_rebuild(seeded, tmp_path):
+    client, user_id = seeded
+    engine = StatementEngine(client, str(tmp_path), today=date(2026, 10, 17))
+    engine.build(user_id, '2026-09')
+    checkpoint = engine.load(user_id)
+    checkpoint.scanned_at = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    engine.save(user_id, checkpoint)
+
+    client.table('transactions').insert({'id': 'late', 'user_id': user_id, 'type': 'income', 'amount': 10,
+                                         'category': 'Gift', 'description': None, 'date': '2026-08-15',
+                                         'created_at': datetime.now(timezone.utc).isoformat()}).execute()
+    assert not engine.build(user_id, '2026-09')['reused']
+
+    checkpoint = engine.load(user_id)
+    checkpoint.scanned_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    engine.save(user_id, checkpoint)
+    assert engine.build(user_id, '2026-09')['reused']
+    client.table('transactions').delete().eq('id', next(
+        r['id'] for r in client.rows('transactions') if r['user_id'] == user_id and r['date'].startswith('2026-09')
+    )).execute()
+    assert not engine.build(user_id, '2026-09')['reused']
+
+
+def test_csv_export(seeded, tmp_path):
+    client, _ = seeded
+    engine = StatementEngine(client, str(tmp_path / 'state'), today=date(2026, 10, 17))
+    manifest = books.run_statements(engine, client.rows('users'), '2026-09', str(tmp_path / 'out'), 'csv', workers=1)
+    assert manifest['failed'] == 0 and manifest['users'][0]['balanced']
+    assert set(manifest['files']) == set(books.STATEMENTS)
+    for name in manifest['files'].values():
+        assert (tmp_path / 'out' / '2026-09' / name).stat().st_size > 0
@@ -0,0 +1,186 @@
+from datetime import date, timedelta
+
+import pytest
+
+from budget_alerts import AlertEvaluator
+from memory_supabase import MemorySupabase
+
+TODAY = date(2026, 10, 14)
+
+
+class Ledger:
+    """A MemorySupabase with one user and helpers that stamp each write a minute after the last"""
+
+    def __init__(self):
+        self.client = MemorySupabase()
+        self.minute = 0
+        self.ids = 0
+
+    def stamp(self):
+        self.minute += 1
+        return f"{TODAY.isoformat()}T{8 + self.minute // 60:02d}:{self.minute % 60:02d}:00+00:00"
+
+    def next_id(self, prefix):
+        self.ids += 1
+        return f"{prefix}{self.ids:04d}"
+
+    def expense(self, amount, category='Food', day=TODAY):
+        row = {'id': self.next_id('t'), 'user_id': 'u1', 'type': 'expense', 'amount': amount, 'category': category,
+               'date': day.isoformat(), 'created_at': self.stamp()}
+        self.client.table('transactions').insert(row).execute()
+        return row['id']
+
+    def budget(self, amount, category='Food', budget_id=None):
+        stamp = self.stamp()
+        if budget_id is not None:
+            self.client.table('budgets').update({'budget_amount': amount, 'updated_at': stamp}).eq('id', budget_id).execute()
+            return budget_id
+        row = {'id': self.next_id('b'), 'user_id': 'u1', 'category': category, 'budget_amount': amount,
+               'period': 'monthly', 'updated_at': stamp}
+        self.client.table('budgets').insert(row).execute()
+        return row['id']
+
+    def payment(self, due, payment_id=None, status='active'):
+        stamp = self.stamp()
+        if payment_id is not None:
+            self.client.table('recurring_payments').update({
+                'next_payment_date': due.isoformat(), 'status': status, 'updated_at': stamp
+            }).eq('id', payment_id).execute()
+            return payment_id
+        row = {'id': self.next_id('p'), 'user_id': 'u1', 'name': 'Rent', 'category': 'Housing', 'amount': 50000,
+               'next_payment_date': due.isoformat(), 'status': status, 'updated_at': stamp}
+        self.client.table('recurring_payments').insert(row).execute()
+        return row['id']
+
+
+@pytest.fixture
+def ledger():
+    return Ledger()
+
+
+def evaluator(ledger, tmp_path, **kwargs):
+    return AlertEvaluator(ledger.client, str(tmp_path / 'alerts'), **kwargs)
+
+
+def levels(alerts):
+    return [(alert['category'], alert['level']) for alert in alerts if alert['kind'] == 'budget']
+
+
+def test_first_check_only_primes(ledger, tmp_path):
+    ledger.budget(1000)
+    ledger.expense(950)
+    alerts = evaluator(ledger, tmp_path)
+    assert alerts.check(TODAY) == [] and alerts.primed
+    # Already over 80% when the feeds were primed: no alert for it later either
+    assert alerts.check(TODAY) == []
+
+
+def test_rows_in_the_overlap_window_are_counted_once(ledger, tmp_path):
+    ledger.budget(1000)
+    alerts = evaluator(ledger, tmp_path)
+    alerts.check(TODAY)
+    ledger.expense(500)
+    assert alerts.check(TODAY) == []
+    ledger.expense(350)
+    assert levels(alerts.check(TODAY)) == [('Food', 80)]
+    # Both expenses are inside the overlap and come back on every check
+    for _ in range(3):
+        assert alerts.check(TODAY) == []
+    assert alerts.users['u1'].spent == {'Food': 850.0}
+
+    # A fresh evaluator resumes from the saved state without recounting
+    restarted = evaluator(ledger, tmp_path)
+    assert restarted.check(TODAY) == []
+    ledger.expense(200)
+    assert levels(restarted.check(TODAY)) == [('Food', 100)]
+    assert restarted.users['u1'].spent == {'Food': 1050.0}
+
+
+def test_jumping_past_both_thresholds_is_one_alert(ledger, tmp_path):
+    ledger.budget(1000)
+    alerts = evaluator(ledger, tmp_path)
+    alerts.check(TODAY)
+    ledger.expense(1500)
+    assert levels(alerts.check(TODAY)) == [('Food', 100)]
+
+
+def test_raising_the_budget_re_arms_the_threshold(ledger, tmp_path):
+    budget_id = ledger.budget(1000)
+    alerts = evaluator(ledger, tmp_path)
+    alerts.check(TODAY)
+    ledger.expense(900)
+    assert levels(alerts.check(TODAY)) == [('Food', 80)]
+    ledger.budget(2000, budget_id=budget_id)
+    assert alerts.check(TODAY) == []
+    assert alerts.users['u1'].fired['Food'] == []
+    ledger.expense(800)
+    assert levels(alerts.check(TODAY)) == [('Food', 80)]
+
+
+def test_future_dated_expenses_count_once_their_day_arrives(ledger, tmp_path):
+    ledger.budget(1000)
+    alerts = evaluator(ledger, tmp_path)
+    alerts.check(TODAY)
+    later = TODAY + timedelta(days=3)
+    ledger.expense(900, day=later)
+    assert alerts.check(TODAY) == []
+    assert alerts.feed.pending_users == {'u1': later.isoformat()}
+    assert alerts.check(later - timedelta(days=1)) == []
+    # Nothing new in any feed on the day; the pending entry alone brings the user back
+    assert levels(alerts.check(later)) == [('Food', 80)]
+    assert alerts.feed.pending_users == {}
+
+
+def test_payment_alerts_once_per_due_date_inside_the_window(ledger, tmp_path):
+    due = TODAY + timedelta(days=5)
+    alerts = evaluator(ledger, tmp_path)
+    alerts.check(TODAY)
+    payment_id = ledger.payment(due)
+    assert alerts.check(TODAY) == []
+    assert alerts.check(due - timedelta(days=3)) == []
+
+    found = alerts.check(due - timedelta(days=2))
+    assert [(alert['payment_id'], alert['days']) for alert in found] == [(payment_id, 2)]
+    assert alerts.check(due - timedelta(days=1)) == []
+    assert alerts.check(due) == []
+
+    # Rolled forward to the next cycle: that due date is alerted in its turn
+    next_due = due + timedelta(days=1)
+    ledger.payment(next_due, payment_id=payment_id)
+    assert [alert['next_payment_date'] for alert in alerts.check(due)] == [next_due.isoformat()]
+
+    # Paused payments drop out of the index
+    ledger.payment(next_due + timedelta(days=1), payment_id=payment_id, status='paused')
+    assert alerts.check(due) == []
+    assert payment_id not in alerts.feed.payments
+
+
+def test_reseed_picks_up_deleted_expenses(ledger, tmp_path):
+    ledger.budget(1000)
+    alerts = evaluator(ledger, tmp_path, reseed_hours=0)
+    alerts.check(TODAY)
+    expense_id = ledger.expense(900)
+    assert levels(alerts.check(TODAY)) == [('Food', 80)]
+
+    # The delete never shows up in the feed; the next check that touches the user re-reads the month
+    ledger.client.table('transactions').delete().eq('id', expense_id).execute()
+    ledger.expense(10, category='Travel')
+    assert alerts.check(TODAY) == []
+    assert alerts.users['u1'].spent == {'Travel': 10.0}
+    assert alerts.users['u1'].fired['Food'] == []
+
+    ledger.expense(850)
+    assert levels(alerts.check(TODAY)) == [('Food', 80)]
+
+
+def test_reseed_records_crossed_thresholds_without_alerting(ledger, tmp_path):
+    ledger.budget(1000)
+    alerts = evaluator(ledger, tmp_path, reseed_hours=0)
+    alerts.check(TODAY)
+    ledger.expense(900)
+    # Seeding leaves out this check's own rows, so the 900 is a new crossing, not a seeded one
+    assert levels(alerts.check(TODAY)) == [('Food', 80)]
+    ledger.expense(10, category='Travel')
+    # Re-read with 910 already spent: 80% is recorded as fired, and nothing is re-sent
+    assert alerts.check(TODAY) == []
+    assert alerts.users['u1'].fired['Food'] == [80]
@@ -0,0 +1,38 @@
+import functools
+
+import pytest
+
+import daily_financial_summary as summary_module
+import lot_engine
+import portfolio_series
+from lot_engine import LotEngine
+from memory_supabase import MemorySupabase
+from portfolio_series import PortfolioSeries
+from price_history import PriceHistoryCache
+from synthetic_data import generate
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    client = MemorySupabase()
+    generate(client, users=3, transactions=300, seed=11)
+    monkeypatch.setattr(summary_module, 'supabase', client)
+    # Lot books and value series go under tmp_path, never the real caches; the summary
+    # imports both where it uses them, so patch them on their own modules
+    monkeypatch.setattr(lot_engine, 'LotEngine', functools.partial(LotEngine, state_dir=str(tmp_path / 'lots')))
+    monkeypatch.setattr(portfolio_series, 'PortfolioSeries', functools.partial(
+        PortfolioSeries, series_dir=str(tmp_path / 'series'), prices=PriceHistoryCache(str(tmp_path / 'prices'))
+    ))
+    return client
+
+
+def test_batch_snapshots_match_single_user_snapshots(client):
+    loader = summary_module.BatchSummaryLoader(user_chunk_size=2)
+    users, missing = loader.load_users()
+    assert not missing
+    batch = [summary_module.DailyFinancialSummary(user['email'], user_data=user) for user in users]
+    assert loader.load(batch) == {}
+
+    for summary in batch:
+        single = summary_module.DailyFinancialSummary(summary.user_email)
+        assert summary.load_snapshot() == single.load_snapshot(parallel=False)
@@ -0,0 +1,91 @@
+import pytest
+
+from discord_delivery import (
+    MAX_CONTENT, MAX_DESCRIPTION, MAX_EMBED_CHARS, MAX_EMBEDS, MAX_FIELD_NAME, MAX_FIELD_VALUE, MAX_FIELDS,
+    MAX_FOOTER, MAX_TITLE, embed_size, split_embed, split_payload,
+)
+
+
+def lines(count, width=70, prefix='line'):
+    return '\n'.join(f"{prefix} {i:05d} ".ljust(width, 'x') for i in range(count))
+
+
+def assert_within_limits(messages):
+    for message in messages:
+        embeds = message.get('embeds', [])
+        assert message.get('content') or embeds, 'empty message'
+        assert len(message.get('content', '')) <= MAX_CONTENT
+        assert len(embeds) <= MAX_EMBEDS
+        assert sum(embed_size(embed) for embed in embeds) <= MAX_EMBED_CHARS
+        for embed in embeds:
+            assert embed_size(embed) > 0, 'empty embed'
+            assert len(embed.get('title', '')) <= MAX_TITLE
+            assert len(embed.get('description', '')) <= MAX_DESCRIPTION
+            assert len(embed.get('footer', {}).get('text', '')) <= MAX_FOOTER
+            assert len(embed.get('fields', [])) <= MAX_FIELDS
+            for field in embed.get('fields', []):
+                assert len(field['name']) <= MAX_FIELD_NAME
+                assert len(field['value']) <= MAX_FIELD_VALUE
+
+
+def joined(messages, read):
+    return '\n'.join(text for message in messages for text in read(message) if text)
+
+
+def test_small_payload_is_left_alone():
+    payload = {'content': 'hi', 'username': 'Fynix', 'embeds': [{'title': 't', 'description': 'd', 'color': 1}]}
+    assert split_payload(payload) == [payload]
+
+
+def test_long_content_is_chunked_before_the_embeds():
+    content = lines(100)
+    payload = {'content': content, 'username': 'Fynix', 'embeds': [{'title': 'Summary', 'description': 'body'}]}
+    messages = split_payload(payload)
+    assert_within_limits(messages)
+    assert len(messages) > 1
+    assert joined(messages, lambda m: [m.get('content')]) == content
+    assert all(message['username'] == 'Fynix' for message in messages)
+    # The embed rides along with the last piece of content instead of opening a message of its own
+    assert 'embeds' in messages[-1] and all('embeds' not in message for message in messages[:-1])
+
+
+def test_content_without_embeds_never_sends_an_empty_embed_list():
+    messages = split_payload({'content': lines(60)})
+    assert_within_limits(messages)
+    assert all('embeds' not in message for message in messages)
+
+
+def test_long_description_continues_in_more_embeds():
+    description = lines(200)
+    embed = {'title': 'Summary', 'description': description, 'color': 7, 'footer': {'text': 'end'}, 'timestamp': 'now'}
+    embeds = split_embed(embed)
+    assert len(embeds) > 1
+    assert '\n'.join(e['description'] for e in embeds if 'description' in e) == description
+    assert embeds[0]['title'] == 'Summary' and all(e['color'] == 7 for e in embeds)
+    assert embeds[-1]['footer'] == {'text': 'end'} and embeds[-1]['timestamp'] == 'now'
+    assert_within_limits(split_payload({'embeds': [embed]}))
+
+
+def test_long_footer_continues_in_more_embeds():
+    footer = lines(80, prefix='note')
+    embeds = split_embed({'title': 'Summary', 'footer': {'text': footer, 'icon_url': 'https://example.com/i.png'}})
+    assert '\n'.join(e['footer']['text'] for e in embeds if 'footer' in e) == footer
+    assert all(e['footer']['icon_url'] == 'https://example.com/i.png' for e in embeds if 'footer' in e)
+    assert_within_limits([{'embeds': [e]} for e in embeds])
+
+
+@pytest.mark.parametrize('embeds', [
+    # Many fields, each close to the value limit
+    [{'title': 'Holdings', 'fields': [{'name': f"f{i}", 'value': lines(14)} for i in range(60)]}],
+    # A field value that has to continue in further fields
+    [{'title': 'Budgets', 'fields': [{'name': 'all', 'value': lines(300), 'inline': False}]}],
+    # Several embeds that together overflow a message
+    [{'title': f"s{i}", 'description': lines(50), 'footer': {'text': lines(20)}} for i in range(12)],
+    # Everything at once, with one unbroken line longer than any limit
+    [{'title': 'T' * 400, 'description': 'y' * 9000, 'footer': {'text': 'z' * 5000},
+      'fields': [{'name': 'N' * 300, 'value': lines(40)}] * 30}],
+])
+def test_every_message_stays_within_the_limits(embeds):
+    messages = split_payload({'content': lines(40), 'username': 'Fynix', 'embeds': embeds})
+    assert_within_limits(messages)
+    assert len(messages) > 1
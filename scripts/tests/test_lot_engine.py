@@ -0,0 +1,110 @@
+import pytest
+
+from lot_engine import SOURCES, BackdatedTrade, LotBook, LotEngine
+from memory_supabase import MemorySupabase
+from synthetic_data import generate
+
+
+def trade(row_id, kind, shares, price, day, created_at=None, symbol='LUCK'):
+    return {'id': row_id, 'user_id': 'u1', 'symbol': symbol, 'transaction_type': kind, 'shares': shares,
+            'price_per_share': price, 'total_amount': shares * price, 'transaction_date': day,
+            'created_at': created_at or f"{day}T10:00:00+00:00"}
+
+
+def test_sells_consume_oldest_lots_first():
+    book = LotBook()
+    book.apply('stock_transactions', [
+        trade('t1', 'buy', 10, 100, '2026-01-05'),
+        trade('t2', 'buy', 10, 200, '2026-02-05'),
+        trade('t3', 'sell', 15, 300, '2026-03-05'),
+    ])
+    # 15 * 300 - (10 * 100 + 5 * 200)
+    assert book.lifetime['realized'] == pytest.approx(2500)
+    assert book.months['2026-03']['realized'] == pytest.approx(2500)
+    assert book.lots == {'LUCK': [[5.0, 200.0, '2026-02-05']]}
+
+
+def test_same_day_trades_follow_entry_order():
+    book = LotBook()
+    # Sorted by created_at within the day: the buy was entered before the sell
+    book.apply('stock_transactions', [
+        trade('t2', 'sell', 10, 150, '2026-01-05', '2026-01-05T11:00:00+00:00'),
+        trade('t1', 'buy', 10, 100, '2026-01-05', '2026-01-05T09:00:00+00:00'),
+    ])
+    assert book.lifetime['realized'] == pytest.approx(500)
+    assert book.unmatched_shares == 0
+
+
+def test_oversold_shares_have_no_basis():
+    book = LotBook()
+    book.apply('stock_transactions', [trade('t1', 'buy', 5, 100, '2026-01-05'), trade('t2', 'sell', 8, 120, '2026-01-06')])
+    assert book.unmatched_shares == pytest.approx(3)
+    assert book.lifetime['realized'] == pytest.approx(5 * 20)
+    assert 'LUCK' not in book.lots
+
+
+def test_backdated_trade_is_rejected():
+    book = LotBook()
+    book.apply_trade(trade('t1', 'buy', 10, 100, '2026-03-01'))
+    with pytest.raises(BackdatedTrade):
+        book.apply_trade(trade('t2', 'buy', 10, 100, '2026-02-01'))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    client = MemorySupabase()
+    generate(client, users=2, transactions=100, seed=4)
+    return LotEngine(client, str(tmp_path)), client
+
+
+def assert_matches_replay(engine, user_id):
+    assert engine.verify(user_id) == []
+
+
+def test_incremental_update_matches_replay(engine):
+    engine, client = engine
+    user_id = client.rows('users')[0]['id']
+    engine.update(user_id)
+    symbol = client.rows('stock_transactions')[0]['symbol']
+    client.table('stock_transactions').insert(trade('new-buy', 'buy', 7, 50, '2099-01-01', symbol=symbol) | {'user_id': user_id}).execute()
+    book = engine.update(user_id)
+    assert book.counts['stock_transactions'] == sum(1 for r in client.rows('stock_transactions') if r['user_id'] == user_id)
+    assert_matches_replay(engine, user_id)
+
+
+def test_backdated_insert_replays_history(engine):
+    engine, client = engine
+    user_id = client.rows('users')[0]['id']
+    replayed_at = engine.update(user_id).replayed_at
+    first = min((r for r in client.rows('stock_transactions') if r['user_id'] == user_id), key=lambda r: r['transaction_date'])
+    client.table('stock_transactions').insert(
+        trade('backdated', 'buy', 3, 1, '2000-01-01', '2099-01-01T00:00:00+00:00', first['symbol']) | {'user_id': user_id}
+    ).execute()
+    assert engine.update(user_id).replayed_at != replayed_at
+    assert_matches_replay(engine, user_id)
+
+
+def test_deleted_rows_force_a_replay(engine):
+    engine, client = engine
+    user_ids = [row['id'] for row in client.rows('users')]
+    engine.update_many(user_ids)
+    fee = next(r for r in client.rows('trading_fees') if r['user_id'] == user_ids[1])
+    before = engine.load(user_ids[1]).lifetime['fees']
+    client.table('trading_fees').delete().eq('id', fee['id']).execute()
+    books = engine.update_many(user_ids)
+    assert books[user_ids[1]].lifetime['fees'] == pytest.approx(before - fee['amount'])
+    assert_matches_replay(engine, user_ids[1])
+
+
+def test_user_without_rows_does_not_force_full_scans(engine):
+    engine, client = engine
+    user_ids = [row['id'] for row in client.rows('users')]
+    client.table('dividends').delete().eq('user_id', user_ids[0]).execute()
+    engine.update_many(user_ids)
+    assert all(engine.load(user_id).watermarks[source] for user_id in user_ids for source in SOURCES)
+
+    client.reset_stats()
+    engine.update_many(user_ids)
+    # Only rows inside each watermark's overlap window come back, not every user's history
+    total = sum(1 for source in SOURCES for row in client.rows(source) if row['user_id'] in user_ids)
+    assert sum(client.rows_returned[source] for source in SOURCES) < total / 4
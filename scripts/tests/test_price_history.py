@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+
+from memory_supabase import MemorySupabase
+from price_history import PriceHistoryCache
+
+
+def snapshot(client, symbols, captured_at):
+    client.table('psx_price_history').insert(
+        [{'symbol': symbol, 'price': 100.0 + i, 'captured_at': captured_at.isoformat()} for i, symbol in enumerate(symbols)]
+    ).execute()
+
+
+def test_sync_does_not_reread_the_newest_snapshot(tmp_path):
+    client = MemorySupabase()
+    client.table('psx_stocks').insert([{'id': 1, 'symbol': 'LUCK'}, {'id': 2, 'symbol': 'HBL'}]).execute()
+    # Run timestamps carry microseconds; the cache stores whole seconds
+    first = datetime(2026, 10, 16, 10, 0, 0, 654321, timezone.utc)
+    snapshot(client, ['LUCK', 'HBL'], first)
+    cache = PriceHistoryCache(str(tmp_path))
+    assert cache.sync(client) == 2
+
+    client.reset_stats()
+    assert cache.sync(client) == 0
+    assert client.rows_returned['psx_price_history'] == 0
+
+    snapshot(client, ['LUCK', 'HBL'], first + timedelta(minutes=15))
+    assert cache.sync(client) == 2
+    assert [price for _, price in cache.range('LUCK', first - timedelta(days=1), first + timedelta(days=1))] == [100.0, 100.0]
+
+
+def test_symbol_without_cache_gets_its_whole_history(tmp_path):
+    client = MemorySupabase()
+    client.table('psx_stocks').insert([{'id': 1, 'symbol': 'LUCK'}, {'id': 2, 'symbol': 'MARI'}]).execute()
+    start = datetime(2026, 10, 14, 10, 0, tzinfo=timezone.utc)
+    snapshot(client, ['MARI'], start)
+    snapshot(client, ['LUCK', 'MARI'], start + timedelta(days=1))
+    cache = PriceHistoryCache(str(tmp_path))
+    cache.append([{'symbol': 'LUCK', 'price': 100.0, 'captured_at': (start + timedelta(days=1)).isoformat()}])
+    assert cache.sync(client) == 2
+    assert len(cache.range('MARI', start, start + timedelta(days=2))) == 2
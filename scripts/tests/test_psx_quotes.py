@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR, read_fixture
+from psx_quotes import QUOTE_CLOSE_MARKER, SCAN_OVERLAP, extractPriceFast, extractPriceSoup, parseMarketWatch
+
+PAGES = sorted(name[:-5] for name in os.listdir(os.path.join(FIXTURES_DIR, 'psx_pages')) if name.endswith('.html'))
+EXPECTED = {'DELISTED': None, 'HBL': 145.3, 'LUCK': 620.0, 'MARI': 1850.0}
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_fast_path_agrees_with_soup(page):
+    body = read_fixture('psx_pages', f"{page}.html")
+    assert extractPriceSoup(body.decode('utf-8')) == EXPECTED[page]
+    assert extractPriceFast(body) == EXPECTED[page]
+
+
+def test_fast_path_reads_price_inside_inline_markup():
+    body = b'<div class="quote__close"><span class="currency">Rs.</span>1,145.30</div>'
+    assert extractPriceFast(body) == 1145.3
+
+
+def test_page_without_quote_has_no_marker():
+    # update_tables skips the soup fallback for these pages
+    assert QUOTE_CLOSE_MARKER not in read_fixture('psx_pages', 'DELISTED.html')
+
+
+@pytest.mark.parametrize('page', ['HBL', 'LUCK', 'MARI'])
+@pytest.mark.parametrize('chunk_size', [97, 4096])
+def test_chunked_scan_finds_price_split_across_chunks(page, chunk_size):
+    """Scan the way getTodayPsxPrice does: each new chunk plus SCAN_OVERLAP bytes of the last"""
+    data = read_fixture('psx_pages', f"{page}.html")
+    body = bytearray()
+    price = None
+    for start in range(0, len(data), chunk_size):
+        scan_from = max(len(body) - SCAN_OVERLAP, 0)
+        body += data[start:start + chunk_size]
+        price = extractPriceFast(body, scan_from)
+        if price is not None:
+            break
+    assert price == EXPECTED[page]
+
+
+def test_market_watch_prices():
+    prices = parseMarketWatch(read_fixture('market_watch.html').decode('utf-8'))
+    # SUSP has no current price ("-") and is left out
+    assert prices == {'OGDC': 95.5, 'HBL': 145.3, 'LUCK': 620.0, 'MARI': 1850.0, 'FFC': 95.8, 'NBP': 35.2}
+
+
+def test_market_watch_follows_header_order():
+    html = ('<table><tr><th>CURRENT</th><th>CHANGE</th><th>SYMBOL</th></tr>'
+            '<tr><td>1,234.50</td><td>1.00</td><td>luck</td></tr>'
+            '<tr><td>-</td><td>-</td><td>SUSP</td></tr></table>')
+    assert parseMarketWatch(html) == {'LUCK': 1234.5}
+
+
+def test_market_watch_without_table():
+    assert parseMarketWatch('<html><body>maintenance</body></html>') == {}
@@ -0,0 +1,125 @@
+import threading
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import daily_financial_summary as summary_module
+from psx_calendar import pkTz
+from scheduler import Job, PriceRefreshJob, Scheduler, SentLog, SummaryJob
+
+# A Wednesday; PSX trades 09:30-15:30 Asia/Karachi
+WEDNESDAY = date(2026, 10, 14)
+
+
+def pk(day, hour, minute=0, second=0):
+    return pkTz().localize(datetime.combine(day, time(hour, minute, second)))
+
+
+class RecordingJob(Job):
+    name = 'recording'
+
+    def __init__(self, jitter=0.0, interval=timedelta(minutes=5)):
+        super().__init__(jitter)
+        self.interval = interval
+        self.started = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def plan(self, now):
+        return now if self.last_started is None else max(now, self.last_started + self.interval)
+
+    def run(self, planned):
+        self.started.append(planned)
+        self.release.wait(5)
+
+
+@pytest.fixture
+def summary_job(tmp_path):
+    job = SummaryJob([], time(23, 30), SentLog(str(tmp_path / 'sent.json')), str(tmp_path / 'out'), 1,
+                     False, None, timedelta(minutes=15))
+    job.schedule = {'a@example.com': time(23, 30), 'b@example.com': time(21, 0)}
+    return job
+
+
+def test_refresh_runs_on_the_interval_while_open():
+    job = PriceRefreshJob(None, timedelta(minutes=15), set())
+    now = pk(WEDNESDAY, 11)
+    assert job.plan(now) == now
+    job.last_started = pk(WEDNESDAY, 10, 50)
+    assert job.plan(now) == pk(WEDNESDAY, 11, 5)
+
+
+def test_refresh_catches_the_close_once_then_waits_for_the_next_open():
+    job = PriceRefreshJob(None, timedelta(minutes=15), set())
+    # The last in-session run started before the close: one more picks up the closing prices
+    job.last_started = pk(WEDNESDAY, 15, 20)
+    after_close = pk(WEDNESDAY, 17)
+    assert job.plan(after_close) == after_close
+    job.last_started = after_close
+    assert job.plan(pk(WEDNESDAY, 18)) == pk(WEDNESDAY + timedelta(days=1), 9, 30)
+
+
+def test_refresh_started_after_a_restart_catches_the_missed_close():
+    job = PriceRefreshJob(None, timedelta(minutes=15), set())
+    now = pk(WEDNESDAY, 20)
+    assert job.plan(now) == now
+
+
+def test_summary_catches_up_a_missed_time(summary_job):
+    # Started at 22:00: the 21:00 user is overdue and goes out now
+    now = pk(WEDNESDAY, 22)
+    assert summary_job.plan(now) == now
+    summary_job.sent.mark(WEDNESDAY, ['b@example.com'])
+    assert summary_job.plan(now) == pk(WEDNESDAY, 23, 30)
+    summary_job.sent.mark(WEDNESDAY, ['a@example.com'])
+    assert summary_job.plan(pk(WEDNESDAY, 23, 45)) == pk(WEDNESDAY + timedelta(days=1), 21)
+
+
+def test_summary_sends_only_due_users_once_across_restarts(summary_job, monkeypatch, tmp_path):
+    batches = []
+    monkeypatch.setattr(summary_module, 'run_batch', lambda emails, *args: batches.append(emails) or True)
+    summary_job.run(pk(WEDNESDAY, 22))
+    assert batches == [['b@example.com']]
+
+    restarted = SentLog(str(tmp_path / 'sent.json'))
+    assert restarted.sent_on(WEDNESDAY) == {'b@example.com'}
+    summary_job.sent = restarted
+    summary_job.run(pk(WEDNESDAY, 23, 30))
+    summary_job.run(pk(WEDNESDAY, 23, 40))
+    assert batches == [['b@example.com'], ['a@example.com']]
+
+
+def test_jitter_is_rolled_once_per_slot_and_run_gets_the_slot(monkeypatch):
+    job = RecordingJob(jitter=60)
+    rolls = iter([42.0, 7.0])
+    monkeypatch.setattr('scheduler.random.uniform', lambda low, high: next(rolls))
+    now = pk(WEDNESDAY, 10)
+    due = job.due_at(now)
+    assert due == now + timedelta(seconds=42) and job.slot == now
+    # Polling again before the start doesn't re-roll
+    assert job.due_at(now + timedelta(seconds=10)) == due
+
+    scheduler = Scheduler([job])
+    assert scheduler.tick(now + timedelta(seconds=10)) == due
+    scheduler.tick(due)
+    assert scheduler.drain(5)
+    assert job.started == [now] and job.last_started == now
+    # The next slot counts from the slot, not the jittered start
+    assert job.due_at(due) == now + job.interval + timedelta(seconds=7)
+
+
+def test_tick_never_stacks_a_job_on_itself():
+    job = RecordingJob(interval=timedelta(0))
+    job.release.clear()
+    scheduler = Scheduler([job])
+    now = pk(WEDNESDAY, 10)
+    scheduler.tick(now)
+    for second in range(1, 4):
+        scheduler.tick(now + timedelta(seconds=second))
+    job.release.set()
+    scheduler._running[job.name].result(5)
+    assert len(job.started) == 1
+    # Once the run ends it is replanned and, still due, runs again
+    scheduler.tick(now + timedelta(seconds=5))
+    assert scheduler.drain(5)
+    assert job.started == [now, now + timedelta(seconds=5)]
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from memory_supabase import MemorySupabase
+from summary_cache import SummaryCache
+from synthetic_data import generate
+
+COLUMNS = 'id,status,type,total_amount,updated_at'
+
+
+@pytest.fixture
+def client():
+    client = MemorySupabase()
+    generate(client, users=3, transactions=300, invoices=300, seed=15)
+    return client
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SummaryCache(str(tmp_path / 'cache.sqlite'))
+    yield cache
+    cache.close()
+
+
+def invoices(client, user_id):
+    def select(columns, **kwargs):
+        return client.table('invoices').select(columns, **kwargs).eq('user_id', user_id)
+    return select
+
+
+def sync(cache, client, user_id):
+    return {row['id']: row for row in cache.sync('invoices', user_id, 'all', invoices(client, user_id), COLUMNS, 'updated_at')}
+
+
+def server_rows(client, user_id):
+    return {row['id']: row['status'] for row in client.rows('invoices') if row['user_id'] == user_id}
+
+
+def test_delta_sync_fetches_only_changed_rows(client, cache):
+    user_id = client.rows('users')[0]['id']
+    first = sync(cache, client, user_id)
+    assert len(first) == len(server_rows(client, user_id)) == cache.stats['rows_fetched']
+
+    edited = next(iter(first))
+    client.table('invoices').update({'status': 'paid', 'updated_at': datetime.now(timezone.utc).isoformat()}).eq(
+        'id', edited).execute()
+    client.reset_stats()
+    second = sync(cache, client, user_id)
+    assert {row_id: row['status'] for row_id, row in second.items()} == server_rows(client, user_id)
+    assert client.rows_returned['invoices'] < len(first) / 4
+    assert cache.stats['reconciled'] == 0
+
+
+def test_count_probe_reconciles_deletes_and_late_rows(client, cache):
+    user_id = client.rows('users')[0]['id']
+    first = sync(cache, client, user_id)
+    deleted = next(iter(first))
+    client.table('invoices').delete().eq('id', deleted).execute()
+    assert deleted not in sync(cache, client, user_id)
+    assert cache.stats['reconciled'] == 1
+
+    # Committed late: its updated_at is far behind the watermark, so only the count probe notices it
+    late = dict(first[deleted], id='late-invoice', user_id=user_id,
+                updated_at=(datetime.now(timezone.utc) - timedelta(days=30)).isoformat())
+    client.table('invoices').insert(late).execute()
+    rows = sync(cache, client, user_id)
+    assert cache.stats['reconciled'] == 2
+    assert set(rows) == set(server_rows(client, user_id)) and 'late-invoice' in rows
+
+
+def test_least_recently_used_partitions_are_evicted(client, cache):
+    first, second, third = [row['id'] for row in client.rows('users')]
+    for user_id in (first, second, third, first):
+        sync(cache, client, user_id)
+    cache.max_bytes = cache.size() - 1
+    cache._evict()
+    assert {user_id for _, user_id, _, _, _ in cache.describe()} == {first, third}
+    assert cache.stats['evicted'] == 1
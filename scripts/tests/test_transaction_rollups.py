@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from memory_supabase import MemorySupabase
+from synthetic_data import generate
+from transaction_rollups import ROLLUP_TABLE, TransactionRollups
+
+
+@pytest.fixture
+def client():
+    client = MemorySupabase()
+    generate(client, users=2, transactions=300, seed=14)
+    return client
+
+
+def queue_dirty_day(client, row):
+    """What the update/delete trigger does in the database"""
+    client.table('transaction_rollup_dirty_days').insert({'user_id': row['user_id'], 'date': row['date']}).execute()
+
+
+def test_first_refresh_rebuilds(client):
+    rollups = TransactionRollups(client)
+    assert rollups.refresh()['mode'] == 'rebuild'
+    assert rollups.check() == []
+    assert rollups.read_watermark() == max(datetime.fromisoformat(row['created_at']) for row in client.rows('transactions'))
+
+
+def test_refresh_reads_only_new_rows(client):
+    rollups = TransactionRollups(client)
+    rollups.refresh()
+    user_id = client.rows('users')[0]['id']
+    now = datetime.now(timezone.utc)
+    client.table('transactions').insert({'id': 'new-expense', 'user_id': user_id, 'type': 'expense', 'amount': 42.5, 'category': 'Food',
+                                         'description': None, 'date': now.date().isoformat(),
+                                         'created_at': now.isoformat()}).execute()
+    client.reset_stats()
+    result = rollups.refresh()
+    assert result['mode'] == 'refresh' and result['watermark'] == now.isoformat()
+    # The delta scan only returns rows past the watermark's overlap window, not the whole table
+    assert client.rows_returned['transactions'] < len(client.rows('transactions')) / 4
+    assert rollups.check() == []
+
+
+def test_late_commit_inside_the_overlap_is_picked_up(client):
+    rollups = TransactionRollups(client)
+    rollups.refresh()
+    watermark = rollups.read_watermark()
+    row = client.rows('transactions')[0]
+    late = dict(row, id='late-commit', amount=10, created_at=(watermark - timedelta(minutes=2)).isoformat())
+    client.table('transactions').insert(late).execute()
+    assert rollups.check() != []
+    rollups.refresh()
+    assert rollups.check() == []
+
+
+def test_updates_and_deletes_come_from_dirty_days(client):
+    rollups = TransactionRollups(client)
+    rollups.refresh()
+    edited, removed = client.rows('transactions')[:2]
+    client.table('transactions').update({'amount': float(edited['amount']) + 100}).eq('id', edited['id']).execute()
+    queue_dirty_day(client, edited)
+    same_day = [r['id'] for r in client.rows('transactions')
+                if (r['user_id'], r['date']) == (removed['user_id'], removed['date'])]
+    client.table('transactions').delete().in_('id', same_day).execute()
+    queue_dirty_day(client, removed)
+
+    mismatches = rollups.check(user_id=removed['user_id'], since=removed['date'])
+    assert {(m['date'], m['expected_count']) for m in mismatches if m['user_id'] == removed['user_id']} >= {(removed['date'], 0)}
+    result = rollups.refresh()
+    assert result['deleted'] >= 1
+    assert rollups.check() == []
+    assert client.rows('transaction_rollup_dirty_days') == []
+    assert not any(r['user_id'] == removed['user_id'] and r['date'] == removed['date'] for r in client.rows(ROLLUP_TABLE))
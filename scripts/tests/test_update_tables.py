@@ -0,0 +1,170 @@
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+
+import update_tables
+from conftest import read_fixture
+from memory_supabase import MemorySupabase
+from update_tables import CircuitBreaker, CircuitOpenError, fetchWithRetry
+
+LUCK = read_fixture('psx_pages', 'LUCK.html')
+HBL = read_fixture('psx_pages', 'HBL.html')
+STOCKS = [{'id': 1, 'symbol': 'LUCK', 'company_name': 'Lucky Cement', 'current_price': 0, 'last_updated': None},
+          {'id': 2, 'symbol': 'HBL', 'company_name': 'Habib Bank', 'current_price': 0, 'last_updated': None}]
+
+
+def psx_stocks(rows):
+    client = MemorySupabase()
+    client.table('psx_stocks').insert(rows).execute()
+    return client
+
+
+def fetch(symbol, breaker, retries=3):
+    return fetchWithRetry(symbol, requests.Session(), None, breaker, retries=retries)
+
+
+def refresh(monkeypatch, client, *argv):
+    monkeypatch.setattr(update_tables, 'supabase', client)
+    monkeypatch.setattr(sys, 'argv', ['update_tables.py', '--ignore-market-hours', '--no-history', '--rate', '0', *argv])
+    update_tables.main()
+
+
+def test_retries_through_transient_errors(psx_server):
+    psx_server.plan['/company/LUCK'] = [503, 429, (200, LUCK)]
+    breaker = CircuitBreaker(threshold=2)
+    assert fetch('LUCK', breaker) == 620.0
+    assert psx_server.hits['/company/LUCK'] == 3
+    assert breaker.failures == 0
+
+
+def test_failure_counted_once_per_symbol_after_retries(psx_server):
+    psx_server.plan['/company/LUCK'] = [503]
+    breaker = CircuitBreaker(threshold=5)
+    with pytest.raises(requests.HTTPError):
+        fetch('LUCK', breaker, retries=3)
+    assert psx_server.hits['/company/LUCK'] == 4
+    assert breaker.failures == 1
+    assert breaker.openedAt is None
+
+
+def test_breaker_opens_and_fails_fast(psx_server):
+    psx_server.plan['/company/LUCK'] = [500]
+    psx_server.plan['/company/HBL'] = [500]
+    breaker = CircuitBreaker(threshold=2, cooldown=3600)
+    for symbol in ('LUCK', 'HBL'):
+        with pytest.raises(requests.HTTPError):
+            fetch(symbol, breaker, retries=0)
+    with pytest.raises(CircuitOpenError):
+        fetch('MARI', breaker)
+    assert '/company/MARI' not in psx_server.hits
+
+
+def test_half_open_trial_closes_the_circuit(psx_server):
+    psx_server.plan['/company/HBL'] = [(200, HBL)]
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.failure()
+    assert breaker.openedAt is not None
+    assert fetch('HBL', breaker) == 145.3
+    assert breaker.openedAt is None and not breaker.trialInFlight
+
+
+def test_half_open_trial_released_on_unexpected_error(monkeypatch):
+    def broken(symbol, session=None, rateLimiter=None):
+        raise ValueError("unexpected page")
+    monkeypatch.setattr(update_tables, 'getTodayPsxPrice', broken)
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.failure()
+    with pytest.raises(ValueError):
+        fetch('LUCK', breaker)
+    assert not breaker.trialInFlight
+    # The next call gets its own trial instead of failing fast for the rest of the process
+    with pytest.raises(ValueError):
+        fetch('LUCK', breaker)
+
+
+def test_page_without_quote_is_not_retried(psx_server):
+    psx_server.plan['/company/GONE'] = [(200, read_fixture('psx_pages', 'DELISTED.html'))]
+    assert fetch('GONE', CircuitBreaker()) is None
+    assert psx_server.hits['/company/GONE'] == 1
+
+
+def test_checkpoint_round_trip_and_expiry(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    started = datetime.now(timezone.utc).isoformat()
+    update_tables.saveCheckpoint(path, started, {'LUCK': 620.0})
+    assert update_tables.loadCheckpoint(path, 6) == {'run_timestamp': started, 'prices': {'LUCK': 620.0}}
+
+    old = (datetime.now(timezone.utc) - timedelta(hours=7)).isoformat()
+    update_tables.saveCheckpoint(path, old, {'LUCK': 620.0})
+    assert update_tables.loadCheckpoint(path, 6) is None
+
+    update_tables.clearCheckpoint(path)
+    assert not os.path.exists(path)
+
+
+def test_run_resumes_from_checkpoint(psx_server, monkeypatch, tmp_path):
+    client = psx_stocks(STOCKS)
+    psx_server.plan['/company/LUCK'] = [(200, LUCK)]
+    psx_server.plan['/company/HBL'] = [(200, HBL)]
+
+    path = str(tmp_path / 'checkpoint.json')
+    interrupted = datetime.now(timezone.utc).isoformat()
+    update_tables.saveCheckpoint(path, interrupted, {'LUCK': 600.0})
+    refresh(monkeypatch, client, '--symbols', 'LUCK,HBL', '--checkpoint', path, '--concurrency', '2')
+
+    assert '/company/LUCK' not in psx_server.hits
+    assert psx_server.hits['/company/HBL'] == 1
+    rows = {row['symbol']: row for row in client.rows('psx_stocks')}
+    assert rows['LUCK']['current_price'] == 600.0
+    assert rows['HBL']['current_price'] == 145.3
+    # The resumed run keeps the interrupted run's timestamp
+    assert rows['LUCK']['last_updated'] == rows['HBL']['last_updated'] == interrupted
+    assert not os.path.exists(path)
+
+
+def test_checkpoint_kept_when_scrape_is_interrupted(psx_server, monkeypatch, tmp_path):
+    psx_server.plan['/company/LUCK'] = [(200, LUCK)]
+    psx_server.plan['/company/HBL'] = [(200, HBL)]
+    seen = []
+
+    def interrupt(*values):
+        seen.append(values)
+        if len(seen) == 1:
+            raise KeyboardInterrupt
+    monkeypatch.setattr('builtins.print', interrupt)
+
+    path = str(tmp_path / 'checkpoint.json')
+    with pytest.raises(KeyboardInterrupt):
+        refresh(monkeypatch, psx_stocks(STOCKS), '--checkpoint', path, '--concurrency', '1')
+    with open(path, encoding='utf-8') as f:
+        assert len(json.load(f)['prices']) == 1
+
+
+def test_stock_lists_are_read_past_the_row_cap(monkeypatch):
+    listed = [{'id': i, 'symbol': f"S{i}", 'company_name': f"Company {i}", 'last_updated': None} for i in range(1, 1201)]
+    client = psx_stocks(listed)
+    client.table('stocks').insert([{'user_id': 'u1', 'symbol': f"s{i}", 'total_shares': 10} for i in range(1, 1201)]).execute()
+    monkeypatch.setattr(update_tables, 'supabase', client)
+    assert len(update_tables.heldSymbols()) == 1200
+    args = update_tables.parseArgs(['--ignore-market-hours'])
+    stocks, total = update_tables.loadStocks(args)
+    assert total == len(stocks) == 1200
+
+
+def test_cache_not_appended_when_history_write_fails(psx_server, monkeypatch, tmp_path):
+    psx_server.plan['/company/LUCK'] = [(200, LUCK)]
+    appended = []
+
+    class Cache:
+        def append(self, rows):
+            appended.extend(rows)
+    monkeypatch.setattr(update_tables, 'appendHistory', lambda client, rows, chunkSize: (0, ['insert failed']))
+    monkeypatch.setattr(update_tables, 'PriceHistoryCache', Cache)
+    args = update_tables.parseArgs(['--symbols', 'LUCK', '--ignore-market-hours', '--no-checkpoint', '--rate', '0'])
+    monkeypatch.setattr(update_tables, 'supabase', psx_stocks(STOCKS))
+    update_tables.run(args)
+    assert appended == []
@@ -0,0 +1,108 @@
+"""
+Columnar view over a set of transactions for vectorized aggregation.
+
+Rows are loaded once into NumPy arrays (amount, date ordinal, type code and
+category code); totals and per-category breakdowns are then bincount/mask
+operations instead of Python loops over lists of dicts. Rows can be fed one
+at a time from a stream, and only the raw rows for `keep_day` are retained.
+A row may also stand for several transactions (a daily rollup) by carrying
+`txn_count`; counts then come from that column rather than the row count.
+"""
+
+from array import array
+from datetime import date
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+
+import numpy as np
+
+INCOME = 0
+EXPENSE = 1
+TYPE_CODES = {'income': INCOME, 'expense': EXPENSE}
+
+
+class TransactionFrameBuilder:
+    """Accumulates streamed rows into compact typed buffers"""
+
+    def __init__(self, keep_day: Optional[date] = None):
+        self.keep_day = keep_day.isoformat() if keep_day else None
+        self.kept_rows: List[Dict[str, Any]] = []
+        self.amount = array('d')
+        self.day = array('i')
+        self.type = array('b')
+        self.category = array('i')
+        self.count = array('i')
+        self.categories: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self._ordinals: Dict[str, int] = {}
+
+    def add(self, row: Dict[str, Any]) -> None:
+        raw_date = row['date']
+        ordinal = self._ordinals.get(raw_date)
+        if ordinal is None:
+            ordinal = self._ordinals[raw_date] = date.fromisoformat(raw_date).toordinal()
+        code = self._category_codes.get(row['category'])
+        if code is None:
+            code = self._category_codes[row['category']] = len(self.categories)
+            self.categories.append(row['category'])
+        self.amount.append(float(row['amount']))
+        self.day.append(ordinal)
+        self.type.append(TYPE_CODES.get(row['type'], INCOME))
+        self.category.append(code)
+        self.count.append(int(row.get('txn_count', 1)))
+        if raw_date == self.keep_day:
+            self.kept_rows.append(row)
+
+    def build(self) -> 'TransactionFrame':
+        return TransactionFrame(
+            np.array(self.amount, dtype=np.float64),
+            np.array(self.day, dtype=np.int32),
+            np.array(self.type, dtype=np.int8),
+            np.array(self.category, dtype=np.int32),
+            self.categories,
+            self.kept_rows,
+            np.array(self.count, dtype=np.int32),
+        )
+
+
+class TransactionFrame:
+    def __init__(self, amount: np.ndarray, day: np.ndarray, type: np.ndarray, category: np.ndarray,
+                 categories: List[str], kept_rows: List[Dict[str, Any]], count: Optional[np.ndarray] = None):
+        self.amount = amount
+        self.day = day
+        self.type = type
+        self.category = category
+        self.categories = categories
+        self.kept_rows = kept_rows
+        self.count = count if count is not None else np.ones(len(amount), dtype=np.int32)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]] = (), keep_day: Optional[date] = None) -> 'TransactionFrame':
+        builder = TransactionFrameBuilder(keep_day)
+        for row in rows:
+            builder.add(row)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def _mask(self, on: Optional[date] = None, since: Optional[date] = None) -> np.ndarray:
+        mask = np.ones(len(self.amount), dtype=bool)
+        if on is not None:
+            mask &= self.day == on.toordinal()
+        if since is not None:
+            mask &= self.day >= since.toordinal()
+        return mask
+
+    def totals(self, on: Optional[date] = None, since: Optional[date] = None) -> Tuple[float, float, int]:
+        """(income, expenses, transaction count), optionally limited to one day or a start date"""
+        mask = self._mask(on, since)
+        income = float(self.amount[mask & (self.type == INCOME)].sum())
+        expenses = float(self.amount[mask & (self.type == EXPENSE)].sum())
+        return income, expenses, int(self.count[mask].sum())
+
+    def by_category(self, type_code: int, on: Optional[date] = None, since: Optional[date] = None) -> Dict[str, float]:
+        """{category: total} for one transaction type; categories with no rows are left out"""
+        mask = self._mask(on, since) & (self.type == type_code)
+        sums = np.bincount(self.category[mask], weights=self.amount[mask], minlength=len(self.categories))
+        present = np.bincount(self.category[mask], minlength=len(self.categories)) > 0
+        return {self.categories[code]: float(sums[code]) for code in np.flatnonzero(present)}
@@ -0,0 +1,227 @@
+"""
+Materialized daily transaction rollups.
+
+`transaction_daily_rollups` keeps one row per (user_id, date, type, category)
+with that day's total and transaction count, so month, today and budget
+figures read at most one row per category per day instead of every
+transaction.
+
+`refresh` is incremental: it finds the (user, day) pairs touched since the
+last run — new rows past the created_at watermark, plus days queued by the
+update/delete trigger — and recomputes only those days from the raw table.
+`rebuild` recomputes everything and `check` compares the rollups against a
+fresh aggregation of the raw rows.
+
+Usage:
+    python transaction_rollups.py refresh
+    python transaction_rollups.py rebuild [--user-id UUID]
+    python transaction_rollups.py check [--user-id UUID] [--since YYYY-MM-DD]
+"""
+
+import sys
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from supabase_stream import stream_rows
+from sync_state import WATERMARK_OVERLAP
+
+ROLLUP_TABLE = 'transaction_daily_rollups'
+WATERMARK_NAME = 'transaction_daily_rollups'
+
+# Rollups read back in the shape TransactionFrameBuilder expects
+ROLLUP_FRAME_COLUMNS = 'id,date,type,category,amount:total_amount,txn_count'
+
+RollupKey = Tuple[str, str, str, str]
+
+
+def aggregate(rows: Iterable[Dict[str, Any]]) -> Dict[RollupKey, List[float]]:
+    """{(user_id, date, type, category): [total, count]} over raw transaction rows"""
+    totals: Dict[RollupKey, List[float]] = {}
+    for row in rows:
+        key = (row['user_id'], row['date'], row['type'], row['category'])
+        entry = totals.get(key)
+        if entry is None:
+            entry = totals[key] = [0.0, 0]
+        entry[0] += float(row['amount'])
+        entry[1] += 1
+    return totals
+
+
+class TransactionRollups:
+    def __init__(self, client: Any, chunk_size: int = 500):
+        self.client = client
+        self.chunk_size = chunk_size
+
+    def read_watermark(self) -> Optional[datetime]:
+        response = self.client.table('rollup_watermarks').select('watermark').eq('name', WATERMARK_NAME).execute()
+        return datetime.fromisoformat(response.data[0]['watermark']) if response.data else None
+
+    def _write_watermark(self, watermark: datetime) -> None:
+        self.client.table('rollup_watermarks').upsert({
+            'name': WATERMARK_NAME,
+            'watermark': watermark.isoformat(),
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }, on_conflict='name').execute()
+
+    def _latest_created_at(self) -> Optional[datetime]:
+        response = self.client.table('transactions').select('created_at').order(
+            'created_at', desc=True
+        ).limit(1).execute()
+        return datetime.fromisoformat(response.data[0]['created_at']) if response.data else None
+
+    def _store(self, totals: Dict[RollupKey, List[float]], existing: Dict[RollupKey, int]) -> Tuple[int, int]:
+        """Upsert `totals`, then drop rollup rows in `existing` that no longer have transactions.
+
+        New values land before stale rows go, so a concurrent reader never sees
+        a day with its rollups missing. Returns (rows written, rows deleted).
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [{
+            'user_id': user_id, 'date': day, 'type': type_, 'category': category,
+            'total_amount': round(total, 2), 'txn_count': count, 'updated_at': now,
+        } for (user_id, day, type_, category), (total, count) in totals.items()]
+        for start in range(0, len(rows), self.chunk_size):
+            self.client.table(ROLLUP_TABLE).upsert(
+                rows[start:start + self.chunk_size], on_conflict='user_id,date,type,category'
+            ).execute()
+
+        stale = [row_id for key, row_id in existing.items() if key not in totals]
+        for start in range(0, len(stale), self.chunk_size):
+            self.client.table(ROLLUP_TABLE).delete().in_('id', stale[start:start + self.chunk_size]).execute()
+        return len(rows), len(stale)
+
+    def _existing(self, build_query) -> Dict[RollupKey, int]:
+        return {
+            (row['user_id'], row['date'], row['type'], row['category']): row['id']
+            for row in stream_rows(build_query, keys=('id',))
+        }
+
+    def _replace_days(self, days: Dict[str, Set[str]]) -> Tuple[int, int]:
+        """Recompute the rollups of every (user, day) pair in `days` from the raw table"""
+        written = deleted = 0
+        for user_id, user_days in days.items():
+            ordered = sorted(user_days)
+            for start in range(0, len(ordered), self.chunk_size):
+                chunk = ordered[start:start + self.chunk_size]
+                totals = aggregate(stream_rows(lambda: self.client.table('transactions').select(
+                    'id,user_id,date,type,category,amount'
+                ).eq('user_id', user_id).in_('date', chunk), keys=('date', 'id')))
+                existing = self._existing(lambda: self.client.table(ROLLUP_TABLE).select(
+                    'id,user_id,date,type,category'
+                ).eq('user_id', user_id).in_('date', chunk))
+                w, d = self._store(totals, existing)
+                written += w
+                deleted += d
+        return written, deleted
+
+    def refresh(self) -> Dict[str, Any]:
+        """Bring the rollups up to date with everything inserted, updated or deleted since the last run"""
+        watermark = self.read_watermark()
+        if watermark is None:
+            return self.rebuild()
+
+        days: Dict[str, Set[str]] = {}
+        newest = watermark
+        # Days are recomputed from scratch, so rows seen again inside the overlap are harmless
+        since = (watermark - WATERMARK_OVERLAP).isoformat()
+        for row in stream_rows(lambda: self.client.table('transactions').select(
+            'id,user_id,date,created_at'
+        ).gte('created_at', since), keys=('created_at', 'id')):
+            days.setdefault(row['user_id'], set()).add(row['date'])
+            newest = max(newest, datetime.fromisoformat(row['created_at']))
+
+        dirty = list(stream_rows(lambda: self.client.table('transaction_rollup_dirty_days').select('id,user_id,date')))
+        for row in dirty:
+            days.setdefault(row['user_id'], set()).add(row['date'])
+
+        written, deleted = self._replace_days(days)
+        self._write_watermark(newest)
+        if dirty:
+            self.client.table('transaction_rollup_dirty_days').delete().lte('id', max(row['id'] for row in dirty)).execute()
+        return {
+            'mode': 'refresh',
+            'days': sum(len(d) for d in days.values()),
+            'written': written,
+            'deleted': deleted,
+            'watermark': newest.isoformat(),
+        }
+
+    def rebuild(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Recompute every rollup (or one user's) from the raw table"""
+        # Read the mark before scanning: rows landing mid-rebuild are caught by the next refresh
+        latest = self._latest_created_at() if user_id is None else None
+
+        def raw_query():
+            query = self.client.table('transactions').select('id,user_id,date,type,category,amount')
+            return query.eq('user_id', user_id) if user_id else query
+
+        def rollup_query():
+            query = self.client.table(ROLLUP_TABLE).select('id,user_id,date,type,category')
+            return query.eq('user_id', user_id) if user_id else query
+
+        totals = aggregate(stream_rows(raw_query, keys=('date', 'id')))
+        written, deleted = self._store(totals, self._existing(rollup_query))
+        if user_id is None:
+            self.client.table('transaction_rollup_dirty_days').delete().gte('id', 0).execute()
+            self._write_watermark(latest or datetime.now(timezone.utc))
+        return {'mode': 'rebuild', 'written': written, 'deleted': deleted}
+
+    def check(self, user_id: Optional[str] = None, since: Optional[str] = None,
+              tolerance: float = 0.005) -> List[Dict[str, Any]]:
+        """Rollup rows that disagree with the raw table; an empty list means consistent"""
+        def scoped(query):
+            if user_id:
+                query = query.eq('user_id', user_id)
+            return query.gte('date', since) if since else query
+
+        expected = aggregate(stream_rows(
+            lambda: scoped(self.client.table('transactions').select('id,user_id,date,type,category,amount')),
+            keys=('date', 'id'),
+        ))
+        actual: Dict[RollupKey, List[float]] = {
+            (row['user_id'], row['date'], row['type'], row['category']): [float(row['total_amount']), int(row['txn_count'])]
+            for row in stream_rows(
+                lambda: scoped(self.client.table(ROLLUP_TABLE).select('id,user_id,date,type,category,total_amount,txn_count')),
+                keys=('date', 'id'),
+            )
+        }
+
+        mismatches = []
+        for key in sorted(set(expected) | set(actual)):
+            want = expected.get(key, [0.0, 0])
+            have = actual.get(key, [0.0, 0])
+            if abs(want[0] - have[0]) > tolerance or want[1] != have[1]:
+                user, day, type_, category = key
+                mismatches.append({
+                    'user_id': user, 'date': day, 'type': type_, 'category': category,
+                    'expected_total': round(want[0], 2), 'expected_count': want[1],
+                    'rollup_total': round(have[0], 2), 'rollup_count': have[1],
+                })
+        return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the daily transaction rollups")
+    parser.add_argument("command", choices=("refresh", "rebuild", "check"))
+    parser.add_argument("--user-id", help="limit rebuild/check to one user")
+    parser.add_argument("--since", help="check only days on or after this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    from daily_financial_summary import supabase
+    rollups = TransactionRollups(supabase)
+    if args.command == "check":
+        mismatches = rollups.check(args.user_id, args.since)
+        for m in mismatches:
+            print(f"❌ {m['user_id']} {m['date']} {m['type']}/{m['category']}: "
+                  f"raw {m['expected_total']:,.2f} x{m['expected_count']} vs rollup {m['rollup_total']:,.2f} x{m['rollup_count']}")
+        print(f"{'❌' if mismatches else '✅'} {len(mismatches)} mismatched rollup rows")
+        return 1 if mismatches else 0
+
+    result = rollups.refresh() if args.command == "refresh" else rollups.rebuild(args.user_id)
+    print(", ".join(f"{key}={value}" for key, value in result.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
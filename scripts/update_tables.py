@@ -1,35 +1,423 @@
 import os
-import requests
-from bs4 import BeautifulSoup
-from supabase import create_client
-from datetime import datetime, time, timezone
-from dotenv import load_dotenv
-
-load_dotenv()
-
-supabaseUrl=os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
-supabaseKey=os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-
-supabase=create_client(supabaseUrl,supabaseKey)
-
-def getTodayPsxPrice(symbol):
-    url=f"https://dps.psx.com.pk/company/{symbol}"
-    headers={"User-Agent":"Mozilla/5.0"}
-    res=requests.get(url,headers=headers,timeout=10)
-    soup=BeautifulSoup(res.text,"html.parser")
-    priceTag=soup.select_one("div.quote__close")
-    if not priceTag:
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone, timedelta
+from supabase_client import LazyClient, load_env
+from psx_quotes import QUOTE_CLOSE_MARKER, SCAN_OVERLAP, extractPriceFast, extractPriceSoup, parseMarketWatch
+from psx_calendar import loadHolidays, isMarketOpen, lastClose, nowPk
+from price_history import PriceHistoryCache, appendHistory
+from supabase_stream import stream_rows
+from profiling import PROFILER, add_profile_arguments, start_from_args, finish_from_args
+
+# Built on first query; requests and bs4 are likewise imported only on the paths that use them
+supabase=LazyClient()
+
+PSX_BASE_URL=os.environ.get("PSX_BASE_URL","https://dps.psx.com.pk")
+MARKET_WATCH_PATH="/market-watch"
+HEADERS={"User-Agent":"Mozilla/5.0"}
+CHECKPOINT_PATH=os.path.join(os.path.dirname(os.path.abspath(__file__)),".update_tables.checkpoint.json")
+RETRYABLE_STATUS={429,500,502,503,504}
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """Stops calling the PSX site after `threshold` consecutive failures.
+
+    While open every call fails fast; after `cooldown` seconds a single trial
+    request is let through and its outcome closes or re-opens the circuit.
+    A failure is one fetch that still failed after its retries, not one attempt.
+    """
+    def __init__(self,threshold=5,cooldown=60.0):
+        self.threshold=threshold
+        self.cooldown=cooldown
+        self.lock=threading.Lock()
+        self.failures=0
+        self.openedAt=None
+        self.trialInFlight=False
+
+    def before(self):
+        """Raise while open; returns True when this call is the half-open trial."""
+        with self.lock:
+            if self.openedAt is None:
+                return False
+            if time.monotonic()-self.openedAt<self.cooldown or self.trialInFlight:
+                raise CircuitOpenError("circuit open: PSX site is failing, not sending request")
+            self.trialInFlight=True
+            return True
+
+    def release(self):
+        """End a trial that finished without success() or failure(), so the next one can start."""
+        with self.lock:
+            self.trialInFlight=False
+
+    def success(self):
+        with self.lock:
+            self.failures=0
+            self.openedAt=None
+            self.trialInFlight=False
+
+    def failure(self):
+        with self.lock:
+            self.failures+=1
+            if self.trialInFlight or self.failures>=self.threshold:
+                self.openedAt=time.monotonic()
+            self.trialInFlight=False
+
+class HostRateLimiter:
+    """Hands out request start slots per host so concurrent workers never exceed `perSecond`."""
+    def __init__(self,perSecond):
+        self.interval=1.0/perSecond if perSecond and perSecond>0 else 0.0
+        self.lock=threading.Lock()
+        self.nextSlot={}
+
+    def wait(self,url):
+        if not self.interval:
+            return
+        host=urlparse(url).netloc
+        with self.lock:
+            now=time.monotonic()
+            slot=max(now,self.nextSlot.get(host,now))
+            self.nextSlot[host]=slot+self.interval
+        if slot>now:
+            time.sleep(slot-now)
+
+def makeSession(poolSize):
+    """One keep-alive session shared by every worker, sized so no worker waits on a connection."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    session=requests.Session()
+    session.headers.update(HEADERS)
+    adapter=HTTPAdapter(pool_connections=1,pool_maxsize=max(poolSize,1))
+    session.mount("https://",adapter)
+    session.mount("http://",adapter)
+    return session
+
+def getTodayPsxPrice(symbol,session=None,rateLimiter=None):
+    import requests
+    url=f"{PSX_BASE_URL}/company/{symbol}"
+    if rateLimiter:
+        rateLimiter.wait(url)
+    with PROFILER.timed("http",urlparse(url).netloc) as fetch:
+        res=(session or requests).get(url,headers=HEADERS,timeout=10,stream=True)
+        with res:
+            fetch["status"]=res.status_code
+            if res.status_code in RETRYABLE_STATUS:
+                raise requests.HTTPError(f"{res.status_code} from {url}",response=res)
+            body=bytearray()
+            scanTime=0.0
+            price=None
+            for chunk in res.iter_content(16384):
+                scanFrom=max(len(body)-SCAN_OVERLAP,0)
+                body+=chunk
+                started=time.perf_counter()
+                price=extractPriceFast(body,scanFrom)
+                scanTime+=time.perf_counter()-started
+                if price is not None:
+                    # Drain without parsing so the connection goes back to the pool
+                    fetch["bytes"]=len(body)+sum(len(rest) for rest in res.iter_content(65536))
+                    break
+            else:
+                fetch["bytes"]=len(body)
+    PROFILER.record("parse","fast scan",scanTime)
+    if price is not None or QUOTE_CLOSE_MARKER not in body:
+        return price
+    with PROFILER.timed("parse","BeautifulSoup fallback"):
+        return extractPriceSoup(body.decode(res.encoding or "utf-8","replace"))
+
+def loadMarketWatch(path=None,session=None):
+    """Read the market-watch page from a saved file, or download it once."""
+    if path:
+        with open(path,encoding="utf-8") as f:
+            return f.read()
+    import requests
+    with PROFILER.timed("http",urlparse(PSX_BASE_URL).netloc) as fetch:
+        res=(session or requests).get(f"{PSX_BASE_URL}{MARKET_WATCH_PATH}",headers=HEADERS,timeout=30)
+        res.raise_for_status()
+        fetch["bytes"]=len(res.content)
+    return res.text
+
+def marketWatchPrices(stocks,summary,path=None,session=None):
+    """Price every stock from a single market-watch download instead of one page per symbol."""
+    started=time.perf_counter()
+    try:
+        html=loadMarketWatch(path,session)
+        with PROFILER.timed("parse","market watch"):
+            prices=parseMarketWatch(html)
+        for stock in stocks:
+            price=prices.get(stock["symbol"].upper())
+            if price is None:
+                summary["skipped"]+=1
+                continue
+            summary["fetched"]+=1
+            yield stock,price
+    finally:
+        summary["wall_time"]=time.perf_counter()-started
+
+def fetchWithRetry(symbol,session,rateLimiter,breaker,retries=3,backoff=0.5,maxBackoff=30.0):
+    """getTodayPsxPrice with exponential backoff and full jitter on network/5xx/429 errors.
+
+    A page that loads but has no parseable price returns None straight away;
+    retrying wouldn't change it.
+    """
+    import requests
+    trial=False
+    try:
+        for attempt in range(retries+1):
+            # Retries stop early once other workers have opened the circuit
+            if not trial:
+                trial=breaker.before()
+            try:
+                price=getTodayPsxPrice(symbol,session,rateLimiter)
+            except requests.RequestException:
+                if attempt==retries:
+                    breaker.failure()
+                    raise
+                time.sleep(random.uniform(0,min(maxBackoff,backoff*2**attempt)))
+                continue
+            breaker.success()
+            return price
+    finally:
+        if trial:
+            breaker.release()
+
+def loadCheckpoint(path,maxAgeHours):
+    """Prices already scraped by an interrupted run, if its checkpoint is recent enough."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path,encoding="utf-8") as f:
+            checkpoint=json.load(f)
+        started=datetime.fromisoformat(checkpoint["run_timestamp"])
+    except (ValueError,KeyError,OSError):
         return None
-    return float(priceTag.text.replace(",","").replace("Rs.","").strip())
-
-stocks=supabase.table("psx_stocks").select("id,symbol").execute().data
-
-for stock in stocks:
-    price=getTodayPsxPrice(stock["symbol"])
-    if price is None:
-        continue
-    supabase.table("psx_stocks").update({
-        "current_price":price,
-        "last_updated":datetime.now(timezone.utc).isoformat()
-    }).eq("id",stock["id"]).execute()
-    print(stock["symbol"],price)
+    if datetime.now(timezone.utc)-started>timedelta(hours=maxAgeHours):
+        return None
+    return checkpoint
+
+def saveCheckpoint(path,runTimestamp,prices):
+    tmpPath=path+".tmp"
+    with open(tmpPath,"w",encoding="utf-8") as f:
+        json.dump({"run_timestamp":runTimestamp,"prices":prices},f)
+    os.replace(tmpPath,path)
+
+def clearCheckpoint(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def newSummary():
+    return {"fetched":0,"failed":0,"skipped":0,"not_due":0,"errors":{},"written":0,"write_errors":[],"history":0,"wall_time":0.0}
+
+def refreshPrices(stocks,summary,concurrency=8,ratePerSecond=5.0,retries=3,breaker=None,session=None):
+    """Scrape every stock's price with a bounded worker pool.
+
+    Yields (stock, price) as results arrive and tallies fetched/failed/skipped
+    counts and wall time into `summary`. A caller-supplied `session` is reused
+    and left open; otherwise one is made for this run and closed after it.
+    """
+    ownSession=session is None
+    session=session or makeSession(concurrency)
+    rateLimiter=HostRateLimiter(ratePerSecond)
+    breaker=breaker or CircuitBreaker()
+    started=time.perf_counter()
+    pool=ThreadPoolExecutor(max_workers=max(concurrency,1))
+    try:
+        futures={pool.submit(fetchWithRetry,stock["symbol"],session,rateLimiter,breaker,retries):stock for stock in stocks}
+        for future in as_completed(futures):
+            stock=futures[future]
+            try:
+                price=future.result()
+            except Exception as e:
+                summary["failed"]+=1
+                summary["errors"][stock["symbol"]]=str(e)
+                continue
+            if price is None:
+                summary["skipped"]+=1
+                continue
+            summary["fetched"]+=1
+            yield stock,price
+    finally:
+        # An interrupted run shouldn't keep scraping the symbols still queued
+        pool.shutdown(wait=True,cancel_futures=True)
+        if ownSession:
+            session.close()
+        summary["wall_time"]=time.perf_counter()-started
+
+def upsertPrices(rows,summary,chunkSize=500):
+    """Write refreshed rows back in chunked upserts keyed on `id`.
+
+    A chunk that fails is recorded in `summary` and the remaining chunks are
+    still written, so one bad batch never loses the rest of the run.
+    """
+    for start in range(0,len(rows),chunkSize):
+        chunk=rows[start:start+chunkSize]
+        try:
+            supabase.table("psx_stocks").upsert(chunk,on_conflict="id").execute()
+            summary["written"]+=len(chunk)
+        except Exception as e:
+            summary["write_errors"].append({
+                "symbols":[row["symbol"] for row in chunk],
+                "error":str(e)
+            })
+
+def heldSymbols():
+    # Paged so the server's max-rows cap can't silently drop holders
+    rows=stream_rows(lambda:supabase.table("stocks").select("id,symbol").gt("total_shares",0))
+    return {row["symbol"].upper() for row in rows}
+
+def selectDueStocks(stocks,held,staleMinutes=0,holdingsOnly=False,marketHours=True,holidays=frozenset(),now=None):
+    """Pick the rows worth scraping this run, held symbols first.
+
+    A row is skipped when it was refreshed within `staleMinutes`, or (outside
+    trading hours) when it was already refreshed after the last session close,
+    since the price can't have moved since then.
+    """
+    now=now or nowPk()
+    freshAfter=now-timedelta(minutes=staleMinutes) if staleMinutes>0 else None
+    if marketHours and not isMarketOpen(now,holidays):
+        close=lastClose(now,holidays)
+        if close and (freshAfter is None or close>freshAfter):
+            freshAfter=close
+    due=[]
+    for stock in stocks:
+        isHeld=stock["symbol"].upper() in held
+        if holdingsOnly and not isHeld:
+            continue
+        updated=stock.get("last_updated")
+        if freshAfter and updated and datetime.fromisoformat(updated)>=freshAfter:
+            continue
+        due.append((not isHeld,stock["symbol"],stock))
+    due.sort(key=lambda item:item[:2])
+    return [stock for _,_,stock in due]
+
+def printSummary(summary,total):
+    print(f"\nRefreshed {total} symbols in {summary['wall_time']:.2f}s")
+    print(f"  fetched: {summary['fetched']}  failed: {summary['failed']}  skipped: {summary['skipped']}  not due: {summary['not_due']}")
+    print(f"  written: {summary['written']}  failed chunks: {len(summary['write_errors'])}  history snapshots: {summary['history']}")
+    for symbol,error in sorted(summary["errors"].items()):
+        print(f"  ! {symbol}: {error}")
+    for failure in summary["write_errors"]:
+        print(f"  ! write failed for {len(failure['symbols'])} symbols ({failure['symbols'][0]}...): {failure['error']}")
+
+def parseArgs(argv=None):
+    parser=argparse.ArgumentParser(description="Refresh psx_stocks.current_price from the PSX data portal")
+    parser.add_argument("--concurrency",type=int,default=8,help="parallel fetch workers (1 = sequential)")
+    parser.add_argument("--rate",type=float,default=5.0,help="max requests per second per host (0 = unlimited)")
+    parser.add_argument("--retries",type=int,default=3,help="retries per symbol on network/5xx/429 errors")
+    parser.add_argument("--breaker-threshold",type=int,default=5,help="consecutive symbols failing all retries before pausing requests")
+    parser.add_argument("--breaker-cooldown",type=float,default=60.0,help="seconds to pause once the breaker opens")
+    parser.add_argument("--checkpoint",default=CHECKPOINT_PATH,help="where to record progress so an interrupted run can resume")
+    parser.add_argument("--no-checkpoint",action="store_true",help="don't read or write a checkpoint")
+    parser.add_argument("--checkpoint-max-age",type=float,default=6.0,help="hours after which a leftover checkpoint is ignored")
+    parser.add_argument("--chunk-size",type=int,default=500,help="rows per upsert round-trip")
+    parser.add_argument("--source",choices=["company","market-watch"],default="company",
+                        help="scrape each company page, or take every close from one market-watch page")
+    parser.add_argument("--market-watch-file",help="parse a saved market-watch page instead of downloading it")
+    parser.add_argument("--symbols",help="comma-separated symbols to refresh instead of the whole table")
+    parser.add_argument("--stale-minutes",type=float,default=0,help="skip rows refreshed within this many minutes")
+    parser.add_argument("--holdings-only",action="store_true",help="only refresh symbols someone holds in `stocks`")
+    parser.add_argument("--ignore-market-hours",action="store_true",help="scrape even when PSX is closed")
+    parser.add_argument("--holidays-file",help="extra PSX closure dates (YYYY-MM-DD, one per line)")
+    parser.add_argument("--no-history",action="store_true",help="don't append snapshots to psx_price_history")
+    parser.add_argument("--dry-run",action="store_true",help="print the prices without writing to Supabase")
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
+
+def main():
+    global supabase,PSX_BASE_URL
+    load_env()
+    PSX_BASE_URL=os.environ.get("PSX_BASE_URL",PSX_BASE_URL)
+    args=parseArgs()
+    if start_from_args(args):
+        supabase=PROFILER.wrap_client(supabase)
+    try:
+        run(args)
+    finally:
+        finish_from_args(args)
+
+def loadStocks(args):
+    """(stocks due for a refresh, number of candidate rows) for this run's options."""
+    symbols=[s.strip().upper() for s in args.symbols.split(",")] if args.symbols else None
+    if symbols and args.dry_run:
+        # Nothing gets written, so an offline check (e.g. against a saved fixture) needs no database
+        stocks=[{"id":None,"symbol":symbol,"company_name":None} for symbol in symbols]
+    elif symbols:
+        stocks=list(stream_rows(lambda:supabase.table("psx_stocks").select("id,symbol,company_name,last_updated").in_("symbol",symbols)))
+    else:
+        stocks=list(stream_rows(lambda:supabase.table("psx_stocks").select("id,symbol,company_name,last_updated")))
+    total=len(stocks)
+    if not (symbols and args.dry_run):
+        stocks=selectDueStocks(
+            stocks,
+            heldSymbols(),
+            staleMinutes=args.stale_minutes,
+            holdingsOnly=args.holdings_only,
+            marketHours=not args.ignore_market_hours,
+            holidays=loadHolidays(args.holidays_file)
+        )
+    return stocks,total
+
+def run(args,session=None):
+    with PROFILER.span("load"):
+        stocks,total=loadStocks(args)
+    summary=newSummary()
+    summary["not_due"]=total-len(stocks)
+    # One timestamp for the whole run so every refreshed row agrees on when it was priced
+    runTimestamp=datetime.now(timezone.utc).isoformat()
+
+    checkpointPath=None if args.no_checkpoint or args.dry_run else args.checkpoint
+    checkpoint=loadCheckpoint(checkpointPath,args.checkpoint_max_age)
+    scraped={}
+    if checkpoint:
+        runTimestamp=checkpoint["run_timestamp"]
+        scraped=checkpoint["prices"]
+        print(f"Resuming run from {runTimestamp}: {len(scraped)} symbols already scraped")
+    remaining=[stock for stock in stocks if stock["symbol"] not in scraped]
+
+    if args.source=="market-watch" or args.market_watch_file:
+        prices=marketWatchPrices(remaining,summary,args.market_watch_file,session)
+    else:
+        breaker=CircuitBreaker(args.breaker_threshold,args.breaker_cooldown)
+        prices=refreshPrices(remaining,summary,args.concurrency,args.rate,args.retries,breaker,session)
+
+    with PROFILER.span("scrape"):
+        try:
+            for stock,price in prices:
+                scraped[stock["symbol"]]=price
+                print(stock["symbol"],price)
+                if checkpointPath and len(scraped)%25==0:
+                    saveCheckpoint(checkpointPath,runTimestamp,scraped)
+        finally:
+            if checkpointPath:
+                saveCheckpoint(checkpointPath,runTimestamp,scraped)
+
+    # company_name rides along because upsert must satisfy its NOT NULL constraint
+    rows=[{
+        "id":stock["id"],
+        "symbol":stock["symbol"],
+        "company_name":stock["company_name"],
+        "current_price":scraped[stock["symbol"]],
+        "last_updated":runTimestamp
+    } for stock in stocks if stock["symbol"] in scraped]
+
+    if not args.dry_run:
+        with PROFILER.span("write"):
+            upsertPrices(rows,summary,args.chunk_size)
+            if not args.no_history:
+                history=[{"symbol":row["symbol"],"price":row["current_price"],"captured_at":runTimestamp} for row in rows]
+                summary["history"],historyErrors=appendHistory(supabase,history,args.chunk_size)
+                summary["write_errors"]+=[{"symbols":["psx_price_history"],"error":error} for error in historyErrors]
+                # The cache only mirrors the table; after a failed chunk the next sync fills it from what landed
+                if not historyErrors:
+                    PriceHistoryCache().append(history)
+        if not summary["write_errors"]:
+            clearCheckpoint(checkpointPath)
+    printSummary(summary,total)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,21 @@
+-- Append-only intraday price snapshots written by scripts/update_tables.py
+CREATE TABLE IF NOT EXISTS psx_price_history (
+  id BIGSERIAL PRIMARY KEY,
+  symbol TEXT NOT NULL REFERENCES psx_stocks(symbol) ON DELETE CASCADE,
+  price DECIMAL(10, 2) NOT NULL,
+  captured_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  UNIQUE(symbol, captured_at)
+);
+
+-- (symbol, captured_at) is covered by the unique index; this one serves
+-- "every symbol at time X" queries
+CREATE INDEX IF NOT EXISTS idx_psx_price_history_captured_at ON psx_price_history(captured_at DESC);
+
+-- Enable RLS
+ALTER TABLE psx_price_history ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Service role can manage all psx price history" ON psx_price_history;
+CREATE POLICY "Service role can manage all psx price history"
+  ON psx_price_history FOR ALL USING (true) WITH CHECK (true);
+
+COMMENT ON TABLE psx_price_history IS 'One row per symbol per price refresh; psx_stocks.current_price only keeps the latest';
@@ -0,0 +1,4 @@
+-- Per-user delivery time for the daily summary, read by scripts/scheduler.py
+ALTER TABLE users ADD COLUMN IF NOT EXISTS summary_time TIME;
+
+COMMENT ON COLUMN users.summary_time IS 'Asia/Karachi time to send the daily summary; NULL = no scheduled summary';
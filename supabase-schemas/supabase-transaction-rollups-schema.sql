@@ -0,0 +1,64 @@
+-- Daily per-category transaction rollups maintained by scripts/transaction_rollups.py
+CREATE TABLE IF NOT EXISTS transaction_daily_rollups (
+  id BIGSERIAL PRIMARY KEY,
+  user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  date DATE NOT NULL,
+  type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+  category TEXT NOT NULL,
+  total_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+  txn_count INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  UNIQUE(user_id, date, type, category)
+);
+
+-- (user_id, date, ...) is covered by the unique index, which serves month range reads
+
+-- High-water marks for incremental jobs, one row per job
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+  name TEXT PRIMARY KEY,
+  watermark TIMESTAMP WITH TIME ZONE NOT NULL,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Days whose rollups went stale through an update or delete; inserts are found
+-- through the created_at watermark instead
+CREATE TABLE IF NOT EXISTS transaction_rollup_dirty_days (
+  id BIGSERIAL PRIMARY KEY,
+  user_id UUID NOT NULL,
+  date DATE NOT NULL,
+  queued_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- The refresher scans new transactions by created_at
+CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions(created_at);
+
+CREATE OR REPLACE FUNCTION queue_transaction_rollup_day()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO transaction_rollup_dirty_days (user_id, date) VALUES (OLD.user_id, OLD.date);
+  IF TG_OP = 'UPDATE' AND (NEW.user_id, NEW.date) IS DISTINCT FROM (OLD.user_id, OLD.date) THEN
+    INSERT INTO transaction_rollup_dirty_days (user_id, date) VALUES (NEW.user_id, NEW.date);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_queue_rollup_day
+  AFTER UPDATE OR DELETE ON transactions
+  FOR EACH ROW EXECUTE FUNCTION queue_transaction_rollup_day();
+
+-- Enable RLS
+ALTER TABLE transaction_daily_rollups ENABLE ROW LEVEL SECURITY;
+ALTER TABLE rollup_watermarks ENABLE ROW LEVEL SECURITY;
+ALTER TABLE transaction_rollup_dirty_days ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role can manage all transaction rollups"
+  ON transaction_daily_rollups FOR ALL USING (true) WITH CHECK (true);
+
+CREATE POLICY "Service role can manage all rollup watermarks"
+  ON rollup_watermarks FOR ALL USING (true) WITH CHECK (true);
+
+CREATE POLICY "Service role can manage all rollup dirty days"
+  ON transaction_rollup_dirty_days FOR ALL USING (true) WITH CHECK (true);
+
+COMMENT ON TABLE transaction_daily_rollups IS 'Sum and count of transactions per user, day, type and category';